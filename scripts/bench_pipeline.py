@@ -0,0 +1,242 @@
+# scripts/bench_pipeline.py
+"""Benchmark cả pipeline email + phone trên corpus giả lập, theo nhiều quy mô.
+
+Mỗi quy mô (10k, 100k, 1m, 10m email / số điện thoại) được sinh 1 lần bằng
+synth_corpus.py vào <workdir>/<quy mô>, rồi chạy lần lượt các bước của
+run_pipeline.STAGES (parse -> clean -> dedup -> split -> train, phone
+build -> features -> train) với thư mục đó làm cwd, cuối cùng là bước
+predict (chấm điểm tập test email + phone). Số đo của từng bước (wall, CPU,
+peak RSS, dòng/giây) lấy từ run report của profiling.py.
+
+Mỗi lần chạy thêm 1 dòng vào --history (JSON Lines, kèm git commit, storage,
+chunk size) và so với lần trước cùng cấu hình: bước nào chậm hơn / tốn RAM
+hơn quá --threshold bị đánh dấu ⚠ (--fail-on-regression: thoát mã 1).
+
+    python scripts/bench_pipeline.py --scale 10k,100k
+    python scripts/bench_pipeline.py --scale 1m --stages email --fail-on-regression
+    PIPELINE_CHUNK_SIZE=200000 python scripts/bench_pipeline.py --scale 10m
+
+EMAIL_MODELS mặc định "lr,sgd" để bước train không bị Random Forest chiếm
+hết thời gian ở quy mô lớn; đặt biến môi trường để đổi.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from profiling import load_report, set_rows, start_stage, step
+from run_pipeline import ROOT, SCRIPTS_DIR, STAGES, expand
+from synth_corpus import generate, parse_count
+from table_io import CHUNK_SIZE, STORAGE, table_path
+
+HISTORY_FILE = Path("reports/bench_history.jsonl")
+WORKDIR = Path("bench")
+
+# Chậm hơn / tốn RAM hơn quá 15% so với lần trước -> hồi quy
+THRESHOLD = 0.15
+# Bước chạy dưới MIN_WALL_S giây thì bỏ qua khi so sánh (nhiễu quá lớn)
+MIN_WALL_S = 1.0
+
+# Tham số riêng khi chạy trên corpus giả lập (maildir nằm trong workdir)
+STAGE_ARGS = {
+    "parse_enron": ["--root", "maildir", "--full"],
+    "parse_phishing": ["--full"],
+}
+STAGE_ENV = {"EMAIL_MODELS": "lr,sgd", "EMAIL_TFIDF_CACHE": "0"}
+
+PREDICT_BATCH = 10_000
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_script(cmd, workdir, env, name):
+    """Chạy 1 bước trong workdir, in log kèm tiền tố; trả về returncode."""
+    env = dict(env, PIPELINE_STAGE=name)
+    proc = subprocess.Popen(cmd, cwd=workdir, env=env, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, text=True, encoding="utf-8",
+                            errors="replace")
+    for line in proc.stdout:
+        print(f"[{name}] {line}", end="", flush=True)
+    return proc.wait()
+
+
+# ======== BƯỚC PREDICT ========
+
+def predict_stage():
+    """Chấm điểm tập test email + phone theo batch (chạy trong workdir)."""
+    import numpy as np
+    from email_scoring import MODEL_FILE as EMAIL_MODEL_FILE, EmailScorer
+    from phone_lookup import MODEL_FILE as PHONE_MODEL_FILE
+    from table_io import read_table
+
+    start_stage("predict")
+    n_rows = 0
+    email_test = table_path("splits/dataset_test.csv")
+    if email_test.exists() and EMAIL_MODEL_FILE.exists():
+        with step("load_email_model"):
+            scorer = EmailScorer.load()
+        texts = scorer.texts(read_table(email_test, columns=["subject", "body"]))
+        with step("predict_email", rows=len(texts)):
+            for i in range(0, len(texts), PREDICT_BATCH):
+                scorer.score_texts(texts[i:i + PREDICT_BATCH])
+        n_rows += len(texts)
+
+    phone_test = table_path("splits_phone/phone_test.csv")
+    if phone_test.exists() and PHONE_MODEL_FILE.exists():
+        import joblib
+        with step("load_phone_model"):
+            model = joblib.load(PHONE_MODEL_FILE)
+        phones = read_table(phone_test, columns=["phone"], dtype={"phone": str})["phone"]
+        phones = np.asarray(phones.fillna("").astype(str), dtype=object)
+        with step("predict_phone", rows=len(phones)):
+            for i in range(0, len(phones), PREDICT_BATCH):
+                model.predict_proba(list(phones[i:i + PREDICT_BATCH]))
+        n_rows += len(phones)
+    set_rows(n_rows)
+
+
+# ======== SO SÁNH ========
+
+def stage_metrics(records):
+    """{tên bước: số đo} từ run report (bỏ danh sách bước con)."""
+    keys = ["wall_s", "cpu_s", "peak_rss_mb", "peak_rss_children_mb", "rows", "rows_per_s", "status"]
+    return {r["name"]: {k: r[k] for k in keys if r.get(k) is not None} for r in records}
+
+def previous_run(history, entry):
+    """Lần chạy gần nhất cùng quy mô / storage / chunk size."""
+    same = ["emails", "phones", "storage", "chunk_size", "env"]
+    for old in reversed(history):
+        if all(old.get(k) == entry[k] for k in same):
+            return old
+    return None
+
+def compare(entry, old, threshold):
+    """In bảng so sánh; trả về danh sách (bước, chỉ số, tỉ lệ) bị hồi quy."""
+    regressions = []
+    print(f"\n📊 {entry['scale']}: {entry['emails']:,} email, {entry['phones']:,} phone"
+          + (f" | so với {old['commit']} ({old['time']})" if old else " | chưa có lần trước"))
+    print(f"{'stage':<18}{'wall s':>9}{'Δ':>8}{'RSS MB':>9}{'Δ':>8}{'dòng/s':>11}")
+    for name, cur in entry["stages"].items():
+        prev = (old or {}).get("stages", {}).get(name, {})
+        row = f"{name:<18}{cur['wall_s']:>9.1f}"
+        marks = []
+        for metric in ("wall_s", "peak_rss_mb"):
+            value, base = cur.get(metric), prev.get(metric)
+            if metric != "wall_s":
+                row += f"{value if value is not None else float('nan'):>9.0f}"
+            if value is None or not base:
+                row += f"{'':>8}"
+                continue
+            ratio = value / base - 1
+            row += f"{ratio:>+8.0%}"
+            noisy = metric == "wall_s" and max(value, base) < MIN_WALL_S
+            if ratio > threshold and not noisy:
+                regressions.append((name, metric, ratio))
+                marks.append(metric)
+        rate = cur.get("rows_per_s")
+        row += f"{rate if rate else float('nan'):>11,.0f}"
+        if cur.get("status") != "ok":
+            row += "  ❌ lỗi"
+        if marks:
+            row += "  ⚠ " + ", ".join(marks)
+        print(row)
+    return regressions
+
+def load_history(path):
+    if not path.exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# ======== MAIN ========
+
+def bench_scale(scale, args, env):
+    n_emails = parse_count(scale)
+    n_phones = parse_count(args.phones) if args.phones else n_emails
+    workdir = (args.workdir / scale).resolve()
+
+    t0 = time.perf_counter()
+    generate(workdir, n_emails, n_phones, args.seed)
+    print(f"✅ Corpus {scale} sẵn sàng ({time.perf_counter() - t0:.1f}s): {workdir}")
+
+    run_id = f"bench-{scale}-{time.strftime('%Y%m%d-%H%M%S')}"
+    report = workdir / "reports" / "run_report.jsonl"
+    env = dict(env, PIPELINE_RUN_ID=run_id, PIPELINE_REPORT=str(report))
+
+    wanted = expand(STAGES, args.stages) if args.stages else None
+    failed = False
+    for st in STAGES:
+        if wanted is not None and st["name"] not in wanted:
+            continue
+        cmd = [sys.executable, str(SCRIPTS_DIR / st["script"]),
+               *st["args"], *STAGE_ARGS.get(st["name"], [])]
+        if run_script(cmd, workdir, env, st["name"]) != 0:
+            print(f"❌ {st['name']} lỗi, bỏ qua các bước còn lại của {scale}")
+            failed = True
+            break
+    if not failed and not args.no_predict:
+        run_script([sys.executable, str(Path(__file__).resolve()), "--predict-stage"],
+                   workdir, env, "predict")
+
+    entry = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": git_commit(),
+             "scale": scale, "emails": n_emails, "phones": n_phones,
+             "storage": STORAGE, "chunk_size": CHUNK_SIZE,
+             "env": {k: env[k] for k in sorted(STAGE_ENV)}, "run_id": run_id,
+             "stages": stage_metrics(load_report(report, run_id))}
+    return entry, failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline trên corpus giả lập")
+    parser.add_argument("--scale", default="10k",
+                        help="các quy mô, cách nhau dấu phẩy (vd 10k,100k,1m,10m)")
+    parser.add_argument("--phones", default=None, help="số phone (mặc định = số email)")
+    parser.add_argument("--stages", nargs="*", default=None,
+                        help="chỉ chạy các bước / nhóm này (email, phone); mặc định: tất cả")
+    parser.add_argument("--no-predict", action="store_true", help="bỏ bước predict")
+    parser.add_argument("--workdir", type=Path, default=WORKDIR)
+    parser.add_argument("--history", type=Path, default=HISTORY_FILE)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="thoát mã 1 nếu có bước bị hồi quy")
+    parser.add_argument("--predict-stage", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.predict_stage:
+        return predict_stage()
+
+    env = dict(os.environ, PYTHONIOENCODING="utf-8", PYTHONUNBUFFERED="1")
+    for key, value in STAGE_ENV.items():
+        env.setdefault(key, value)
+
+    history = load_history(args.history)
+    regressions, failed = [], False
+    for scale in [s.strip() for s in args.scale.split(",") if s.strip()]:
+        entry, scale_failed = bench_scale(scale, args, env)
+        failed |= scale_failed
+        regressions += compare(entry, previous_run(history, entry), args.threshold)
+        history.append(entry)
+        args.history.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    print(f"\n📌 Lịch sử: {args.history}")
+    if regressions:
+        print(f"⚠ {len(regressions)} chỉ số hồi quy > {args.threshold:.0%}")
+    if failed or (regressions and args.fail_on_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
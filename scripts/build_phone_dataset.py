@@ -1,8 +1,14 @@
 import pandas as pd
 import numpy as np
 from pathlib import Path
-import re
 import random
+import time
+
+from phone_lookup import clean_phone  # dùng chung quy tắc làm sạch với index spam
+from profiling import record_step, set_rows, start_stage, step
+from table_io import table_path, write_table
+
+start_stage()
 
 RAW_DIR = Path("data_raw/phone")
 OUT_DIR = Path("data")
@@ -24,23 +30,19 @@ def gen_vn_phone():
     body = "".join(str(random.randint(0, 9)) for _ in range(8))
     return prefix + body
 
-def clean_phone(x: str):
-    x = str(x)
-    x = re.sub(r"[^0-9+]", "", x)
-    if 7 <= len(x) <= 15:
-        return x
-    return None
-
 # ========= 2) ĐỌC 3 FILE SPAM =========
+# phone đọc dạng chuỗi: giữ dấu '+' và số 0 ở đầu
 
-print("📥 Đang đọc truecaller_spam.csv ...")
-tc = pd.read_csv(RAW_DIR / "truecaller_spam.csv")
+with step("read") as s:
+    print("📥 Đang đọc truecaller_spam.csv ...")
+    tc = pd.read_csv(RAW_DIR / "truecaller_spam.csv", dtype={"phone": str})
 
-print("📥 Đang đọc robocall_spam.csv ...")
-rb = pd.read_csv(RAW_DIR / "robocall_spam.csv")
+    print("📥 Đang đọc robocall_spam.csv ...")
+    rb = pd.read_csv(RAW_DIR / "robocall_spam.csv", dtype={"phone": str})
 
-print("📥 Đang đọc extra_spam_phones.csv ...")
-ex = pd.read_csv(RAW_DIR / "extra_spam_phones.csv")
+    print("📥 Đang đọc extra_spam_phones.csv ...")
+    ex = pd.read_csv(RAW_DIR / "extra_spam_phones.csv", dtype={"phone": str})
+    s.rows = len(tc) + len(rb) + len(ex)
 
 # Đảm bảo có cột phone, category, label
 for df in (tc, rb, ex):
@@ -54,7 +56,8 @@ spam = pd.concat([tc[["phone", "category", "label"]],
                   ex[["phone", "category", "label"]]],
                  ignore_index=True)
 
-spam["phone"] = spam["phone"].apply(clean_phone)
+with step("clean_phone", rows=len(spam)):
+    spam["phone"] = spam["phone"].apply(clean_phone)
 spam = spam.dropna(subset=["phone"])
 spam = spam.drop_duplicates(subset=["phone"])
 
@@ -70,6 +73,7 @@ spam_numbers = set(spam["phone"].tolist())
 
 print("🛠 Đang tạo số hợp lệ (ham) synthetic ...")
 
+t0 = time.perf_counter()
 while len(ham_numbers) < target_ham:
     if random.random() < 0.5:
         p = gen_global_phone()
@@ -81,6 +85,7 @@ while len(ham_numbers) < target_ham:
     if p in spam_numbers:
         continue
     ham_numbers.add(p)
+record_step("generate_ham", time.perf_counter() - t0, rows=len(ham_numbers))
 
 ham = pd.DataFrame({"phone": list(ham_numbers)})
 ham["category"] = "legit"
@@ -97,8 +102,10 @@ df = df.drop_duplicates(subset=["phone", "label"])
 # shuffle
 df = df.sample(frac=1, random_state=42).reset_index(drop=True)
 
-out_file = OUT_DIR / "phone_dataset_cleaned.csv"
-df.to_csv(out_file, index=False, encoding="utf-8")
+out_file = table_path(OUT_DIR / "phone_dataset_cleaned.csv")
+with step("write", rows=len(df)):
+    write_table(df, out_file)
+set_rows(len(df))
 
 print("\n✅ DONE – ĐÃ XÂY DỰNG DATASET PHONE")
 print("📌 Tổng số mẫu:", len(df))
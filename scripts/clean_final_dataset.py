@@ -1,40 +1,74 @@
-import pandas as pd
+import os
 from pathlib import Path
-import re
+
+from email_cleaner import clean_dataframe, clean_frames
+from profiling import set_rows, start_stage, step
+from table_io import (CHUNK_SIZE, TableWriter, iter_table, read_table, storage_of,
+                      table_path, write_table)
 
 IN_FILE = Path("data/dataset_email_cleaned.csv")
-OUT_FILE = Path("data/dataset_email_final_cleaned.csv")
+OUT_FILE = table_path("data/dataset_email_final_cleaned.csv")
+
+# Số process làm sạch song song (1 = tuần tự)
+WORKERS = int(os.environ.get("EMAIL_CLEAN_WORKERS", os.cpu_count() or 1))
+
 
-print("📥 Đang đọc dataset...")
+def main_chunked():
+    """Đọc -> làm sạch -> ghi từng khối CHUNK_SIZE dòng (RAM không tăng theo corpus)."""
+    print(f"📥 Đang làm sạch theo chunk {CHUNK_SIZE:,} dòng ({WORKERS} worker)...")
+    tmp_file = OUT_FILE.with_name(OUT_FILE.name + ".tmp")
+    n_rows = 0
+    writer = None
+    try:
+        with step("read_clean_write") as s:
+            for df in clean_frames(iter_table(IN_FILE, chunksize=CHUNK_SIZE), WORKERS):
+                if writer is None:
+                    writer = TableWriter(tmp_file, list(df.columns), storage=storage_of(OUT_FILE))
+                writer.write(df)
+                n_rows += len(df)
+            s.rows = n_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        raise ValueError(f"Bảng rỗng: {IN_FILE}")
+    os.replace(tmp_file, OUT_FILE)
+    set_rows(n_rows)
 
-df = pd.read_csv(IN_FILE, encoding="utf-8")
+    print("✅ CLEAN FINAL DONE!")
+    print("📌 Số dòng còn lại:", n_rows)
+    print("📌 File lưu tại:", OUT_FILE)
 
-print("🔧 Làm sạch nội dung email...")
+def main():
+    start_stage()
+    if CHUNK_SIZE:
+        return main_chunked()
 
-# bỏ email body rỗng
-df = df[df["body"].str.strip() != ""]
+    print("📥 Đang đọc dataset...")
 
-# loại html tag
-df["body"] = df["body"].str.replace(r"<[^>]+>", " ", regex=True)
+    with step("read") as s:
+        df = read_table(IN_FILE)
+        s.rows = len(df)
 
-# loại ký tự lạ
-df["body"] = df["body"].str.replace(r"[^a-zA-Z0-9\s.,!?@:/\-]", " ", regex=True)
+    print(f"🔧 Làm sạch nội dung email ({WORKERS} worker)...")
 
-# thu gọn nhiều khoảng trắng
-df["body"] = df["body"].str.replace(r"\s+", " ", regex=True).str.strip()
+    # bỏ html tag, ký tự lạ, thu gọn khoảng trắng, bỏ body rỗng / quá ngắn
+    # (<= 20 ký tự) / quá dài (>= 50,000 ký tự): xem email_cleaner.py
+    with step("clean", rows=len(df)):
+        df = clean_dataframe(df, workers=WORKERS)
 
-# bỏ email quá ngắn (< 20 ký tự)
-df = df[df["body"].str.len() > 20]
+    # loại trùng lặp: dedup_email_dataset.py (chạy sau bước này)
 
-# bỏ email quá dài (> 50,000 ký tự)
-df = df[df["body"].str.len() < 50000]
+    print("📦 Đang lưu file cleaned...")
+    with step("write", rows=len(df)):
+        write_table(df, OUT_FILE)
+    set_rows(len(df))
 
-print("🧹 Loại trùng lặp...")
-df = df.drop_duplicates(subset=["subject", "body"])
+    print("✅ CLEAN FINAL DONE!")
+    print("📌 Số dòng còn lại:", len(df))
+    print("📌 File lưu tại:", OUT_FILE)
 
-print("📦 Đang lưu file cleaned...")
-df.to_csv(OUT_FILE, index=False, encoding="utf-8")
 
-print("✅ CLEAN FINAL DONE!")
-print("📌 Số dòng còn lại:", len(df))
-print("📌 File lưu tại:", OUT_FILE)
+# process pool (spawn/forkserver) import lại module chính -> cần guard
+if __name__ == "__main__":
+    main()
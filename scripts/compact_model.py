@@ -0,0 +1,733 @@
+# scripts/compact_model.py
+"""Xuất model email / phone thành thư mục mảng phẳng, load bằng memory map.
+
+email_best_model.joblib + tfidf_vectorizer.joblib là pickle: load phải dựng
+lại dict vocabulary hàng trăm nghìn từ (và cả trăm cây nếu Random Forest
+thắng) trong từng process. Bản compact chỉ gồm meta.json + các file .npy:
+
+    artifacts/email/compact/meta.json      tham số analyzer, loại model, ...
+                           /vocab_keys.npy  hash 64-bit của từ, đã sắp xếp
+                           /vocab_cols.npy  cột TF-IDF tương ứng
+                           /idf.npy, coef.npy  (model tuyến tính)
+                           /tree_*.npy      (Random Forest: mọi cây nối liền)
+    artifacts/phone/compact/...            MinMaxScaler + model, không có vocab
+
+Mảng được np.load(mmap_mode="r"), nên load chỉ mất vài ms và N process phục
+vụ cùng máy dùng chung 1 bản trong page cache. Tra từ = hash cả batch token
+1 lần (pandas.util.hash_array, siphash cố định khoá) + 1 lần np.searchsorted.
+
+Model tuyến tính (Logistic Regression, SGD log loss, Linear SVM đã hiệu chỉnh
+sigmoid, Complement NB) đều quy về p = sigmoid(alpha * (X·w + b) + beta).
+
+    python scripts/compact_model.py export          # từ các file .joblib đã train
+    python scripts/compact_model.py check           # so xác suất với bản joblib
+    python scripts/compact_model.py quantize        # float16, bỏ |coef| < 1e-3
+    python scripts/compact_model.py quantize --dtype int8 --prune-below 0.01
+
+`quantize` (chỉ model email tuyến tính) bỏ các từ có |coef| < --prune-below
+khỏi vocab, lưu coef / idf dạng float16 hoặc int8 (kèm scale) vào
+artifacts/email/quantized, sau khi so với bản joblib trên tập test: F1 giảm
+quá --max-f1-drop hoặc quá --max-flip email đổi nhãn thì không ghi gì, thoát mã 1.
+Dùng như bản compact: email_scoring.py --compact artifacts/email/quantized,
+scoring_server.py --compact --email-compact artifacts/email/quantized.
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.special import expit
+
+FORMAT_VERSION = 1
+
+EMAIL_COMPACT_DIR = Path("artifacts/email/compact")
+EMAIL_QUANT_DIR = Path("artifacts/email/quantized")
+PHONE_COMPACT_DIR = Path("artifacts/phone/compact")
+
+# Tham số TfidfVectorizer cần để dựng lại analyzer (phần còn lại chỉ dùng lúc fit)
+ANALYZER_PARAMS = ["analyzer", "lowercase", "token_pattern", "ngram_range",
+                   "stop_words", "strip_accents"]
+
+# Sai khác xác suất tối đa chấp nhận được khi check với bản joblib
+PARITY_TOL = 1e-9
+
+# quantize: kiểu lưu coef / idf, ngưỡng |coef| để bỏ từ khỏi vocab
+QUANT_DTYPE = "float16"
+PRUNE_BELOW = 1e-3
+# F1 (tập test) được phép giảm (như F1_TOLERANCE của model_zoo.py) và tỉ lệ
+# email được phép đổi nhãn so với bản joblib
+MAX_F1_DROP = 0.002
+MAX_FLIP = 0.01
+
+
+# ======== VOCABULARY ========
+
+def hash_terms(terms):
+    """Hash uint64 ổn định cho 1 dãy chuỗi."""
+    return pd.util.hash_array(np.asarray(terms, dtype=object), categorize=False)
+
+def vocab_arrays(vocabulary):
+    """{từ: cột} -> (keys đã sắp xếp, cột tương ứng); lỗi nếu 2 từ trùng hash."""
+    terms = list(vocabulary)
+    keys = hash_terms(terms)
+    cols = np.fromiter((vocabulary[t] for t in terms), dtype=np.int32, count=len(terms))
+    order = np.argsort(keys, kind="stable")
+    keys, cols = keys[order], cols[order]
+    if len(keys) > 1 and (keys[1:] == keys[:-1]).any():
+        raise ValueError("Vocabulary có 2 từ trùng hash 64-bit")
+    return keys, cols
+
+
+# ======== HEAD: TUYẾN TÍNH / RANDOM FOREST ========
+
+class LinearHead:
+    """p(label=classes[1]) = sigmoid(alpha * (X·w + b) + beta)."""
+
+    def __init__(self, coef, intercept, alpha=1.0, beta=0.0, classes=(0, 1)):
+        self.coef = coef
+        self.intercept = float(intercept)
+        self.alpha = float(alpha)
+        self.beta = float(beta)
+        self.classes_ = np.asarray(classes)
+
+    def decision_function(self, X):
+        return np.asarray(X @ self.coef).ravel() + self.intercept
+
+    def predict_proba(self, X):
+        z = self.alpha * self.decision_function(X) + self.beta
+        p = expit(z)
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X):
+        return self.classes_[(self.predict_proba(X)[:, 1] > 0.5).astype(int)]
+
+class ForestHead:
+    """Mọi cây của forest nối thành mảng node phẳng, duyệt song song cả batch.
+
+    feature là chỉ số trong `used` (các cột cây thật sự dùng), nên với X thưa
+    chỉ cần lấy dense đúng các cột đó.
+    """
+
+    def __init__(self, roots, feature, threshold, left, right, value, used, classes=(0, 1)):
+        self.roots = roots
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.used = used
+        self.classes_ = np.asarray(classes)
+
+    def predict_proba(self, X):
+        X = X[:, np.asarray(self.used)]
+        X = X.toarray() if sp.issparse(X) else np.asarray(X)
+        # cây sklearn so sánh trên float32
+        X = X.astype(np.float32)
+        n = X.shape[0]
+        node = np.broadcast_to(np.asarray(self.roots), (n, len(self.roots))).copy()
+        rows = np.arange(n)[:, None]
+        while True:
+            internal = self.left[node] >= 0
+            if not internal.any():
+                break
+            x = X[rows, np.where(internal, self.feature[node], 0)]
+            go_left = x <= self.threshold[node]
+            node = np.where(internal, np.where(go_left, self.left[node], self.right[node]), node)
+        p = self.value[node].mean(axis=1)
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X):
+        return self.classes_[(self.predict_proba(X)[:, 1] > 0.5).astype(int)]
+
+
+def head_arrays(model):
+    """Model sklearn đã fit -> (kind, {tên: mảng}, meta); lỗi nếu không hỗ trợ."""
+    from sklearn.calibration import CalibratedClassifierCV
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.naive_bayes import ComplementNB
+
+    classes = [c.item() if hasattr(c, "item") else c for c in model.classes_]
+    if len(classes) != 2:
+        raise ValueError(f"Chỉ hỗ trợ phân loại 2 lớp, model có {len(classes)} lớp")
+    meta = {"classes": classes}
+
+    if isinstance(model, RandomForestClassifier):
+        trees = [est.tree_ for est in model.estimators_]
+        used = np.unique(np.concatenate([t.feature[t.feature >= 0] for t in trees]))
+        local = np.full(max(int(used.max(initial=0)) + 1, 1), -1, dtype=np.int32)
+        local[used] = np.arange(len(used), dtype=np.int32)
+        offsets = np.cumsum([0] + [t.node_count for t in trees])
+        parts = {k: [] for k in ("feature", "threshold", "left", "right", "value")}
+        for t, off in zip(trees, offsets):
+            leaf = t.children_left < 0
+            parts["feature"].append(np.where(leaf, -1, local[np.maximum(t.feature, 0)]))
+            parts["threshold"].append(t.threshold)
+            parts["left"].append(np.where(leaf, -1, t.children_left + off))
+            parts["right"].append(np.where(leaf, -1, t.children_right + off))
+            value = t.value[:, 0, :]
+            parts["value"].append(value[:, 1] / value.sum(axis=1))
+        arrays = {
+            "tree_roots": offsets[:-1].astype(np.int32),
+            "tree_feature": np.concatenate(parts["feature"]).astype(np.int32),
+            "tree_threshold": np.concatenate(parts["threshold"]).astype(np.float64),
+            "tree_left": np.concatenate(parts["left"]).astype(np.int32),
+            "tree_right": np.concatenate(parts["right"]).astype(np.int32),
+            "tree_value": np.concatenate(parts["value"]).astype(np.float64),
+            "tree_used": used.astype(np.int32),
+        }
+        return "forest", arrays, meta
+
+    alpha, beta, calibrated = 1.0, 0.0, False
+    if isinstance(model, CalibratedClassifierCV):
+        if len(model.calibrated_classifiers_) != 1 or model.method != "sigmoid":
+            raise ValueError("Chỉ hỗ trợ CalibratedClassifierCV(method='sigmoid', ensemble=False)")
+        inner = model.calibrated_classifiers_[0]
+        calibrator = inner.calibrators[0]
+        model = inner.estimator
+        # _SigmoidCalibration: p = 1 / (1 + exp(a * f + b))
+        alpha, beta, calibrated = -float(calibrator.a_), -float(calibrator.b_), True
+
+    if isinstance(model, ComplementNB):
+        # 2 lớp: p1 = sigmoid(jll1 - jll0), jll = X · feature_log_prob_.T
+        coef = model.feature_log_prob_[1] - model.feature_log_prob_[0]
+        intercept = 0.0
+    elif hasattr(model, "coef_") and hasattr(model, "intercept_"):
+        loss = getattr(model, "loss", "log_loss")
+        if not calibrated and loss != "log_loss":
+            raise ValueError(f"{type(model).__name__}(loss={loss!r}) không có predict_proba")
+        coef = np.asarray(model.coef_).ravel()
+        intercept = float(np.ravel(model.intercept_)[0])
+    else:
+        raise ValueError(f"Chưa hỗ trợ xuất model {type(model).__name__}")
+    meta.update(intercept=intercept, alpha=alpha, beta=beta)
+    return "linear", {"coef": np.asarray(coef, dtype=np.float64)}, meta
+
+def load_head(kind, meta, arrays):
+    if kind == "linear":
+        return LinearHead(arrays["coef"], meta["intercept"], meta["alpha"], meta["beta"],
+                          meta["classes"])
+    if kind == "forest":
+        return ForestHead(arrays["tree_roots"], arrays["tree_feature"], arrays["tree_threshold"],
+                          arrays["tree_left"], arrays["tree_right"], arrays["tree_value"],
+                          arrays["tree_used"], meta["classes"])
+    raise ValueError(f"Loại model không rõ: {kind}")
+
+
+# ======== GHI / ĐỌC THƯ MỤC ========
+
+def save_dir(out_dir, meta, arrays):
+    """Ghi vào thư mục tạm rồi đổi tên: process đang mmap bản cũ không bị ảnh hưởng."""
+    out_dir = Path(out_dir)
+    tmp = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for name, arr in arrays.items():
+        np.save(tmp / f"{name}.npy", np.ascontiguousarray(arr))
+    meta = dict(meta, format=FORMAT_VERSION, arrays=sorted(arrays))
+    (tmp / "meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=1), encoding="utf-8")
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp, out_dir)
+    return dir_size_mb(out_dir)
+
+def load_dir(path, mmap=True):
+    path = Path(path)
+    meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+    if meta.get("format") != FORMAT_VERSION:
+        raise ValueError(f"{path}: format {meta.get('format')} != {FORMAT_VERSION}, cần export lại")
+    mode = "r" if mmap else None
+    # np.asarray: view ndarray thường của memmap (không copy), index nhanh hơn lớp np.memmap
+    arrays = {name: np.asarray(np.load(path / f"{name}.npy", mmap_mode=mode))
+              for name in meta["arrays"]}
+    return meta, dequantize_arrays(meta, arrays)
+
+def dir_size_mb(path):
+    return sum(p.stat().st_size for p in Path(path).iterdir()) / 1e6
+
+
+# ======== LƯỢNG TỬ HOÁ ========
+
+def quantize(x, dtype):
+    """Mảng float -> (q, scale, offset) với x ≈ q * scale + offset.
+
+    int8: mảng có cả dấu âm lẫn dương (coef) lượng tử đối xứng quanh 0 nên
+    coef = 0 vẫn đúng bằng 0; mảng 1 dấu (idf) lấy offset ở giữa khoảng.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    if dtype == "float16":
+        return x.astype(np.float16), 1.0, 0.0
+    if dtype != "int8":
+        raise ValueError(f"Kiểu lượng tử không hỗ trợ: {dtype}")
+    if len(x) == 0:
+        return x.astype(np.int8), 1.0, 0.0
+    lo, hi = float(x.min()), float(x.max())
+    offset = 0.0 if lo < 0 < hi else (lo + hi) / 2
+    scale = max(abs(lo - offset), abs(hi - offset)) / 127 or 1.0
+    q = np.clip(np.rint((x - offset) / scale), -127, 127).astype(np.int8)
+    return q, scale, offset
+
+def quantize_arrays(meta, arrays, names, dtype):
+    """Thay arrays[name] bằng arrays[name + "_q"]; scale / offset lưu ở meta["quant"].
+
+    Bản load cũ (không biết "_q") sẽ báo thiếu mảng thay vì đọc nhầm số nguyên.
+    """
+    meta["quant"] = {"dtype": dtype}
+    for name in names:
+        if name in arrays:
+            arrays[f"{name}_q"], scale, offset = quantize(arrays.pop(name), dtype)
+            meta["quant"][name] = [scale, offset]
+    return meta, arrays
+
+def dequantize_arrays(meta, arrays):
+    """Ngược lại quantize_arrays: float32 (đủ chính xác cho int8 / float16, nửa RAM float64)."""
+    for name, value in meta.get("quant", {}).items():
+        if name == "dtype":
+            continue
+        scale, offset = value
+        q = arrays.pop(f"{name}_q")
+        arrays[name] = (q.astype(np.float32) * np.float32(scale) + np.float32(offset)
+                        if meta["quant"]["dtype"] == "int8" else q.astype(np.float32))
+    return arrays
+
+def prune_linear(meta, arrays, below):
+    """Bỏ các cột có |coef| < below khỏi coef / idf / vocab, đánh số lại cột.
+
+    Từ bị bỏ không còn góp vào chuẩn L2 của email nên xác suất các email có
+    từ đó lệch nhẹ so với bản gốc (không chỉ mất phần coef gần 0); quantize
+    kiểm tra độ lệch này trên tập test.
+    """
+    coef = np.asarray(arrays["coef"])
+    keep = np.abs(coef) >= below
+    new_col = (np.cumsum(keep) - 1).astype(np.int32)
+    cols = np.asarray(arrays["vocab_cols"])
+    hit = keep[cols]
+    arrays["vocab_keys"] = np.asarray(arrays["vocab_keys"])[hit]
+    arrays["vocab_cols"] = new_col[cols[hit]]
+    arrays["coef"] = coef[keep]
+    if "idf" in arrays:
+        arrays["idf"] = np.asarray(arrays["idf"])[keep]
+    meta["pruned"] = {"below": below, "features": len(coef), "kept": int(keep.sum())}
+    meta["n_features"] = int(keep.sum())
+    return meta, arrays
+
+
+# ======== EMAIL ========
+
+def word_analyzer(params):
+    """Analyzer "word" như sklearn (lowercase, token_pattern, n-gram) mà không cần
+    import sklearn; tham số khác (stop_words="english", strip_accents) thì dùng
+    build_analyzer() của sklearn.
+    """
+    stop_words = params.get("stop_words")
+    if params.get("strip_accents") or isinstance(stop_words, str):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        return TfidfVectorizer(**params).build_analyzer()
+    pattern = re.compile(params["token_pattern"])
+    if pattern.groups > 1:
+        raise ValueError("token_pattern có nhiều hơn 1 nhóm bắt")
+    lowercase = params["lowercase"]
+    stop = frozenset(stop_words or ())
+    min_n, max_n = params["ngram_range"]
+
+    def analyze(doc):
+        tokens = pattern.findall(doc.lower() if lowercase else doc)
+        if stop:
+            tokens = [w for w in tokens if w not in stop]
+        if max_n == 1:
+            return tokens
+        out = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), min(max_n, len(tokens)) + 1):
+            out.extend(map(" ".join, zip(*(tokens[i:] for i in range(n)))))
+        return out
+    return analyze
+
+class CompactTfidf:
+    """transform(texts) -> CSR giống TfidfVectorizer.transform, vocab là mảng hash."""
+
+    def __init__(self, params, keys, cols, idf, n_features, norm="l2", sublinear_tf=False,
+                 binary=False, text_config=None):
+        self.analyze = word_analyzer(params)
+        self.keys = keys
+        self.cols = cols
+        self.idf = idf
+        self.n_features = n_features
+        self.norm = norm
+        self.sublinear_tf = sublinear_tf
+        self.binary = binary
+        # Cách ghép subject + body lúc train (token budget, xem email_scoring.py)
+        self.text_config = text_config or {}
+
+    @classmethod
+    def from_sklearn(cls, vectorizer):
+        """TfidfVectorizer đã fit -> CompactTfidf trong RAM (không qua file)."""
+        params = vectorizer.get_params()
+        if params["analyzer"] != "word" or params["tokenizer"] or params["preprocessor"]:
+            raise ValueError("Chỉ hỗ trợ analyzer='word' mặc định (không tokenizer/preprocessor riêng)")
+        keys, cols = vocab_arrays(vectorizer.vocabulary_)
+        idf = np.asarray(vectorizer.idf_, dtype=np.float64) if params["use_idf"] else None
+        return cls({k: v for k, v in params.items() if k in ANALYZER_PARAMS}, keys, cols, idf,
+                   len(vectorizer.vocabulary_), params["norm"], params["sublinear_tf"],
+                   params["binary"])
+
+    def positions(self, texts):
+        """Tách token cả batch -> (dòng, vị trí trong vocab_keys) của các token có trong vocab."""
+        tokens, lengths = [], []
+        for doc in texts:
+            t = self.analyze(doc)
+            tokens.extend(t)
+            lengths.append(len(t))
+        if not tokens or len(self.keys) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        h = hash_terms(tokens)
+        pos = np.searchsorted(self.keys, h)
+        pos[pos == len(self.keys)] = 0
+        hit = self.keys[pos] == h
+        if len(lengths) == 1:
+            return np.zeros(int(hit.sum()), dtype=np.int64), pos[hit]
+        rows = np.repeat(np.arange(len(lengths)), lengths)
+        return rows[hit], pos[hit]
+
+    def transform(self, texts):
+        texts = list(texts)
+        rows, pos = self.positions(texts)
+        X = sp.csr_matrix((np.ones(len(pos)), (rows, self.cols[pos])),
+                          shape=(len(texts), self.n_features))
+        X.sum_duplicates()
+        if self.binary:
+            X.data[:] = 1.0
+        if self.sublinear_tf:
+            np.log(X.data, X.data)
+            X.data += 1.0
+        if self.idf is not None:
+            X.data *= self.idf[X.indices]
+        if self.norm:
+            sq = X.multiply(X) if self.norm == "l2" else abs(X)
+            norms = np.asarray(sq.sum(axis=1)).ravel()
+            if self.norm == "l2":
+                norms = np.sqrt(norms)
+            norms[norms == 0] = 1.0
+            X.data /= np.repeat(norms, np.diff(X.indptr))
+        return X
+
+class FusedLinearScorer:
+    """TF-IDF + model tuyến tính gộp làm 1: không dựng ma trận thưa.
+
+    Với mỗi từ trong vocab (theo thứ tự vocab_keys) tính sẵn idf và idf * coef.
+    1 email = các cặp (từ, tf) -> tf' (binary / sublinear) ->
+        score = Σ tf' * idf * coef / ‖tf' * idf‖ + intercept
+    đúng bằng X·w + b của TfidfVectorizer.transform + predict_proba (chỉ khác
+    thứ tự cộng số thực, lệch ~1e-15).
+    """
+
+    def __init__(self, vectorizer, head):
+        self.vectorizer = vectorizer
+        self.head = head
+        cols = np.asarray(vectorizer.cols)
+        idf = np.ones(len(cols)) if vectorizer.idf is None else np.asarray(vectorizer.idf)[cols]
+        self.key_idf = idf
+        self.key_weight = idf * np.asarray(head.coef)[cols]
+
+    def decision_function(self, texts):
+        vec = self.vectorizer
+        texts = list(texts)
+        n = len(texts)
+        rows, pos = vec.positions(texts)
+        if len(pos) == 0:
+            # không từ nào có trong vocab (np.bincount rỗng trả về mảng int)
+            return np.full(n, self.head.intercept)
+        if not vec.norm and not vec.binary and not vec.sublinear_tf:
+            return np.bincount(rows, self.key_weight[pos], minlength=n) + self.head.intercept
+        # gộp token trùng trong cùng email: (dòng, từ) -> tf
+        key, tf = np.unique(rows * len(vec.keys) + pos, return_counts=True)
+        rows, pos = np.divmod(key, len(vec.keys))
+        tf = tf.astype(np.float64)
+        if vec.binary:
+            tf[:] = 1.0
+        if vec.sublinear_tf:
+            tf = np.log(tf) + 1.0
+        score = np.bincount(rows, tf * self.key_weight[pos], minlength=n)
+        if vec.norm:
+            x = tf * self.key_idf[pos]
+            norm = np.bincount(rows, x * x if vec.norm == "l2" else np.abs(x), minlength=n)
+            if vec.norm == "l2":
+                norm = np.sqrt(norm)
+            norm[norm == 0] = 1.0
+            score /= norm
+        return score + self.head.intercept
+
+    def predict_proba(self, texts):
+        z = self.head.alpha * self.decision_function(texts) + self.head.beta
+        p = expit(z)
+        return np.column_stack([1.0 - p, p])
+
+def fused_scorer(vectorizer, model):
+    """FusedLinearScorer cho (vectorizer, model) bản compact hoặc sklearn.
+
+    None nếu model không tuyến tính (Random Forest) hoặc vectorizer không hỗ trợ.
+    """
+    try:
+        if not isinstance(vectorizer, CompactTfidf):
+            vectorizer = CompactTfidf.from_sklearn(vectorizer)
+        if not isinstance(model, LinearHead):
+            kind, arrays, meta = head_arrays(model)
+            if kind != "linear":
+                return None
+            model = load_head(kind, meta, arrays)
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(model, LinearHead):
+        return None
+    return FusedLinearScorer(vectorizer, model)
+
+def email_arrays(vectorizer, model, text_config=None):
+    """TfidfVectorizer + model email đã fit -> (meta, {tên: mảng}) để ghi ra thư mục.
+
+    `text_config`: {"token_budget", "tail_fraction"} lúc train, lưu vào meta để
+    EmailScorer.load_compact cắt body giống hệt.
+    """
+    vec = CompactTfidf.from_sklearn(vectorizer)
+    params = vectorizer.get_params()
+    kind, arrays, meta = head_arrays(model)
+    arrays.update(vocab_keys=vec.keys, vocab_cols=vec.cols)
+    if vec.idf is not None:
+        arrays["idf"] = vec.idf
+    meta.update(
+        kind=kind, model=type(model).__name__, n_features=vec.n_features,
+        analyzer={k: list(v) if isinstance(v, tuple) else v
+                  for k, v in params.items() if k in ANALYZER_PARAMS},
+        norm=vec.norm, sublinear_tf=vec.sublinear_tf, binary=vec.binary,
+        text_config=text_config or {},
+        # kiểm tra hash của pandas không đổi giữa lúc export và lúc load
+        hash_check=["phishing", int(hash_terms(["phishing"])[0])],
+    )
+    return meta, arrays
+
+def export_email(vectorizer, model, out_dir=EMAIL_COMPACT_DIR, text_config=None):
+    """TfidfVectorizer + model email đã fit -> thư mục compact; trả về MB."""
+    return save_dir(out_dir, *email_arrays(vectorizer, model, text_config))
+
+def quantized_email_arrays(vectorizer, model, dtype=QUANT_DTYPE, prune_below=PRUNE_BELOW,
+                           text_config=None):
+    """Như email_arrays, đã bỏ từ |coef| < prune_below và lượng tử coef / idf."""
+    meta, arrays = email_arrays(vectorizer, model, text_config)
+    if meta["kind"] != "linear":
+        raise ValueError(f"Chỉ lượng tử được model tuyến tính, không phải {meta['model']}")
+    if prune_below > 0:
+        meta, arrays = prune_linear(meta, arrays, prune_below)
+    return quantize_arrays(meta, arrays, ["coef", "idf"], dtype)
+
+def load_email(path=EMAIL_COMPACT_DIR, mmap=True):
+    """-> (vectorizer, model) dùng được như bản joblib trong EmailScorer."""
+    meta, arrays = load_dir(path, mmap)
+    return email_from_arrays(meta, arrays, path)
+
+def email_from_arrays(meta, arrays, path=""):
+    term, value = meta["hash_check"]
+    if int(hash_terms([term])[0]) != value:
+        raise ValueError(f"{path}: hàm hash của pandas đã đổi, cần export lại")
+    analyzer = dict(meta["analyzer"], ngram_range=tuple(meta["analyzer"]["ngram_range"]))
+    vectorizer = CompactTfidf(analyzer, arrays["vocab_keys"], arrays["vocab_cols"],
+                              arrays.get("idf"), meta["n_features"], meta["norm"],
+                              meta["sublinear_tf"], meta["binary"], meta.get("text_config"))
+    return vectorizer, load_head(meta["kind"], meta, arrays)
+
+
+# ======== PHONE ========
+
+class CompactPhoneModel:
+    """Số điện thoại thô -> FEATURES -> MinMaxScaler -> head (như Pipeline đã train)."""
+
+    def __init__(self, scale, offset, clip, head):
+        """`clip`: (min, max) nếu scaler có clip=True, ngược lại None."""
+        from phone_features import PhoneFeatureExtractor
+        self.features = PhoneFeatureExtractor()
+        self.scale = scale
+        self.offset = offset
+        self.clip = clip
+        self.head = head
+        self.classes_ = head.classes_
+
+    def predict_proba(self, phones):
+        X = self.features.transform(phones) * self.scale + self.offset
+        if self.clip:
+            np.clip(X, self.clip[0], self.clip[1], out=X)
+        return self.head.predict_proba(X)
+
+    def predict(self, phones):
+        return self.classes_[(self.predict_proba(phones)[:, 1] > 0.5).astype(int)]
+
+def export_phone(pipeline, out_dir=PHONE_COMPACT_DIR):
+    """Pipeline(PhoneFeatureExtractor, MinMaxScaler, clf) -> thư mục compact; trả về MB."""
+    from sklearn.preprocessing import MinMaxScaler
+    from phone_features import PhoneFeatureExtractor
+
+    steps = [s for _, s in pipeline.steps]
+    if (len(steps) != 3 or not isinstance(steps[0], PhoneFeatureExtractor)
+            or not isinstance(steps[1], MinMaxScaler)):
+        raise ValueError("Chỉ hỗ trợ Pipeline(PhoneFeatureExtractor, MinMaxScaler, model)")
+    scaler = steps[1]
+    kind, arrays, meta = head_arrays(steps[2])
+    arrays.update(scale=np.asarray(scaler.scale_, dtype=np.float64),
+                  offset=np.asarray(scaler.min_, dtype=np.float64))
+    meta.update(kind=kind, model=type(steps[2]).__name__, clip=list(scaler.feature_range) if scaler.clip else None)
+    return save_dir(out_dir, meta, arrays)
+
+def load_phone(path=PHONE_COMPACT_DIR, mmap=True):
+    meta, arrays = load_dir(path, mmap)
+    return CompactPhoneModel(arrays["scale"], arrays["offset"], meta["clip"],
+                             load_head(meta["kind"], meta, arrays))
+
+
+# ======== CLI ========
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, (time.perf_counter() - t0) * 1000
+
+def quantize_email(args):
+    """Lệnh quantize: lượng tử + so với bản joblib trên cả tập test, chỉ ghi khi đạt."""
+    import joblib
+    from email_scoring import MODEL_FILE, VECTORIZER_FILE, EmailScorer, load_text_config
+    from metrics import get_metrics
+    from profiling import set_rows, start_stage, step
+    from table_io import read_table
+
+    start_stage()
+    if not MODEL_FILE.exists():
+        print(f"⚠ Chưa có {MODEL_FILE}, bỏ qua quantize")
+        return True
+    with step("load joblib"):
+        vectorizer, model = joblib.load(VECTORIZER_FILE), joblib.load(MODEL_FILE)
+    text_config = load_text_config(VECTORIZER_FILE)
+    try:
+        with step("quantize"):
+            meta, arrays = quantized_email_arrays(vectorizer, model, args.dtype,
+                                                  args.prune_below, text_config)
+    except ValueError as e:
+        print(f"⚠ Bỏ qua quantize: {e}")
+        return True
+    pruned = meta.get("pruned", {"features": meta["n_features"], "kept": meta["n_features"]})
+    print(f"✂ {args.dtype}, bỏ |coef| < {args.prune_below:g}: giữ {pruned['kept']:,}"
+          f"/{pruned['features']:,} đặc trưng")
+
+    reference = EmailScorer(vectorizer, model, fused=False, **text_config)
+    quant_vec, quant_head = email_from_arrays(meta, dequantize_arrays(meta, dict(arrays)))
+    quant = EmailScorer(quant_vec, quant_head, **quant_vec.text_config)
+    df = read_table(args.email_sample, columns=["subject", "body", "label"])
+    y = pd.to_numeric(df["label"]).to_numpy(dtype=np.int64)
+    with step("score joblib", rows=len(df)):
+        p_ref = reference.score(df)
+    with step("score quantized", rows=len(df)):
+        p = quant.score(df)
+    set_rows(len(df))
+    diff = np.abs(p - p_ref)
+    parity = {
+        "sample": str(args.email_sample), "emails": len(df),
+        "max_abs_diff": float(diff.max(initial=0.0)),
+        "mean_abs_diff": float(diff.mean()) if len(df) else 0.0,
+        "flipped": float(((p > 0.5) != (p_ref > 0.5)).mean()) if len(df) else 0.0,
+        "f1_ref": float(get_metrics(y, (p_ref > 0.5).astype(int))["f1"]),
+        "f1": float(get_metrics(y, (p > 0.5).astype(int))["f1"]),
+    }
+    parity["f1_delta"] = parity["f1"] - parity["f1_ref"]
+    ok = parity["f1_delta"] >= -args.max_f1_drop and parity["flipped"] <= args.max_flip
+    print(f"{'✅' if ok else '❌'} {len(df):,} email ({args.email_sample}): "
+          f"lệch p tối đa {parity['max_abs_diff']:.2e} (TB {parity['mean_abs_diff']:.2e}), "
+          f"{parity['flipped']:.2%} đổi nhãn, F1 {parity['f1_ref']:.4f} -> {parity['f1']:.4f} "
+          f"(Δ {parity['f1_delta']:+.4f})")
+    if not ok:
+        print(f"❌ Vượt ngưỡng (F1 giảm > {args.max_f1_drop} hoặc > {args.max_flip:.0%} đổi nhãn), "
+              f"không ghi {args.out}")
+        return False
+
+    meta["parity"] = parity
+    with step("save"):
+        mb = save_dir(args.out, meta, arrays)
+    base = f" (compact: {dir_size_mb(EMAIL_COMPACT_DIR):.1f} MB)" if EMAIL_COMPACT_DIR.exists() else ""
+    _, ms = _timed(EmailScorer.load_compact, args.out)
+    print(f"✅ Email quantized -> {args.out}: {mb:.1f} MB{base}, load {ms:.1f} ms")
+    return True
+
+def main():
+    from email_scoring import MODEL_FILE as EMAIL_MODEL_FILE
+    from email_scoring import VECTORIZER_FILE, EmailScorer, load_text_config
+    from phone_lookup import MODEL_FILE as PHONE_MODEL_FILE
+    from table_io import read_table
+
+    parser = argparse.ArgumentParser(description="Xuất / kiểm tra model compact (memory map)")
+    parser.add_argument("cmd", choices=["export", "check", "quantize"])
+    parser.add_argument("--only", choices=["email", "phone"], default=None)
+    parser.add_argument("--email-sample", type=Path, default=Path("splits/dataset_test.csv"))
+    parser.add_argument("--phone-sample", type=Path, default=Path("splits_phone/phone_test.csv"))
+    parser.add_argument("--limit", type=int, default=20_000, help="số dòng mẫu tối đa khi check")
+    parser.add_argument("--dtype", choices=["int8", "float16"], default=QUANT_DTYPE,
+                        help="quantize: kiểu lưu coef / idf")
+    parser.add_argument("--prune-below", type=float, default=PRUNE_BELOW,
+                        help="quantize: bỏ từ có |coef| nhỏ hơn (0 = giữ hết)")
+    parser.add_argument("--max-f1-drop", type=float, default=MAX_F1_DROP,
+                        help="quantize: F1 (tập test) được phép giảm tối đa")
+    parser.add_argument("--max-flip", type=float, default=MAX_FLIP,
+                        help="quantize: tỉ lệ email được phép đổi nhãn tối đa")
+    parser.add_argument("--out", type=Path, default=EMAIL_QUANT_DIR)
+    args = parser.parse_args()
+
+    if args.cmd == "quantize":
+        if not quantize_email(args):
+            from profiling import fail
+            fail(1)
+        return
+
+    import joblib
+    failed = False
+    if args.only in (None, "email") and EMAIL_MODEL_FILE.exists():
+        (vectorizer, model), ms = _timed(lambda: (joblib.load(VECTORIZER_FILE),
+                                                  joblib.load(EMAIL_MODEL_FILE)))
+        print(f"📦 Email joblib: load {ms:.0f} ms")
+        if args.cmd == "export":
+            mb = export_email(vectorizer, model, text_config=load_text_config(VECTORIZER_FILE))
+            print(f"✅ Email compact -> {EMAIL_COMPACT_DIR} ({mb:.1f} MB)")
+        scorer, ms = _timed(EmailScorer.load_compact)
+        print(f"⚡ Email compact: load {ms:.1f} ms")
+        if args.cmd == "check":
+            reference = EmailScorer(vectorizer, model, fused=False,
+                                    **load_text_config(VECTORIZER_FILE))
+            sample = read_table(args.email_sample, columns=["subject", "body"])[:args.limit]
+            texts = scorer.texts(sample)
+            ref = reference.score_texts(reference.texts(sample))
+            diff = float(np.abs(scorer.score_texts(texts) - ref).max(initial=0.0))
+            ok = diff <= PARITY_TOL and scorer.token_budget == reference.token_budget
+            if scorer.token_budget != reference.token_budget:
+                print(f"❌ Token budget lệch: compact {scorer.token_budget}, "
+                      f"joblib {reference.token_budget}")
+            failed |= not ok
+            print(f"{'✅' if ok else '❌'} Email: {len(texts):,} email, lệch tối đa {diff:.2e}")
+
+    if args.only in (None, "phone") and PHONE_MODEL_FILE.exists():
+        model, ms = _timed(joblib.load, PHONE_MODEL_FILE)
+        print(f"📦 Phone joblib: load {ms:.0f} ms")
+        if args.cmd == "export":
+            mb = export_phone(model)
+            print(f"✅ Phone compact -> {PHONE_COMPACT_DIR} ({mb:.1f} MB)")
+        compact, ms = _timed(load_phone)
+        print(f"⚡ Phone compact: load {ms:.1f} ms")
+        if args.cmd == "check":
+            phones = read_table(args.phone_sample, columns=["phone"],
+                                dtype={"phone": str})["phone"].astype(str)[:args.limit]
+            ref = model.predict_proba(phones)[:, 1]
+            diff = float(np.abs(compact.predict_proba(phones)[:, 1] - ref).max(initial=0.0))
+            ok = diff <= PARITY_TOL
+            failed |= not ok
+            print(f"{'✅' if ok else '❌'} Phone: {len(phones):,} số, lệch tối đa {diff:.2e}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# scripts/dedup_email_dataset.py
+"""Loại email trùng y hệt và gần trùng trên toàn bộ dataset email, 1 bước duy nhất.
+
+Thay cho drop_duplicates(subset=["subject", "body"]) ở merge_enron_phishing.py
+và clean_final_dataset.py. Chạy sau clean_final_dataset.py, trước split:
+
+    python scripts/dedup_email_dataset.py --threshold 0.8
+    python scripts/dedup_email_dataset.py --keep-near     # chỉ gán cụm, không bỏ
+
+Lượt 1 đọc bảng theo chunk, chỉ giữ vân tay: hash 64-bit (ghi ra file tạm,
+sort 1 lần để tìm trùng y hệt, giữ dòng đầu tiên), rồi đọc lại để tính chữ ký
+MinHash của các dòng còn lại, cũng ghi ra đĩa. Sau đó ghép cặp bằng LSH theo
+từng band (mọi cặp trong nhóm cùng band + cùng nhãn), kiểm tra Jaccard ước
+lượng >= threshold rồi gom cụm (connected components).
+Lượt 2 đọc lại bảng, ghi các dòng giữ lại kèm cột `cluster` (id cụm gần
+trùng, dùng được làm khoá nhóm khi split). RAM chỉ phụ thuộc cỡ chunk và
+vân tay, không phụ thuộc độ dài body.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+
+from near_dedup import (NUM_PERM, SHINGLE, THRESHOLD, band_hashes, candidate_pairs,
+                        choose_bands, exact_hashes, minhash, perm_seeds, similarity)
+from profiling import set_rows, start_stage, step
+from table_io import TableWriter, iter_table, resolve_table, storage_of, table_path
+
+IN_FILE = Path("data/dataset_email_final_cleaned.csv")
+OUT_FILE = table_path("data/dataset_email_dedup.csv")
+
+CHUNK_SIZE = 2_000
+
+
+def email_text(chunk):
+    return (chunk["subject"].fillna("").astype(str) + " "
+            + chunk["body"].fillna("").astype(str)).to_numpy()
+
+def first_occurrence(in_file, tmp_dir, chunk_size):
+    """Hash 64-bit mọi dòng (ghi ra đĩa) -> (mask dòng đầu tiên của mỗi hash, hash).
+
+    Không giữ set Python: hash nằm trong memmap, sort 1 lần (8 byte/dòng).
+    """
+    hash_path = Path(tmp_dir) / "hash.bin"
+    n = 0
+    with open(hash_path, "wb") as f_hash:
+        for chunk in iter_table(in_file, columns=["subject", "body"], chunksize=chunk_size):
+            exact_hashes(chunk["subject"], chunk["body"]).tofile(f_hash)
+            n += len(chunk)
+    if n == 0:
+        return np.zeros(0, bool), np.zeros(0, np.uint64)
+    h = np.memmap(hash_path, dtype=np.uint64, mode="r", shape=(n,))
+    order = np.argsort(h, kind="stable")
+    hs = h[order]
+    first = np.zeros(n, dtype=bool)
+    first[order[np.r_[True, hs[1:] != hs[:-1]]]] = True
+    del hs
+    return first, h
+
+def fingerprint(in_file, tmp_dir, num_perm, shingle, bands, rows, chunk_size, near):
+    """Lượt 1: vân tay mọi dòng -> dict mảng (chữ ký / band nằm trên đĩa)."""
+    seeds = perm_seeds(num_perm)
+    keep_exact, hashes = first_occurrence(in_file, tmp_dir, chunk_size)
+    uniq_label, uniq_has = [], []
+    sig_path, band_path = Path(tmp_dir) / "sig.bin", Path(tmp_dir) / "bands.bin"
+    start = 0
+    with open(sig_path, "wb") as f_sig, open(band_path, "wb") as f_band:
+        for chunk in iter_table(in_file, columns=["subject", "body", "label"],
+                                chunksize=chunk_size):
+            first = keep_exact[start:start + len(chunk)]
+            start += len(chunk)
+            uniq_label.append(pd.to_numeric(chunk["label"]).to_numpy(dtype=np.int8)[first])
+            if near:
+                sig, has = minhash(email_text(chunk)[first], num_perm, shingle, seeds)
+                uniq_has.append(has)
+                sig.tofile(f_sig)
+                band_hashes(sig, bands, rows).tofile(f_band)
+
+    n_unique = int(keep_exact.sum())
+    fp = {
+        "keep_exact": keep_exact,
+        "hash": np.asarray(hashes[keep_exact]),
+        "label": np.concatenate(uniq_label) if uniq_label else np.zeros(0, np.int8),
+    }
+    del hashes
+    if near and n_unique:
+        fp["has"] = np.concatenate(uniq_has)
+        fp["sig"] = np.memmap(sig_path, dtype=np.uint32, mode="r", shape=(n_unique, num_perm))
+        fp["bands"] = np.memmap(band_path, dtype=np.uint64, mode="r", shape=(n_unique, bands))
+    return fp
+
+def near_clusters(fp, threshold):
+    """Đại diện cụm gần trùng của từng dòng unique (chỉ số nhỏ nhất trong cụm)."""
+    n = len(fp["hash"])
+    if "sig" not in fp:
+        return np.arange(n), 0
+    edges_a, edges_b = [], []
+    n_candidates = 0
+    for b in range(fp["bands"].shape[1]):
+        a, m = candidate_pairs(fp["bands"][:, b], fp["has"], fp["label"])
+        n_candidates += len(a)
+        ok = similarity(fp["sig"], a, m) >= threshold
+        edges_a.append(a[ok])
+        edges_b.append(m[ok])
+    a, m = np.concatenate(edges_a), np.concatenate(edges_b)
+    graph = sp.coo_matrix((np.ones(len(a), dtype=np.int8), (a, m)), shape=(n, n))
+    _, comp = connected_components(graph, directed=False)
+    rep = np.full(comp.max() + 1, n, dtype=np.int64)
+    np.minimum.at(rep, comp, np.arange(n))
+    return rep[comp], n_candidates
+
+def write_output(in_file, out_file, fp, rep, keep_near, chunk_size):
+    """Lượt 2: ghi các dòng giữ lại + cột cluster."""
+    keep_exact = fp["keep_exact"]
+    uniq_id = np.cumsum(keep_exact) - 1  # chỉ số dòng unique của từng dòng
+    cluster_ids = np.char.mod("%016x", fp["hash"][rep]) if len(rep) else np.zeros(0, "U16")
+    keep_uniq = np.ones(len(rep), dtype=bool) if keep_near else rep == np.arange(len(rep))
+
+    tmp_file = out_file.with_name(out_file.name + ".tmp")
+    writer = None
+    start = 0
+    for chunk in iter_table(in_file, chunksize=chunk_size):
+        end = start + len(chunk)
+        ke = keep_exact[start:end]
+        ids = uniq_id[start:end]
+        mask = ke & keep_uniq[np.where(ke, ids, 0)]
+        out = chunk[mask].copy()
+        out["cluster"] = cluster_ids[ids[mask]]
+        if writer is None:
+            writer = TableWriter(tmp_file, list(out.columns), storage=storage_of(out_file))
+        writer.write(out)
+        start = end
+    if writer is None:
+        writer = TableWriter(tmp_file, ["cluster"], storage=storage_of(out_file))
+    writer.close()
+    os.replace(tmp_file, out_file)
+    return int(keep_uniq.sum()) if not keep_near else len(rep)
+
+def main():
+    start_stage()
+    parser = argparse.ArgumentParser(description="Loại email trùng / gần trùng (hash + MinHash/LSH)")
+    parser.add_argument("--input", type=Path, default=IN_FILE)
+    parser.add_argument("--out", type=Path, default=OUT_FILE)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="Jaccard tối thiểu để coi là gần trùng (0-1)")
+    parser.add_argument("--num-perm", type=int, default=NUM_PERM)
+    parser.add_argument("--shingle", type=int, default=SHINGLE, help="số từ mỗi shingle")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--exact-only", action="store_true", help="chỉ loại trùng y hệt")
+    parser.add_argument("--keep-near", action="store_true",
+                        help="giữ email gần trùng, chỉ gán cột cluster")
+    args = parser.parse_args()
+
+    in_file = resolve_table(args.input)
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    bands, rows = choose_bands(args.threshold, args.num_perm)
+    near = not args.exact_only
+    t0 = time.perf_counter()
+
+    print(f"📥 Đang đọc {in_file} ...")
+    if near:
+        print(f"🔑 MinHash {args.num_perm} hoán vị, LSH {bands} band × {rows} dòng, "
+              f"ngưỡng Jaccard {args.threshold}")
+    with tempfile.TemporaryDirectory(dir=args.out.parent) as tmp_dir:
+        with step("fingerprint", quiet=True) as s:
+            fp = fingerprint(in_file, tmp_dir, args.num_perm, args.shingle, bands, rows,
+                             args.chunk_size, near)
+            n_rows, n_unique = len(fp["keep_exact"]), len(fp["hash"])
+            s.rows = n_rows
+        t1 = time.perf_counter()
+        with step("lsh_cluster", rows=n_unique, quiet=True):
+            rep, n_candidates = near_clusters(fp, args.threshold)
+        n_near = int((rep != np.arange(n_unique)).sum())
+        t2 = time.perf_counter()
+        with step("write", quiet=True) as s:
+            n_out = s.rows = write_output(in_file, args.out, fp, rep, args.keep_near, args.chunk_size)
+        del fp  # đóng memmap trước khi xoá thư mục tạm
+    set_rows(n_rows)
+
+    print("✅ DEDUP HOÀN TẤT!")
+    print(f"📌 Số dòng vào: {n_rows:,}")
+    print(f"📌 Trùng y hệt: {n_rows - n_unique:,}")
+    print(f"📌 Gần trùng: {n_near:,} ({n_candidates:,} cặp ứng viên LSH)"
+          + (" — giữ lại, chỉ gán cluster" if args.keep_near else ""))
+    print(f"📌 Số dòng còn lại: {n_out:,}")
+    print(f"⏱ Vân tay {t1 - t0:.1f}s | LSH {t2 - t1:.1f}s | ghi {time.perf_counter() - t2:.1f}s")
+    print("📌 File lưu tại:", args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+# scripts/email_cascade.py
+"""Chấm email 2 tầng: lọc nhanh theo người gửi / domain / subject trước.
+
+Tầng 1 (screen) là 1 TF-IDF + Logistic Regression rất nhỏ trên "header text":
+
+    dom_<domain> base_<2 nhãn cuối của domain> from_<địa chỉ gửi> <subject>
+
+(email_from / domain do parse_enron.py, parse_phishing_mbox.py tách sẵn), chấm
+bằng FusedLinearScorer nên chỉ tốn vài token mỗi email. Email có xác suất
+screen <= lo được coi là HAM, >= hi là PHISHING ngay; chỉ phần còn lại mới
+qua model đầy đủ (subject + body, email_best_model).
+
+Ngưỡng tune trên splits/dataset_val.csv:
+  - hi: ngưỡng nhỏ nhất mà các email >= hi có precision >= CASCADE_PRECISION;
+  - lo: ngưỡng lớn nhất mà recall của cả cascade >= CASCADE_RECALL (không đòi
+    cao hơn recall của riêng model đầy đủ).
+
+    python scripts/email_cascade.py train          # train screen + tune ngưỡng
+    python scripts/email_cascade.py bench          # so độ trễ cascade / model đầy đủ
+
+Artifact: artifacts/email/cascade/ (screen/ là thư mục compact_model.py +
+cascade.json chứa ngưỡng và kết quả VAL / TEST).
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from email_scoring import ARTIFACT_DIR, EmailScorer
+
+CASCADE_DIR = ARTIFACT_DIR / "cascade"
+SPLIT_DIR = Path("splits")
+COLUMNS = ["email_from", "domain", "subject", "body", "label"]
+
+# Mục tiêu khi tune ngưỡng trên VAL
+CASCADE_RECALL = float(os.environ.get("EMAIL_CASCADE_RECALL", "0.99"))
+CASCADE_PRECISION = float(os.environ.get("EMAIL_CASCADE_PRECISION", "0.995"))
+
+_ADDRESS = re.compile(r"[\w.+\-]+@[\w.\-]+")
+_DOMAIN = re.compile(r"@([A-Za-z0-9.\-]+)")
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+# ======== HEADER TEXT ========
+
+def _str(x):
+    return "" if x is None or (isinstance(x, float) and np.isnan(x)) else str(x)
+
+def _token(x):
+    return _NON_WORD.sub("_", x.lower()).strip("_")
+
+def header_text(email_from, domain, subject):
+    """Chuỗi cho model screen: domain / địa chỉ gửi thành 1 token + subject."""
+    email_from, domain = _str(email_from), _str(domain)
+    if not domain:
+        # như parse_enron.py: domain lấy từ From
+        m = _DOMAIN.search(email_from)
+        domain = m.group(1) if m else ""
+    m = _ADDRESS.search(email_from)
+    address = m.group(0) if m else email_from
+    base = ".".join(domain.lower().rsplit(".", 2)[-2:])
+    return f"dom_{_token(domain)} base_{_token(base)} from_{_token(address)} {_str(subject)}"
+
+def header_texts(items):
+    """DataFrame (email_from, domain, subject) hoặc dãy (subject, body, email_from, domain)."""
+    if hasattr(items, "columns"):
+        cols = [items[c] if c in items.columns else [""] * len(items)
+                for c in ("email_from", "domain", "subject")]
+        return [header_text(f, d, s) for f, d, s in zip(*cols)]
+    return [header_text(it[2] if len(it) > 2 else "", it[3] if len(it) > 3 else "", it[0])
+            for it in items]
+
+
+# ======== TUNE NGƯỠNG ========
+
+def tune_thresholds(p_screen, full_pred, y, target_recall=CASCADE_RECALL,
+                    target_precision=CASCADE_PRECISION):
+    """(lo, hi) trên VAL; lo = -1 / hi = 2 nghĩa là không thoát sớm phía đó.
+
+    Chỉ xét lo <= 0.5 < hi để xác suất screen của email thoát sớm cùng phía
+    với nhãn quyết định.
+    """
+    p_screen, y = np.asarray(p_screen, dtype=float), np.asarray(y).astype(bool)
+    full_pred = np.asarray(full_pred).astype(bool)
+    n_pos = max(int(y.sum()), 1)
+
+    # hi: top-k theo p giảm dần, k lớn nhất có precision >= mục tiêu
+    order = np.argsort(-p_screen, kind="stable")
+    ps, ys = p_screen[order], y[order]
+    k = np.arange(1, len(ps) + 1)
+    precision = np.cumsum(ys) / k
+    boundary = np.append(ps[1:] < ps[:-1], True)
+    ok = boundary & (precision >= target_precision) & (ps > 0.5)
+    hi = float(ps[k[ok][-1] - 1]) if ok.any() else 2.0
+
+    # lo: k email p thấp nhất thoát thành HAM; recall mất = TP của model đầy đủ trong k email đó
+    target = min(target_recall, (full_pred & y).sum() / n_pos)
+    early_phish = p_screen >= hi
+    tp_fixed = int((early_phish & y).sum())
+    mid_tp = full_pred & y & ~early_phish
+    order = np.argsort(p_screen, kind="stable")
+    ps = p_screen[order]
+    lost = np.cumsum(mid_tp[order])
+    recall = (tp_fixed + mid_tp.sum() - lost) / n_pos
+    boundary = np.append(ps[1:] > ps[:-1], True)
+    ok = boundary & (recall >= target - 1e-12) & (ps <= 0.5) & (ps < hi)
+    lo = float(ps[np.nonzero(ok)[0][-1]]) if ok.any() else -1.0
+    return lo, hi
+
+
+# ======== CASCADE ========
+
+class CascadeScorer:
+    """screen (FusedLinearScorer) -> ngưỡng lo/hi -> model đầy đủ cho phần còn lại."""
+
+    def __init__(self, screen, full, lo, hi):
+        self.screen = screen
+        self.full = full
+        self.lo = lo
+        self.hi = hi
+        self.n_items = 0
+        self.n_full = 0
+        # score_stages có thể chạy song song trên nhiều luồng (MicroBatcher, thread pool)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, full, path=CASCADE_DIR):
+        """`full`: EmailScorer đã load (joblib hoặc compact)."""
+        from compact_model import fused_scorer, load_email
+        config = json.loads((Path(path) / "cascade.json").read_text(encoding="utf-8"))
+        screen = fused_scorer(*load_email(Path(path) / "screen"))
+        return cls(screen, full, config["lo"], config["hi"])
+
+    def score_stages(self, items, texts=None):
+        """-> (xác suất phishing, tầng: 0 HAM sớm / 1 PHISHING sớm / 2 model đầy đủ)."""
+        p = self.screen.predict_proba(header_texts(items))[:, 1]
+        stage = np.full(len(p), 2, dtype=np.int8)
+        stage[p <= self.lo] = 0
+        stage[p >= self.hi] = 1
+        mid = np.nonzero(stage == 2)[0]
+        if len(mid):
+            if texts is None:
+                texts = self.full.texts(items.iloc[mid] if hasattr(items, "iloc")
+                                        else [items[i][:2] for i in mid])
+            else:
+                texts = [texts[i] for i in mid]
+            p[mid] = self.full.score_texts(texts)
+        with self._lock:
+            self.n_items += len(p)
+            self.n_full += len(mid)
+        return p, stage
+
+    def score(self, items):
+        """Như EmailScorer.score; item là (subject, body, email_from, domain)."""
+        return self.score_stages(items)[0]
+
+    def stats(self):
+        with self._lock:
+            n_items, n_full = self.n_items, self.n_full
+        return {"items": n_items, "full_model": n_full,
+                "early_exit": 1 - n_full / n_items if n_items else 0.0}
+
+
+# ======== TRAIN / BENCH ========
+
+def load_split(path):
+    from table_io import read_table
+    df = read_table(path, columns=COLUMNS)
+    for col in ("email_from", "domain", "subject", "body"):
+        df[col] = df[col].fillna("")
+    return df
+
+def train(args):
+    import pandas as pd
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+
+    from compact_model import export_email, fused_scorer
+    from metrics import get_metrics
+    from profiling import set_rows, start_stage, step
+
+    start_stage()
+
+    train_df, val_df, test_df = (load_split(args.split_dir / f"dataset_{s}.csv")
+                                 for s in ("train", "val", "test"))
+    y_val = val_df["label"].to_numpy(dtype=int)
+    y_test = test_df["label"].to_numpy(dtype=int)
+    print(f"➡ TRAIN {len(train_df):,} | VAL {len(val_df):,} | TEST {len(test_df):,} email")
+
+    # ==== 1) Screen: header text -> TF-IDF unigram -> LR ====
+    with step("train screen", rows=len(train_df)) as s:
+        vectorizer = TfidfVectorizer(min_df=2, sublinear_tf=True)
+        X = vectorizer.fit_transform(header_texts(train_df))
+        model = LogisticRegression(C=args.C, class_weight="balanced", solver="liblinear")
+        model.fit(X, train_df["label"].to_numpy(dtype=int))
+        screen = fused_scorer(vectorizer, model)
+    print(f"✅ Screen: {X.shape[1]:,} token, train {s.record['wall_s']:.1f}s")
+    set_rows(len(train_df))
+
+    # ==== 2) Tune ngưỡng trên VAL ====
+    full = EmailScorer.load()
+    p_val = screen.predict_proba(header_texts(val_df))[:, 1]
+    full_val = full.score(val_df) > 0.5
+    lo, hi = tune_thresholds(p_val, full_val, y_val, args.recall, args.precision)
+    cascade = CascadeScorer(screen, full, lo, hi)
+
+    # ==== 3) Đánh giá: model đầy đủ vs cascade ====
+    report = {"lo": lo, "hi": hi, "target_recall": args.recall,
+              "target_precision": args.precision}
+    rows = []
+    for split, df, y in (("val", val_df, y_val), ("test", test_df, y_test)):
+        full_pred = (full.score(df) > 0.5).astype(int)
+        p, stage = cascade.score_stages(df)
+        casc_pred = (p > 0.5).astype(int)
+        early = float((stage != 2).mean()) if len(stage) else 0.0
+        for name, pred in (("full", full_pred), ("cascade", casc_pred)):
+            m = get_metrics(y, pred)
+            rows.append({"split": split, "model": name, **m,
+                         "early_exit": early if name == "cascade" else 0.0})
+        report[split] = {"early_exit": early, "early_ham": float((stage == 0).mean()),
+                         "early_phish": float((stage == 1).mean())}
+
+    print(f"\n🎯 Ngưỡng: HAM nếu p <= {lo:.4f}, PHISHING nếu p >= {hi:.4f}")
+    print(f"{'split':<6}{'model':<9}{'precision':>10}{'recall':>8}{'F1':>8}{'thoát sớm':>11}")
+    for r in rows:
+        print(f"{r['split']:<6}{r['model']:<9}{r['precision']:>10.4f}{r['recall']:>8.4f}"
+              f"{r['f1']:>8.4f}{r['early_exit']:>11.1%}")
+
+    # ==== 4) Lưu ====
+    args.out.mkdir(parents=True, exist_ok=True)
+    export_email(vectorizer, model, args.out / "screen")
+    (args.out / "cascade.json").write_text(json.dumps(report, indent=1), encoding="utf-8")
+    pd.DataFrame(rows).to_csv(args.out / "cascade_results.csv", index=False)
+    print(f"\n📌 Cascade saved to: {args.out}")
+
+def bench(args):
+    """Độ trễ từng email (batch 1) và thông lượng batch: model đầy đủ vs cascade."""
+    from latency import latency_report
+
+    df = load_split(args.sample).head(args.limit)
+    full = EmailScorer.load()
+    cascade = CascadeScorer.load(full, args.out)
+    items = list(zip(df["subject"], df["body"], df["email_from"], df["domain"]))
+    for name, fn in (("full", full.score), ("cascade", cascade.score)):
+        fn(items[:10])  # warm-up
+        for batch in args.batch:
+            latencies = []
+            for i in range(0, len(items), batch):
+                t0 = time.perf_counter_ns()
+                fn(items[i:i + batch])
+                latencies.append(time.perf_counter_ns() - t0)
+            r = latency_report(latencies, len(items))
+            print(f"{name:<8} batch {batch:<4} p50 {r['p50_us']:8.1f} µs | "
+                  f"p99 {r['p99_us']:8.1f} µs | {r['items_per_s']:,.0f} email/s")
+    print(f"📊 Thoát sớm: {cascade.stats()['early_exit']:.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Cascade email: screen header -> model đầy đủ")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_train = sub.add_parser("train", help="train screen + tune ngưỡng trên VAL")
+    p_train.add_argument("--split-dir", type=Path, default=SPLIT_DIR)
+    p_train.add_argument("--recall", type=float, default=CASCADE_RECALL)
+    p_train.add_argument("--precision", type=float, default=CASCADE_PRECISION)
+    p_train.add_argument("--C", type=float, default=1.0)
+    p_bench = sub.add_parser("bench", help="so độ trễ cascade / model đầy đủ")
+    p_bench.add_argument("--sample", type=Path, default=SPLIT_DIR / "dataset_test.csv")
+    p_bench.add_argument("--limit", type=int, default=5_000)
+    p_bench.add_argument("--batch", type=int, nargs="+", default=[1, 256])
+    for p in (p_train, p_bench):
+        p.add_argument("--out", type=Path, default=CASCADE_DIR)
+    args = parser.parse_args()
+    (train if args.cmd == "train" else bench)(args)
+
+
+if __name__ == "__main__":
+    main()
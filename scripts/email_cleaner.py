@@ -0,0 +1,82 @@
+# scripts/email_cleaner.py
+"""Làm sạch body email: 1 regex gộp, 1 lượt quét mỗi email.
+
+Cho kết quả giống hệt 4 bước str.replace trước đây của clean_final_dataset.py
+(bỏ HTML tag -> bỏ ký tự lạ -> thu gọn khoảng trắng -> strip): mọi đoạn liên
+tiếp gồm tag, ký tự ngoài [a-zA-Z0-9.,!?@:/-] hoặc khoảng trắng được thay bằng
+đúng 1 dấu cách (JUNK_PATTERN), nên cả cột chỉ cần 1 lần str.replace thay vì 3.
+clean_body là bản cho từng email, cùng kết quả. Làm sạch 2 lần cho kết quả
+như 1 lần, nên các parser có thể gọi clean_body ngay lúc parse (--clean-body)
+mà không ảnh hưởng bước sau.
+
+    from email_cleaner import clean_body, keep_body
+    body = clean_body(raw_body)
+    if keep_body(body): ...
+"""
+
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+# Giới hạn độ dài body sau khi làm sạch (giữ nếu MIN_LEN < len < MAX_LEN)
+MIN_LEN = 20
+MAX_LEN = 50_000
+
+# Số dòng mỗi task khi chạy bằng process pool
+CHUNK_SIZE = 20_000
+
+JUNK_PATTERN = r"(?:<[^>]+>|[^a-zA-Z0-9.,!?@:/\-])+"
+
+# Bản cho từng email: với re của Python, tách tag / ký tự lạ / khoảng trắng
+# nhanh hơn chạy JUNK_PATTERN
+_TAG = re.compile(r"<[^>]+>")
+_CHARS = re.compile(r"[^a-zA-Z0-9\s.,!?@:/\-]+")
+
+
+def clean_body(text):
+    """Body thô -> body đã làm sạch (chuỗi rỗng nếu không phải str)."""
+    if not isinstance(text, str):
+        return ""
+    if "<" in text:
+        text = _TAG.sub(" ", text)
+    return " ".join(_CHARS.sub(" ", text).split())
+
+def keep_body(body):
+    return MIN_LEN < len(body) < MAX_LEN
+
+def clean_frame(df):
+    """Làm sạch cột body và bỏ dòng có body quá ngắn/dài (body NaN bị bỏ)."""
+    body = df["body"].str.replace(JUNK_PATTERN, " ", regex=True).str.strip()
+    length = body.str.len()
+    keep = (length > MIN_LEN) & (length < MAX_LEN)
+    out = df[keep].copy()
+    out["body"] = body[keep]
+    return out
+
+def clean_frames(frames, workers=1):
+    """Làm sạch 1 dãy DataFrame (chunk), giữ thứ tự; workers > 1 dùng process pool.
+
+    Chỉ giữ tối đa 2 * workers chunk đang xử lý, nên `frames` có thể là
+    iter_table(...) của bảng lớn hơn RAM.
+    """
+    if workers <= 1:
+        yield from map(clean_frame, frames)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for frame in frames:
+            pending.append(pool.submit(clean_frame, frame))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def clean_dataframe(df, workers=os.cpu_count() or 1, chunk_size=CHUNK_SIZE):
+    """clean_frame cho cả bảng, chia chunk chạy song song nếu bảng đủ lớn."""
+    if workers <= 1 or len(df) <= chunk_size:
+        return clean_frame(df)
+    chunks = (df.iloc[i:i + chunk_size] for i in range(0, len(df), chunk_size))
+    return pd.concat(list(clean_frames(chunks, workers)))
@@ -0,0 +1,349 @@
+# scripts/email_scoring.py
+"""Chấm điểm email phishing: load tfidf_vectorizer + email_best_model 1 lần.
+
+Đầu vào là các cặp (subject, body); text được ghép giống hệt lúc train
+(train_email_models.py), kể cả cắt bớt body theo token budget nếu model được
+train với EMAIL_TOKEN_BUDGET (lưu trong tfidf_vectorizer.json / meta compact).
+Mỗi batch chỉ gọi tfidf.transform 1 lần -> 1 ma trận thưa, rồi predict_proba
+1 lần cho cả batch. Nếu model là tuyến tính (LR, SGD, Linear SVM, Complement
+NB) thì bỏ qua ma trận thưa: FusedLinearScorer (compact_model.py) cộng thẳng
+idf * coef của từng từ, cùng kết quả.
+
+Khi nhiều luồng gửi từng email một, MicroBatcher gom các request đến trong
+khoảng `max_wait_ms` (tối đa `max_batch` email) thành 1 batch.
+
+    python scripts/email_scoring.py score --subject "Verify account" --body "Click here"
+    python scripts/email_scoring.py score --input splits/dataset_test.csv --out scores.csv
+    python scripts/email_scoring.py bench --batch 1 32 256      # đo p50/p99, email/s
+    python scripts/email_scoring.py bench --clients 16          # đo qua MicroBatcher
+"""
+
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from latency import latency_report
+
+ARTIFACT_DIR = Path("artifacts/email")
+VECTORIZER_FILE = ARTIFACT_DIR / "tfidf_vectorizer.joblib"
+MODEL_FILE = ARTIFACT_DIR / "email_best_model.joblib"
+# Bản xuất memory map (compact_model.py), load nhanh hơn 2 file joblib
+COMPACT_DIR = ARTIFACT_DIR / "compact"
+
+# Model tuyến tính: chấm bằng FusedLinearScorer (tách từ + cộng điểm, không dựng
+# ma trận TF-IDF). EMAIL_FUSED=0 để luôn dùng transform + predict_proba.
+FUSED = os.environ.get("EMAIL_FUSED", "1") != "0"
+
+# Token budget: chỉ giữ EMAIL_TOKEN_BUDGET token (tách theo khoảng trắng) của
+# body, gồm phần đầu và TAIL_FRACTION phần cuối; subject luôn giữ nguyên.
+# 0 = không cắt. Chỉ đọc lúc train, lúc chấm dùng giá trị lưu cùng model.
+TOKEN_BUDGET = int(os.environ.get("EMAIL_TOKEN_BUDGET", "0"))
+TAIL_FRACTION = 0.25
+
+# Mặc định của MicroBatcher
+MAX_BATCH = 256
+MAX_WAIT_MS = 2.0
+
+
+def _text(x):
+    return "" if x is None or (isinstance(x, float) and np.isnan(x)) else str(x)
+
+def truncate_body(body, budget, tail_fraction=TAIL_FRACTION):
+    """Giữ `budget` token đầu + cuối của body (token = chuỗi không khoảng trắng).
+
+    Body ngắn hơn budget giữ nguyên; body dài thì phần giữa bị bỏ và các token
+    còn lại nối bằng 1 dấu cách. Body < 2 * budget ký tự không thể có quá
+    budget token nên trả về ngay, không cần tách.
+    """
+    if not budget or len(body) < 2 * budget:
+        return body
+    tail = int(budget * tail_fraction)
+    head = budget - tail
+    parts = body.split(None, head)
+    if len(parts) <= head:
+        return body
+    if not tail:
+        return " ".join(parts[:head])
+    # parts[head] là phần còn lại sau head token: lấy tail token cuối của nó
+    rest = parts[head].rsplit(None, tail)
+    if len(rest) <= tail:
+        return body
+    return " ".join(parts[:head] + rest[1:])
+
+def email_text(subject, body, budget=0, tail_fraction=TAIL_FRACTION):
+    """Ghép subject + body như train_email_models.py (fillna("") rồi strip)."""
+    return (_text(subject) + " " + truncate_body(_text(body), budget, tail_fraction)).strip()
+
+def email_texts(pairs, budget=0, tail_fraction=TAIL_FRACTION):
+    """Dãy (subject, body, ...) hoặc DataFrame có cột subject/body -> list text."""
+    if isinstance(pairs, pd.DataFrame):
+        body = pairs["body"].fillna("").astype(str)
+        if budget:
+            long = body.str.len() >= 2 * budget
+            if long.any():
+                cut = [truncate_body(b, budget, tail_fraction) for b in body[long]]
+                body = body.mask(long, pd.Series(cut, index=body.index[long], dtype=body.dtype))
+        return (pairs["subject"].fillna("").astype(str) + " " + body).str.strip().tolist()
+    return [email_text(subject, body, budget, tail_fraction) for subject, body, *_ in pairs]
+
+def text_config_file(vectorizer_file):
+    """File JSON cạnh vectorizer, ghi cách ghép text lúc train (token budget)."""
+    return Path(vectorizer_file).with_suffix(".json")
+
+def save_text_config(vectorizer_file, budget, tail_fraction=TAIL_FRACTION):
+    text_config_file(vectorizer_file).write_text(
+        json.dumps({"token_budget": int(budget), "tail_fraction": tail_fraction}))
+
+def load_text_config(vectorizer_file):
+    """{"token_budget", "tail_fraction"}; model train trước khi có budget -> 0."""
+    path = text_config_file(vectorizer_file)
+    config = {"token_budget": 0, "tail_fraction": TAIL_FRACTION}
+    if path.exists():
+        config.update(json.loads(path.read_text()))
+    return config
+
+
+class EmailScorer:
+    """Vectorizer + model đã train, load 1 lần và dùng cho mọi request."""
+
+    def __init__(self, vectorizer, model, fused=FUSED, token_budget=0,
+                 tail_fraction=TAIL_FRACTION):
+        self.vectorizer = vectorizer
+        self.model = model
+        self.token_budget = token_budget
+        self.tail_fraction = tail_fraction
+        self.fused = None
+        if fused:
+            from compact_model import fused_scorer
+            self.fused = fused_scorer(vectorizer, model)
+
+    @classmethod
+    def load(cls, vectorizer_file=VECTORIZER_FILE, model_file=MODEL_FILE):
+        import joblib
+        return cls(joblib.load(vectorizer_file), joblib.load(model_file),
+                   **load_text_config(vectorizer_file))
+
+    @classmethod
+    def load_compact(cls, path=COMPACT_DIR):
+        """Load bản compact_model.py (mảng mmap, dùng chung giữa các process)."""
+        from compact_model import load_email
+        vectorizer, head = load_email(path)
+        return cls(vectorizer, head, **vectorizer.text_config)
+
+    def texts(self, pairs):
+        """Ghép (subject, body) / DataFrame thành text với token budget của model."""
+        return email_texts(pairs, self.token_budget, self.tail_fraction)
+
+    def score_texts(self, texts):
+        """Xác suất phishing cho list text đã ghép sẵn."""
+        if len(texts) == 0:
+            return np.zeros(0)
+        if self.fused is not None:
+            return self.fused.predict_proba(texts)[:, 1]
+        X = self.vectorizer.transform(texts)
+        return self.model.predict_proba(X)[:, 1]
+
+    def score(self, pairs):
+        """Xác suất phishing (label 1) cho 1 batch (subject, body) hoặc DataFrame."""
+        return self.score_texts(self.texts(pairs))
+
+    def score_one(self, subject, body):
+        text = email_text(subject, body, self.token_budget, self.tail_fraction)
+        return float(self.score_texts([text])[0])
+
+
+_STOP = object()
+
+class MicroBatcher:
+    """Gom các request lẻ từ nhiều luồng thành batch cho `score_fn`.
+
+    `score_fn(items) -> mảng kết quả` cùng độ dài với `items`. Một luồng nền
+    lấy request đầu tiên rồi chờ thêm tối đa `max_wait_ms` (hoặc tới khi đủ
+    `max_batch`) trước khi gọi `score_fn` 1 lần cho cả batch.
+    """
+
+    def __init__(self, score_fn, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.score_fn = score_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.batch_sizes = []
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        fut = Future()
+        self._queue.put((item, fut))
+        return fut
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            try:
+                nxt = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if nxt is _STOP:
+                self._queue.put(_STOP)  # dừng sau khi xử lý xong batch này
+                break
+            batch.append(nxt)
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            items = [item for item, _ in batch]
+            self.batch_sizes.append(len(items))
+            try:
+                results = self.score_fn(items)
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), res in zip(batch, results):
+                fut.set_result(res)
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ======== BENCHMARK ========
+
+def bench_batches(scorer, texts, batch_size, n_calls):
+    """Gọi trực tiếp score_texts với batch cố định."""
+    rng = np.random.default_rng(42)
+    texts = np.asarray(texts, dtype=object)
+    scorer.score_texts(texts[:batch_size])  # warm-up
+    latencies = []
+    for _ in range(n_calls):
+        batch = texts[rng.integers(0, len(texts), batch_size)]
+        t0 = time.perf_counter_ns()
+        scorer.score_texts(batch)
+        latencies.append(time.perf_counter_ns() - t0)
+    return latency_report(latencies, n_calls * batch_size)
+
+def bench_clients(scorer, texts, n_clients, n_requests, max_batch, max_wait_ms):
+    """`n_clients` luồng, mỗi luồng gửi lần lượt từng email qua MicroBatcher."""
+    texts = np.asarray(texts, dtype=object)
+    per_client = max(n_requests // n_clients, 1)
+    latencies = [[] for _ in range(n_clients)]
+    scorer.score_texts(texts[:max_batch])  # warm-up
+
+    with MicroBatcher(scorer.score_texts, max_batch, max_wait_ms) as batcher:
+        def client(i):
+            rng = np.random.default_rng(i)
+            for j in rng.integers(0, len(texts), per_client):
+                t0 = time.perf_counter_ns()
+                batcher.submit(texts[j]).result()
+                latencies[i].append(time.perf_counter_ns() - t0)
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(n_clients)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - t0
+
+    report = latency_report(np.concatenate(latencies), n_clients * per_client, wall_s=wall)
+    report["mean_batch"] = float(np.mean(batcher.batch_sizes))
+    return report
+
+def print_report(title, report, extra=""):
+    print(f"📊 {title}: {report['calls']:,} lần gọi{extra}")
+    print(f"⏱ p50 {report['p50_us'] / 1000:.2f} ms | p99 {report['p99_us'] / 1000:.2f} ms | "
+          f"max {report['max_us'] / 1000:.2f} ms | {report['items_per_s']:,.0f} email/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chấm điểm email phishing (tfidf + model)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_score = sub.add_parser("score", help="chấm điểm 1 email hoặc 1 file subject/body")
+    p_score.add_argument("--subject", default="")
+    p_score.add_argument("--body", default="")
+    p_score.add_argument("--input", type=Path, help="file csv/parquet có cột subject, body")
+    p_score.add_argument("--out", type=Path, help="ghi kết quả (thêm cột proba)")
+    p_score.add_argument("--batch-size", type=int, default=10_000)
+
+    p_bench = sub.add_parser("bench", help="đo thông lượng / độ trễ")
+    p_bench.add_argument("--batch", type=int, nargs="+", default=[1, 32, 256],
+                         help="các cỡ batch gọi trực tiếp")
+    p_bench.add_argument("--calls", type=int, default=200)
+    p_bench.add_argument("--clients", type=int, default=0,
+                         help="> 0: đo thêm N luồng gửi từng email qua MicroBatcher")
+    p_bench.add_argument("--requests", type=int, default=5_000)
+    p_bench.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    p_bench.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    p_bench.add_argument("--sample", type=Path, default=Path("splits/dataset_test.csv"),
+                         help="file có cột subject, body để lấy email mẫu")
+
+    for p in (p_score, p_bench):
+        p.add_argument("--vectorizer", type=Path, default=VECTORIZER_FILE)
+        p.add_argument("--model", type=Path, default=MODEL_FILE)
+        p.add_argument("--compact", type=Path, nargs="?", const=COMPACT_DIR, default=None,
+                       help="dùng bản compact (mmap) thay cho 2 file joblib")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    if args.compact is not None:
+        scorer = EmailScorer.load_compact(args.compact)
+    else:
+        scorer = EmailScorer.load(args.vectorizer, args.model)
+    print(f"✅ Đã load model ({time.perf_counter() - t0:.2f}s)")
+
+    from table_io import read_table, write_table
+
+    if args.cmd == "score":
+        if args.input is None:
+            print(f"{scorer.score_one(args.subject, args.body):.4f}")
+            return
+        df = read_table(args.input)
+        texts = scorer.texts(df)
+        proba = np.concatenate([scorer.score_texts(texts[i:i + args.batch_size])
+                                for i in range(0, len(texts), args.batch_size)] or [np.zeros(0)])
+        if args.out is None:
+            for p in proba:
+                print(f"{p:.4f}")
+            return
+        df["proba"] = proba
+        write_table(df, args.out)
+        print(f"✅ {len(df):,} email -> {args.out}")
+        return
+
+    texts = scorer.texts(read_table(args.sample, columns=["subject", "body"]))
+    print(f"➡ {len(texts):,} email mẫu từ {args.sample}")
+    for batch_size in args.batch:
+        report = bench_batches(scorer, texts, batch_size, args.calls)
+        print_report(f"batch {batch_size}", report)
+    if args.clients > 0:
+        report = bench_clients(scorer, texts, args.clients, args.requests,
+                               args.max_batch, args.max_wait_ms)
+        print_report(f"{args.clients} client qua MicroBatcher", report,
+                     f" | batch trung bình {report['mean_batch']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
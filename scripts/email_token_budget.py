@@ -0,0 +1,140 @@
+# scripts/email_token_budget.py
+"""Báo cáo F1 ↔ tốc độ khi cắt body email theo token budget (EMAIL_TOKEN_BUDGET).
+
+Với mỗi budget (0 = giữ nguyên body), fit lại vectorizer + model email trên
+tập TRAIN đã cắt (cùng tham số với tfidf_vectorizer.joblib /
+email_best_model.joblib nếu đã train, không tìm lại tham số), rồi đo trên
+VAL:
+
+  - F1 / precision / recall;
+  - thời gian fit, email/s khi chấm theo batch (kể cả bước ghép + cắt text);
+  - p50 / p99 / max (ms) khi chấm từng email một trên các email dài nhất
+    (đuôi độ trễ do email rất dài là thứ budget cắt đi);
+  - số token body trung bình sau khi cắt.
+
+    python scripts/email_token_budget.py
+    python scripts/email_token_budget.py --budgets 0,128,256,512 --out reports/budget.csv
+
+Budget được gợi ý là budget nhỏ nhất có F1 kém budget 0 không quá
+F1_TOLERANCE (EMAIL_F1_TOLERANCE, model_zoo.py); train lại với
+EMAIL_TOKEN_BUDGET=<budget> để dùng.
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+from email_scoring import MODEL_FILE, VECTORIZER_FILE, EmailScorer, email_texts
+from latency import latency_report
+from metrics import get_metrics
+from model_zoo import F1_TOLERANCE
+from profiling import fail
+from table_io import read_table
+
+SPLIT_DIR = Path("splits")
+OUT_FILE = Path("reports/email_token_budget.csv")
+BUDGETS = "0,64,128,256,512,1024"
+COLUMNS = ["subject", "body", "label"]
+
+BATCH = 256
+# Số email dài nhất của VAL dùng để đo độ trễ từng email
+N_LONGEST = 200
+
+
+def base_estimators():
+    """(vectorizer, model) chưa fit: tham số của bản đã train, hoặc mặc định."""
+    import joblib
+    if VECTORIZER_FILE.exists() and MODEL_FILE.exists():
+        return clone(joblib.load(VECTORIZER_FILE)), clone(joblib.load(MODEL_FILE))
+    print("⚠ Chưa có model đã train, dùng TF-IDF + Logistic Regression mặc định")
+    vectorizer = TfidfVectorizer(ngram_range=(1, 2), min_df=3, max_df=0.97, max_features=200_000)
+    model = LogisticRegression(class_weight="balanced", solver="liblinear", max_iter=2000)
+    return vectorizer, model
+
+def body_tokens(df, budget):
+    """Số token body trung bình sau khi cắt."""
+    bodies = email_texts(df.assign(subject=""), budget)
+    return float(np.mean([len(b.split()) for b in bodies])) if bodies else 0.0
+
+def run_budget(budget, train_df, val_df, longest):
+    vectorizer, model = base_estimators()
+    t0 = time.perf_counter()
+    X = vectorizer.fit_transform(email_texts(train_df, budget))
+    model.fit(X, train_df["label"].to_numpy())
+    fit_s = time.perf_counter() - t0
+
+    scorer = EmailScorer(vectorizer, model, token_budget=budget)
+    t0 = time.perf_counter()
+    proba = np.concatenate([scorer.score(val_df.iloc[i:i + BATCH])
+                            for i in range(0, len(val_df), BATCH)] or [np.zeros(0)])
+    batch_s = time.perf_counter() - t0
+    metrics = get_metrics(val_df["label"].to_numpy(), (proba > 0.5).astype(int))
+
+    latencies = []
+    for subject, body in zip(longest["subject"], longest["body"]):
+        t = time.perf_counter_ns()
+        scorer.score_one(subject, body)
+        latencies.append(time.perf_counter_ns() - t)
+    lat = latency_report(latencies, len(latencies))
+
+    return {"budget": budget, "f1": metrics["f1"], "precision": metrics["precision"],
+            "recall": metrics["recall"], "fit_s": fit_s,
+            "emails_per_s": len(val_df) / batch_s if batch_s > 0 else float("nan"),
+            "long_p50_ms": lat["p50_us"] / 1000, "long_p99_ms": lat["p99_us"] / 1000,
+            "long_max_ms": lat["max_us"] / 1000, "body_tokens": body_tokens(val_df, budget),
+            "n_features": X.shape[1]}
+
+def recommend(rows, tolerance=F1_TOLERANCE):
+    """Budget nhỏ nhất (> 0) có F1 >= F1(budget 0) - tolerance, không có thì 0."""
+    full = next((row["f1"] for row in rows if row["budget"] == 0), max(row["f1"] for row in rows))
+    ok = [row["budget"] for row in rows if row["budget"] > 0 and row["f1"] >= full - tolerance]
+    return min(ok) if ok else 0
+
+def print_table(rows, best):
+    print(f"\n{'budget':>7}{'F1':>8}{'P':>8}{'R':>8}{'fit s':>8}{'email/s':>10}"
+          f"{'p99 ms':>9}{'max ms':>9}{'token':>8}")
+    for row in rows:
+        mark = " ✓" if row["budget"] == best else ""
+        print(f"{row['budget'] or '∞':>7}{row['f1']:>8.4f}{row['precision']:>8.4f}"
+              f"{row['recall']:>8.4f}{row['fit_s']:>8.1f}{row['emails_per_s']:>10,.0f}"
+              f"{row['long_p99_ms']:>9.2f}{row['long_max_ms']:>9.2f}{row['body_tokens']:>8.0f}{mark}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="F1 ↔ tốc độ theo token budget của body email")
+    parser.add_argument("--budgets", default=BUDGETS, help="các budget, cách nhau dấu phẩy (0 = không cắt)")
+    parser.add_argument("--split-dir", type=Path, default=SPLIT_DIR)
+    parser.add_argument("--out", type=Path, default=OUT_FILE)
+    args = parser.parse_args()
+
+    budgets = sorted({int(b) for b in args.budgets.split(",") if b.strip()})
+    train_df = read_table(args.split_dir / "dataset_train.csv", columns=COLUMNS)
+    val_df = read_table(args.split_dir / "dataset_val.csv", columns=COLUMNS)
+    val_df["body"] = val_df["body"].fillna("").astype(str)
+    longest = val_df.loc[val_df["body"].str.len().nlargest(N_LONGEST).index]
+    if longest.empty:
+        fail(f"❌ {args.split_dir / 'dataset_val.csv'} rỗng")
+    print(f"➡ TRAIN {len(train_df):,} / VAL {len(val_df):,} email; đo độ trễ trên "
+          f"{len(longest)} email dài nhất (tới {len(longest['body'].iloc[0].split()):,} token)")
+
+    rows = []
+    for budget in budgets:
+        rows.append(run_budget(budget, train_df, val_df, longest))
+        print(f"   budget {budget}: F1 {rows[-1]['f1']:.4f}, {rows[-1]['emails_per_s']:,.0f} email/s")
+
+    best = recommend(rows)
+    print_table(rows, best)
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame(rows).to_csv(args.out, index=False)
+    print(f"\n👉 Gợi ý: EMAIL_TOKEN_BUDGET={best} (F1 kém budget 0 không quá {F1_TOLERANCE})")
+    print(f"📌 Kết quả: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+# scripts/hash_split.py
+"""Chia train/val/test theo hash ổn định của khoá nhóm, đọc/ghi theo chunk.
+
+Mỗi nhóm (cùng người gửi, cùng cụm gần trùng, cùng số điện thoại...) vào
+trọn 1 split, chọn theo hash ổn định của khoá nhóm, phân tầng theo nhãn:
+  - lượt 1 đọc theo chunk, đếm số dòng của từng nhóm theo nhãn (chỉ giữ hash
+    64-bit của khoá, không giữ dòng);
+  - nhóm lớn hơn MAX_GROUP_SHARE số dòng của nhãn chính của nó bị tách thành
+    từng dòng, để 1 nhóm (ví dụ 1 domain chiếm gần hết 1 nhãn) không thể kéo
+    cả nhãn sang 1 split;
+  - trong từng nhãn, các nhóm còn lại được xếp theo hash rồi chia theo số dòng
+    cộng dồn đúng RATIOS; lượt 2 đọc lại và ghi từng dòng vào split của nó;
+  - kết quả chỉ phụ thuộc nội dung bảng, không phụ thuộc thứ tự hay cỡ chunk;
+    tỉ lệ của từng nhãn được kiểm tra trước khi thay file ra (check_split).
+Đổi SALT sẽ cho 1 cách chia khác hoàn toàn.
+
+hash_shuffle dùng cùng ý tưởng để xáo trộn bảng lớn hơn RAM: thứ tự mới là
+thứ tự hash của từng dòng, sắp xếp ngoài bộ nhớ qua các bucket tạm trên đĩa.
+"""
+
+import math
+import os
+import pickle
+import tempfile
+from contextlib import ExitStack
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from table_io import TableWriter, iter_table, storage_of
+
+SPLITS = ("train", "val", "test")
+RATIOS = (0.70, 0.15, 0.15)
+SALT = "split-v1"
+
+CHUNK_SIZE = 50_000
+# Nhóm lớn hơn tỉ lệ này của nhãn chính bị tách thành từng dòng
+MAX_GROUP_SHARE = 0.01
+# Tỉ lệ split của 1 nhãn được lệch tối đa chừng này so với RATIOS
+TOLERANCE = 0.05
+
+SHUFFLE_SALT = "shuffle-v1"
+# Dung lượng file vào ước tính cho mỗi bucket (mỗi bucket được đọc trọn vào RAM)
+SHUFFLE_BUCKET_BYTES = 32 << 20
+
+_ADDRESS = r"([\w.+\-]+@[\w\-]+(?:\.[\w\-]+)+)"
+
+
+def stable_hash(keys, salt=SALT):
+    """Hash 64-bit cố định của từng khoá (không phụ thuộc PYTHONHASHSEED)."""
+    keys = pd.Series(keys, dtype=object).fillna("").astype(str)
+    return pd.util.hash_array((salt + "|" + keys).to_numpy(dtype=object))
+
+def _unit(h):
+    """Hash uint64 -> số thực đều trong [0, 1)."""
+    return (np.asarray(h, dtype=np.uint64) >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+def _edges(ratios):
+    return np.cumsum(ratios)[:-1] / sum(ratios)
+
+def assign_splits(keys, ratios=RATIOS, salt=SALT):
+    """Chỉ số split (0 train, 1 val, 2 test) của từng khoá, chỉ theo hash."""
+    return np.searchsorted(_edges(ratios), _unit(stable_hash(keys, salt)), side="right")
+
+
+class SplitError(ValueError):
+    """Cách chia không dùng được (1 nhãn thiếu split hoặc lệch quá TOLERANCE)."""
+
+
+# ======== KHOÁ NHÓM ========
+
+def normalize_sender(values):
+    """'"Ann" <Ann.Lee@Enron.com>' -> 'ann.lee@enron.com'; không có địa chỉ thì chữ thường."""
+    s = pd.Series(values, dtype=object).fillna("").astype(str).str.lower()
+    addr = s.str.extract(_ADDRESS, expand=False)
+    return addr.fillna(s.str.strip())
+
+def email_group_keys(chunk, group):
+    """Khoá nhóm cho các dòng email: cluster / sender / domain / row (từng email).
+
+    Dòng thiếu giá trị (không có domain, người gửi) dùng khoá của từng email
+    (cột cluster của dedup_email_dataset.py, không có thì subject + body).
+    """
+    if "cluster" in chunk.columns:
+        own = "c:" + chunk["cluster"].fillna("").astype(str)
+    else:
+        own = ("e:" + chunk["subject"].fillna("").astype(str) + "\x1f"
+               + chunk["body"].fillna("").astype(str))
+    if group == "cluster":
+        return own
+    if group == "row":
+        return "e:" + chunk["subject"].fillna("").astype(str) + "\x1f" + chunk["body"].fillna("").astype(str)
+    if group == "sender":
+        key = normalize_sender(chunk["email_from"])
+        prefix = "s:"
+    elif group == "domain":
+        key = chunk["domain"].fillna("").astype(str).str.strip().str.lower()
+        prefix = "d:"
+    else:
+        raise ValueError(f"group không hợp lệ: {group!r}")
+    return (prefix + key).where(key != "", own)
+
+
+# ======== CHIA THEO CHUNK ========
+
+def group_sizes(in_file, key_fn, chunk_size=CHUNK_SIZE, salt=SALT):
+    """Lượt 1: số dòng theo (hash khoá nhóm, label) -> bảng nhóm × label."""
+    parts = []
+    for chunk in iter_table(in_file, chunksize=chunk_size):
+        parts.append(pd.DataFrame({"group": stable_hash(key_fn(chunk), salt),
+                                   "label": chunk["label"].astype(str).to_numpy()}).value_counts())
+    if not parts:
+        raise ValueError(f"Bảng rỗng: {in_file}")
+    return pd.concat(parts).groupby(level=[0, 1]).sum().unstack(fill_value=0)
+
+def plan_groups(sizes, ratios=RATIOS, max_share=MAX_GROUP_SHARE):
+    """Split của từng nhóm (Series theo hash nhóm, -1 = nhóm quá lớn, chia từng dòng).
+
+    Mỗi nhóm thuộc nhãn chính của nó (nhãn nhiều dòng nhất); trong từng nhãn
+    các nhóm xếp theo hash, vị trí giữa nhóm trên số dòng cộng dồn quyết định
+    split, nên tỉ lệ dòng mỗi split khớp RATIOS tới cỡ 1 nhóm.
+    """
+    n = sizes.sum(axis=1).to_numpy()
+    main = sizes.to_numpy().argmax(axis=1)
+    totals = sizes.sum().to_numpy()
+    split = np.full(len(sizes), -1, dtype=np.int64)
+    small = n <= max_share * totals[main]
+    u = _unit(sizes.index.to_numpy())
+    for j in range(sizes.shape[1]):
+        idx = np.flatnonzero(small & (main == j))
+        if len(idx) == 0:
+            continue
+        idx = idx[np.argsort(u[idx], kind="stable")]
+        mid = (np.cumsum(n[idx]) - n[idx] / 2) / n[idx].sum()
+        split[idx] = np.searchsorted(_edges(ratios), mid, side="right")
+    return pd.Series(split, index=sizes.index)
+
+def check_split(counts, ratios=RATIOS, tolerance=TOLERANCE):
+    """SplitError nếu 1 nhãn có split rỗng hoặc tỉ lệ lệch quá `tolerance`."""
+    share = counts / counts.sum()
+    target = pd.Series(ratios, index=SPLITS) / sum(ratios)
+    off = share.sub(target, axis=0).abs().max()
+    problems = [f"nhãn {label}: split {', '.join(counts.index[counts[label] == 0])} rỗng"
+                for label in counts.columns if (counts[label] == 0).any()]
+    problems += [f"nhãn {label}: lệch {dev:.0%}" for label, dev in off.items()
+                 if dev > tolerance and (counts[label] > 0).all()]
+    if problems:
+        raise SplitError(f"Tỉ lệ split so với {tuple(ratios)} không dùng được ("
+                         + "; ".join(problems) + "); chọn khoá nhóm khác hoặc giảm MAX_GROUP_SHARE")
+
+def stream_split(in_file, out_files, key_fn, chunk_size=CHUNK_SIZE, ratios=RATIOS,
+                 max_share=MAX_GROUP_SHARE, tolerance=TOLERANCE):
+    """Đọc `in_file` theo chunk (2 lượt), ghi từng dòng vào file của split tương ứng.
+
+    `out_files` là 3 đường dẫn (train, val, test); `key_fn(chunk)` trả về khoá
+    nhóm. Trả về bảng số dòng theo split × label; nếu check_split thất bại thì
+    không thay file ra nào và ném SplitError.
+    """
+    out_files = [Path(p) for p in out_files]
+    tmp_files = [p.with_name(p.name + ".tmp") for p in out_files]
+    plan = plan_groups(group_sizes(in_file, key_fn, chunk_size), ratios, max_share)
+    writers = None
+    counts = {}
+    start = 0
+    try:
+        for chunk in iter_table(in_file, chunksize=chunk_size):
+            if writers is None:
+                writers = [TableWriter(tmp, list(chunk.columns), storage=storage_of(out))
+                           for tmp, out in zip(tmp_files, out_files)]
+            h = stable_hash(key_fn(chunk))
+            split = plan.to_numpy()[plan.index.get_indexer(h)]
+            big = split < 0
+            if big.any():
+                # Nhóm quá lớn: mỗi dòng 1 khoá (hash nhóm + số thứ tự dòng trong bảng)
+                row_keys = (pd.Series(h[big]).astype(str) + ":"
+                            + pd.Series(start + np.flatnonzero(big)).astype(str))
+                split[big] = assign_splits(row_keys, ratios)
+            start += len(chunk)
+            labels = chunk["label"].astype(str).to_numpy()
+            for i, writer in enumerate(writers):
+                mask = split == i
+                writer.write(chunk[mask])
+                for label, n in zip(*np.unique(labels[mask], return_counts=True)):
+                    counts[(SPLITS[i], label)] = counts.get((SPLITS[i], label), 0) + int(n)
+    finally:
+        for writer in writers or []:
+            writer.close()
+
+    table = pd.Series(counts, dtype="int64").unstack(fill_value=0).reindex(SPLITS, fill_value=0)
+    try:
+        check_split(table, ratios, tolerance)
+    except SplitError:
+        for tmp in tmp_files:
+            tmp.unlink(missing_ok=True)
+        raise
+    for tmp, out in zip(tmp_files, out_files):
+        os.replace(tmp, out)
+    return table
+
+def print_split_report(counts):
+    """Số dòng và tỉ lệ mỗi split trong từng nhãn (để kiểm tra phân tầng)."""
+    print("\n📊 Số dòng theo split × label:")
+    print(counts.to_string())
+    print("\n📊 Tỉ lệ split trong từng nhãn:")
+    print((counts / counts.sum()).round(3).to_string())
+
+
+# ======== XÁO TRỘN NGOÀI BỘ NHỚ ========
+
+def shuffle_buckets(paths, bucket_bytes=SHUFFLE_BUCKET_BYTES):
+    """Số bucket cho hash_shuffle theo tổng dung lượng các file vào."""
+    total = sum(os.path.getsize(p) for p in paths)
+    return max(1, math.ceil(total / bucket_bytes))
+
+def _read_frames(path):
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+def hash_shuffle(chunks, out_file, key_fn, n_buckets, salt=SHUFFLE_SALT):
+    """Ghi các chunk ra `out_file` theo thứ tự hash(key_fn(chunk)) -> số dòng đã ghi.
+
+    Lượt 1 tính hash từng chunk, rải dòng vào bucket hash % n_buckets (file tạm
+    cạnh `out_file`, các DataFrame pickle nối nhau); lượt 2 đọc từng bucket,
+    xếp theo hash rồi ghi nối. Thứ tự ra chỉ phụ thuộc nội dung dòng và `salt`,
+    không phụ thuộc cỡ chunk; RAM ~ 1 bucket.
+    """
+    out_file = Path(out_file)
+    tmp_file = out_file.with_name(out_file.name + ".tmp")
+    with tempfile.TemporaryDirectory(dir=out_file.parent) as tmp_dir:
+        bucket_files = [Path(tmp_dir) / f"{i}.pkl" for i in range(n_buckets)]
+        columns = None
+        with ExitStack() as stack:
+            buckets = [stack.enter_context(open(p, "wb")) for p in bucket_files]
+            for chunk in chunks:
+                columns = columns or list(chunk.columns)
+                h = stable_hash(key_fn(chunk), salt)
+                b = h % np.uint64(n_buckets)
+                for i, f in enumerate(buckets):
+                    mask = b == i
+                    if mask.any():
+                        pickle.dump((h[mask], chunk[mask]), f, protocol=pickle.HIGHEST_PROTOCOL)
+        if columns is None:
+            raise ValueError(f"Không có dòng nào để ghi: {out_file}")
+
+        n_rows = 0
+        with TableWriter(tmp_file, columns, storage=storage_of(out_file)) as writer:
+            for path in bucket_files:
+                parts = list(_read_frames(path))
+                if not parts:
+                    continue
+                h = np.concatenate([p[0] for p in parts])
+                part = pd.concat([p[1] for p in parts], ignore_index=True)
+                del parts
+                writer.write(part.iloc[np.argsort(h, kind="stable")])
+                n_rows += len(part)
+                del part
+    os.replace(tmp_file, out_file)
+    return n_rows
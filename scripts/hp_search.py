@@ -0,0 +1,234 @@
+# scripts/hp_search.py
+"""Tìm tham số model email bằng successive halving trên các fold dùng chung.
+
+Thay cho GridSearchCV(cv=5) trong train_email_models.py khi đặt
+EMAIL_SEARCH=halving:
+
+  - fold cố định (StratifiedKFold 5, như cv=5 của GridSearchCV) dùng chung cho
+    cả Logistic Regression và Random Forest;
+  - TF-IDF fit riêng trên phần train của từng fold (không rò rỉ sang phần val),
+    dựng 1 lần trước khi tìm tham số (bước "tfidf folds", không tính vào thời
+    gian tìm) và cache bằng tfidf_cache.load_or_fit_folds;
+  - vòng đầu mọi ứng viên chỉ train trên 1/FACTOR^k số dòng của fold, mỗi vòng
+    giữ 1/FACTOR ứng viên tốt nhất (F1) và tăng số dòng lên FACTOR lần tới
+    toàn bộ fold; dừng sớm khi chỉ còn 1 ứng viên;
+  - Random Forest (n_estimators trong lưới): tài nguyên của halving là số cây
+    thay cho số dòng; forest của ứng viên được giữ lại trồng tiếp bằng
+    warm_start, không fit lại cây đã có (xem search_trees);
+  - model đã fit theo (ứng viên, fold, số dòng / số cây) được cache trên đĩa,
+    chạy lại hoặc thêm ứng viên chỉ fit phần còn thiếu;
+  - in và lưu thời gian fit của từng ứng viên (email_search_report.csv).
+"""
+
+import hashlib
+import json
+import math
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import f1_score
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+
+from tfidf_cache import load_or_fit_folds
+
+N_FOLDS = 5
+FACTOR = 3
+# Vòng đầu không train trên ít hơn số dòng này
+MIN_RESOURCES = 200
+# Forest (n_estimators trong lưới): vòng đầu không trồng ít hơn số cây này
+MIN_TREES = 20
+SEED = 42
+
+
+def make_folds(y, n_splits=N_FOLDS):
+    """Giống cv=5 của GridSearchCV cho classifier (StratifiedKFold, không shuffle)."""
+    y = np.asarray(y)
+    return list(StratifiedKFold(n_splits=n_splits).split(np.zeros(len(y)), y))
+
+def n_rounds(n_candidates, factor):
+    return 1 + int(math.floor(math.log(n_candidates, factor) + 1e-9)) if n_candidates > 1 else 1
+
+def params_repr(params):
+    return json.dumps(sorted((k, repr(v)) for k, v in params.items()))
+
+
+class HalvingSearch:
+    """Successive halving theo số dòng train, trên các fold chung."""
+
+    def __init__(self, fold_mats, y, folds, cache_dir=None, factor=FACTOR,
+                 min_resources=MIN_RESOURCES):
+        y = np.asarray(y)
+        rng = np.random.default_rng(SEED)
+        self.factor = factor
+        self.min_resources = min_resources
+        self.cache_dir = Path(cache_dir) / "models" if cache_dir is not None else None
+        self.fold_data = []
+        for (X_tr, X_va), (tr, va) in zip(fold_mats, folds):
+            # Hoán vị cố định -> tập con nhỏ là phần đầu của tập con lớn hơn
+            order = rng.permutation(len(tr))
+            self.fold_data.append((X_tr[order], y[tr][order], X_va, y[va]))
+        self.report = []
+
+    @classmethod
+    def from_split(cls, vectorizer, y_train, train_file, load_split, **kw):
+        folds = make_folds(y_train)
+        fold_mats, cache_dir = load_or_fit_folds(vectorizer, train_file, load_split, folds)
+        return cls(fold_mats, y_train, folds, cache_dir=cache_dir, **kw)
+
+    def _cache_file(self, estimator, params, fold, n):
+        key = json.dumps([type(estimator).__name__, params_repr(estimator.get_params()),
+                          params_repr(params), fold, n])
+        return self.cache_dir / f"{hashlib.blake2b(key.encode(), digest_size=16).hexdigest()}.joblib"
+
+    def fit_fold(self, estimator, params, fold, n):
+        """-> (f1 trên phần val của fold, giây fit, có lấy từ cache không)."""
+        path = self._cache_file(estimator, params, fold, n) if self.cache_dir else None
+        if path is not None and path.exists():
+            model = joblib.load(path)
+            fit_s, cached = 0.0, True
+        else:
+            X_tr, y_tr, _, _ = self.fold_data[fold]
+            model = clone(estimator).set_params(**params)
+            t0 = time.perf_counter()
+            model.fit(X_tr[:n], y_tr[:n])
+            fit_s, cached = time.perf_counter() - t0, False
+            if path is not None:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                joblib.dump(model, path, compress=3)
+        _, _, X_va, y_va = self.fold_data[fold]
+        return f1_score(y_va, model.predict(X_va), zero_division=0), fit_s, cached
+
+    def grow_fold(self, estimator, params, n_trees, fold, forest=None):
+        """Trồng tiếp `forest` (warm_start) tới n_trees cây trên cả fold.
+
+        -> (forest, f1 trên phần val của fold, giây fit, có lấy từ cache không).
+        """
+        X_tr, y_tr, X_va, y_va = self.fold_data[fold]
+        tree_params = {**params, "n_estimators": n_trees}
+        path = self._cache_file(estimator, tree_params, fold, len(y_tr)) if self.cache_dir else None
+        if path is not None and path.exists():
+            forest = joblib.load(path)
+            fit_s, cached = 0.0, True
+        else:
+            if forest is None:
+                forest = clone(estimator).set_params(**tree_params)
+            else:
+                forest.set_params(warm_start=True, n_estimators=n_trees)
+            t0 = time.perf_counter()
+            forest.fit(X_tr, y_tr)
+            fit_s, cached = time.perf_counter() - t0, False
+            forest.set_params(warm_start=estimator.get_params()["warm_start"])
+            if path is not None:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                joblib.dump(forest, path, compress=3)
+        return forest, f1_score(y_va, forest.predict(X_va), zero_division=0), fit_s, cached
+
+    def search(self, name, estimator, param_grid):
+        """Trả về tham số tốt nhất (dict) theo F1 trung bình các fold."""
+        if "n_estimators" in param_grid and "warm_start" in estimator.get_params():
+            return self.search_trees(name, estimator, param_grid)
+        candidates = list(ParameterGrid(param_grid))
+        full = min(len(d[1]) for d in self.fold_data)
+        rounds = n_rounds(len(candidates), self.factor)
+        alive = list(range(len(candidates)))
+        stats = [{"model": name, "params": params_repr(p), "rounds": 0, "n_samples": 0,
+                  "mean_f1": float("nan"), "fit_seconds": 0.0, "cached_fits": 0}
+                 for p in candidates]
+        print(f"➡ {name}: {len(candidates)} ứng viên, {rounds} vòng, {len(self.fold_data)} fold")
+
+        for r in range(rounds):
+            n = full if r == rounds - 1 else max(full // self.factor ** (rounds - 1 - r),
+                                                 min(self.min_resources, full))
+            scores = {}
+            for c in alive:
+                f1s = []
+                for fold in range(len(self.fold_data)):
+                    f1, fit_s, cached = self.fit_fold(estimator, candidates[c], fold, n)
+                    f1s.append(f1)
+                    stats[c]["fit_seconds"] += fit_s
+                    stats[c]["cached_fits"] += cached
+                scores[c] = float(np.mean(f1s))
+                stats[c].update(rounds=r + 1, n_samples=n, mean_f1=scores[c])
+                print(f"   vòng {r + 1}/{rounds} n={n:,} {candidates[c]}: "
+                      f"F1 {scores[c]:.4f} ({stats[c]['fit_seconds']:.1f}s)")
+            # Giữ 1/FACTOR ứng viên tốt nhất (hoà thì ưu tiên ứng viên đứng trước, như GridSearchCV)
+            keep = max(1, math.ceil(len(alive) / self.factor))
+            alive = sorted(alive, key=lambda c: (-scores[c], c))[:keep]
+            if len(alive) == 1:
+                break  # đã có người thắng, không cần vòng dữ liệu lớn hơn
+
+        self.report.extend(stats)
+        best = candidates[alive[0]]
+        print(f"   → {name} tốt nhất: {best}")
+        return best
+
+    def search_trees(self, name, estimator, param_grid):
+        """Successive halving theo số cây (forest, warm_start) trên cả fold.
+
+        Ứng viên là tổ hợp các tham số còn lại. Vòng đầu mỗi ứng viên trồng
+        max(n_estimators) / FACTOR^k cây, mỗi vòng giữ 1/FACTOR ứng viên tốt
+        nhất và trồng tiếp forest của chúng (không fit lại cây đã có) tới hết
+        max(n_estimators) ở vòng cuối. Forest được chấm ở mọi giá trị
+        n_estimators của lưới đi qua, nên vẫn chọn số cây như GridSearchCV.
+        """
+        grid = dict(param_grid)
+        tree_grid = sorted(grid.pop("n_estimators"))
+        candidates = list(ParameterGrid(grid))
+        max_trees = tree_grid[-1]
+        # Đủ vòng để vòng cuối chỉ còn 1 ứng viên
+        rounds = 1 + math.ceil(math.log(len(candidates), self.factor) - 1e-9) if len(candidates) > 1 else 1
+        budgets = [max(max_trees // self.factor ** (rounds - 1 - r), min(MIN_TREES, max_trees))
+                   for r in range(rounds)]
+        alive = list(range(len(candidates)))
+        forests = {}  # (ứng viên, fold) -> forest đang trồng dở
+        scores = {}   # (ứng viên, số cây) -> F1 trung bình các fold
+        full = min(len(d[1]) for d in self.fold_data)
+        stats = [{"model": name, "params": params_repr(p), "rounds": 0, "n_samples": full,
+                  "n_estimators": 0, "mean_f1": float("nan"), "fit_seconds": 0.0,
+                  "cached_fits": 0}
+                 for p in candidates]
+        print(f"➡ {name}: {len(candidates)} ứng viên, {rounds} vòng theo số cây "
+              f"{budgets}, {len(self.fold_data)} fold")
+
+        for r, budget in enumerate(budgets):
+            for c in alive:
+                done = max((k for cc, k in scores if cc == c), default=0)
+                for k in sorted({t for t in tree_grid if done < t <= budget} | {budget} - {done}):
+                    f1s = []
+                    for fold in range(len(self.fold_data)):
+                        forests[c, fold], f1, fit_s, cached = self.grow_fold(
+                            estimator, candidates[c], k, fold, forests.get((c, fold)))
+                        f1s.append(f1)
+                        stats[c]["fit_seconds"] += fit_s
+                        stats[c]["cached_fits"] += cached
+                    scores[c, k] = float(np.mean(f1s))
+                stats[c].update(rounds=r + 1, n_estimators=budget, mean_f1=scores[c, budget])
+                print(f"   vòng {r + 1}/{rounds} {budget} cây {candidates[c]}: "
+                      f"F1 {scores[c, budget]:.4f} ({stats[c]['fit_seconds']:.1f}s)")
+            keep = max(1, math.ceil(len(alive) / self.factor))
+            alive = sorted(alive, key=lambda c: (-scores[c, budget], c))[:keep]
+            for c, fold in list(forests):
+                if c not in alive:
+                    del forests[c, fold]  # giải phóng RAM forest bị loại
+
+        # Số cây: giá trị của lưới có F1 tốt nhất (hoà thì ít cây hơn)
+        winner = alive[0]
+        n_trees = min(tree_grid, key=lambda k: (-scores[winner, k], k))
+        self.report.extend(stats)
+        best = {**candidates[winner], "n_estimators": n_trees}
+        print(f"   → {name} tốt nhất: {best}")
+        return best
+
+    def fit_best(self, name, estimator, param_grid, X_train, y_train):
+        """Tìm tham số rồi fit lại trên toàn bộ TRAIN (như refit=True của GridSearchCV)."""
+        best = self.search(name, estimator, param_grid)
+        return clone(estimator).set_params(**best).fit(X_train, y_train)
+
+    def save_report(self, path):
+        df = pd.DataFrame(self.report).sort_values(["model", "mean_f1"], ascending=[True, False])
+        df.to_csv(path, index=False)
+        return df
@@ -0,0 +1,22 @@
+# scripts/latency.py
+"""Tổng hợp độ trễ cho các chế độ bench (phone_lookup, email_scoring, ...)."""
+
+import numpy as np
+
+
+def latency_report(latencies_ns, n_items, wall_s=None):
+    """p50/p99/max (µs) của từng lần gọi và thông lượng (item/s).
+
+    `wall_s` là thời gian thực tổng (khi nhiều client chạy song song);
+    mặc định = tổng độ trễ các lần gọi.
+    """
+    lat_us = np.asarray(latencies_ns) / 1_000
+    total_s = wall_s if wall_s is not None else lat_us.sum() / 1e6
+    return {
+        "calls": len(lat_us),
+        "items": n_items,
+        "p50_us": float(np.percentile(lat_us, 50)),
+        "p99_us": float(np.percentile(lat_us, 99)),
+        "max_us": float(lat_us.max()),
+        "items_per_s": n_items / total_s if total_s else float("inf"),
+    }
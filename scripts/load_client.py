@@ -0,0 +1,133 @@
+# scripts/load_client.py
+"""Tạo tải cho scoring_server.py trên cùng 1 máy, báo RPS và độ trễ đuôi.
+
+    python scripts/scoring_server.py &
+    python scripts/load_client.py email --concurrency 64 --requests 20000
+    python scripts/load_client.py phone --concurrency 64 --duration 10 --batch 8
+
+Mỗi client giữ 1 kết nối keep-alive và gửi request tuần tự; `--concurrency`
+client chạy song song. Dữ liệu mẫu lấy từ file test (nếu có), không thì sinh
+ngẫu nhiên.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from latency import latency_report
+
+SAMPLES = {
+    "email": Path("splits/dataset_test.csv"),
+    "phone": Path("splits_phone/phone_test.csv"),
+}
+
+
+def load_samples(kind, path, n=1_000, seed=42):
+    rng = np.random.default_rng(seed)
+    path = Path(path or SAMPLES[kind])
+    if path.exists():
+        from table_io import read_table
+        if kind == "email":
+            df = read_table(path, columns=["subject", "body"]).fillna("")
+            return [{"subject": str(s), "body": str(b)} for s, b in zip(df["subject"], df["body"])]
+        return read_table(path, columns=["phone"], dtype={"phone": str})["phone"].astype(str).tolist()
+
+    print(f"⚠ Không có file mẫu cho {kind}, dùng dữ liệu ngẫu nhiên")
+    if kind == "email":
+        words = ["account", "verify", "meeting", "invoice", "password", "report", "click", "deal"]
+        return [{"subject": " ".join(rng.choice(words, 3)),
+                 "body": " ".join(rng.choice(words, 40))} for _ in range(n)]
+    return [f"+84{rng.integers(10**8, 10**9)}" for _ in range(n)]
+
+def make_payload(kind, samples, rng, batch):
+    picks = [samples[i] for i in rng.integers(0, len(samples), batch)]
+    if kind == "email":
+        payload = {"emails": picks} if batch > 1 else picks[0]
+    else:
+        payload = {"phones": picks} if batch > 1 else {"phone": picks[0]}
+    return json.dumps(payload).encode("utf-8")
+
+
+async def request(reader, writer, host, path, body):
+    writer.write((f"POST {path} HTTP/1.1\r\nHost: {host}\r\n"
+                  f"Content-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        h = await reader.readline()
+        if h in (b"\r\n", b"\n", b""):
+            break
+        k, _, v = h.decode("latin-1").partition(":")
+        if k.strip().lower() == "content-length":
+            length = int(v)
+    await reader.readexactly(length)
+    return status
+
+async def client(i, args, payloads, latencies, counters, stop_at):
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    path = f"/score/{args.kind}"
+    try:
+        while True:
+            if stop_at is not None:
+                if time.perf_counter() >= stop_at:
+                    break
+            elif counters["sent"] >= args.requests:
+                break
+            counters["sent"] += 1
+            body = payloads[counters["sent"] % len(payloads)]
+            t0 = time.perf_counter_ns()
+            status = await request(reader, writer, args.host, path, body)
+            latencies.append(time.perf_counter_ns() - t0)
+            if status != 200:
+                counters["errors"] += 1
+    finally:
+        writer.close()
+
+async def run(args):
+    samples = load_samples(args.kind, args.sample)
+    rng = np.random.default_rng(0)
+    payloads = [make_payload(args.kind, samples, rng, args.batch) for _ in range(1_000)]
+
+    # Warm-up: đảm bảo server đã sẵn sàng
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    await request(reader, writer, args.host, f"/score/{args.kind}", payloads[0])
+    writer.close()
+
+    latencies = []
+    counters = {"sent": 0, "errors": 0}
+    t0 = time.perf_counter()
+    stop_at = t0 + args.duration if args.duration else None
+    await asyncio.gather(*(client(i, args, payloads, latencies, counters, stop_at)
+                           for i in range(args.concurrency)))
+    wall = time.perf_counter() - t0
+    return latency_report(latencies, len(latencies), wall_s=wall), counters, wall
+
+def main():
+    parser = argparse.ArgumentParser(description="Tạo tải cho scoring_server.py")
+    parser.add_argument("kind", choices=["email", "phone"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--concurrency", type=int, default=32, help="số kết nối song song")
+    parser.add_argument("--requests", type=int, default=10_000, help="tổng số request")
+    parser.add_argument("--duration", type=float, default=0,
+                        help="> 0: chạy theo thời gian (giây) thay vì --requests")
+    parser.add_argument("--batch", type=int, default=1, help="số email/số điện thoại mỗi request")
+    parser.add_argument("--sample", type=Path, help="file mẫu (mặc định: file test của pipeline)")
+    args = parser.parse_args()
+
+    report, counters, wall = asyncio.run(run(args))
+    print(f"📊 {args.kind}: {report['calls']:,} request × batch {args.batch}, "
+          f"{args.concurrency} kết nối, {wall:.1f}s, lỗi {counters['errors']}")
+    print(f"🚀 {report['calls'] / wall:,.0f} req/s | {report['calls'] * args.batch / wall:,.0f} item/s")
+    print(f"⏱ p50 {report['p50_us'] / 1000:.2f} ms | p99 {report['p99_us'] / 1000:.2f} ms | "
+          f"max {report['max_us'] / 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# scripts/mbox_reader.py
+"""Đọc file mbox theo kiểu streaming trên mmap (thay cho mailbox.mbox).
+
+mailbox.mbox quét toàn bộ file để dựng mục lục rồi seek lại cho từng email.
+Ở đây file được memory-map và tách theo dòng bắt đầu bằng "From ", mỗi lần
+chỉ copy đúng 1 email ra bộ nhớ. Ranh giới email giống hệt mailbox.mbox.
+"""
+
+import email
+import mmap
+import os
+
+# mailbox.mbox dùng os.linesep để nhận dòng trống và cắt cuối email
+LINESEP = os.linesep.encode("ascii")
+
+
+def _prev_line_empty(buf, pos):
+    """Dòng ngay trước vị trí `pos` (đầu dòng) có phải dòng trống không."""
+    n = len(LINESEP)
+    if pos < n or buf[pos - n:pos] != LINESEP:
+        return False
+    return pos == n or buf[pos - n - 1:pos - n] == b"\n"
+
+def iter_message_spans(buf):
+    """Trả về (start, stop) của từng email trong buffer mbox."""
+    size = len(buf)
+    start = 0 if buf[:5] == b"From " else None
+    pos = 0
+    while True:
+        idx = buf.find(b"\nFrom ", pos)
+        line_pos = size if idx < 0 else idx + 1
+        if start is not None:
+            stop = line_pos - len(LINESEP) if _prev_line_empty(buf, line_pos) else line_pos
+            yield start, stop
+        if idx < 0:
+            return
+        start = line_pos
+        pos = line_pos
+
+def iter_mbox_bytes(path):
+    """Trả về nội dung thô (bytes) của từng email, không gồm dòng "From "."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            for start, stop in iter_message_spans(mm):
+                eol = mm.find(b"\n", start, stop)
+                body_start = stop if eol < 0 else eol + 1
+                yield mm[body_start:max(stop, body_start)].replace(LINESEP, b"\n")
+
+def iter_mbox(path):
+    """Trả về lần lượt email.message.Message của từng email trong file mbox."""
+    for raw in iter_mbox_bytes(path):
+        yield email.message_from_bytes(raw)
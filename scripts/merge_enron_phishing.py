@@ -1,6 +1,13 @@
 import pandas as pd
 from pathlib import Path
 
+from hash_split import hash_shuffle, shuffle_buckets
+from profiling import set_rows, start_stage, step
+from table_io import (CHUNK_SIZE, iter_table, read_table, resolve_table, table_exists,
+                      table_path, write_table)
+
+start_stage()
+
 DATA_CLEAN = Path("data_clean")
 OUT_DIR = Path("data")
 OUT_DIR.mkdir(exist_ok=True)
@@ -8,40 +15,78 @@ OUT_DIR.mkdir(exist_ok=True)
 enron_path = DATA_CLEAN / "enron_clean.csv"
 phishing_path = DATA_CLEAN / "phishing_clean.csv"
 
-if not enron_path.exists():
+if not table_exists(enron_path):
     raise FileNotFoundError("Không tìm thấy enron_clean.csv")
 
-if not phishing_path.exists():
+if not table_exists(phishing_path):
     raise FileNotFoundError("Không tìm thấy phishing_clean.csv")
 
-print("📥 Đang đọc enron_clean.csv ...")
-enron = pd.read_csv(enron_path, encoding="utf-8")
+COLUMNS = ["email_from", "domain", "subject", "body", "label"]
+
+out_file = table_path(OUT_DIR / "dataset_email_cleaned.csv")
+
+def iter_chunks(in_files):
+    for path in in_files:
+        print(f"📥 Đang đọc {path} theo chunk {CHUNK_SIZE:,} dòng ...")
+        for chunk in iter_table(path, columns=COLUMNS, chunksize=CHUNK_SIZE):
+            chunk = chunk[COLUMNS].fillna("")
+            for col in ["email_from", "domain", "subject", "body"]:
+                chunk[col] = chunk[col].astype(str)
+            chunk["label"] = chunk["label"].astype(int)
+            yield chunk[chunk["body"].str.strip() != ""]
+
+def row_key(chunk):
+    return chunk["email_from"] + "\x1f" + chunk["subject"] + "\x1f" + chunk["body"]
+
+def merge_chunked():
+    """Đọc từng khối, xáo trộn theo hash nội dung (ngoài bộ nhớ) thay cho df.sample;
+    ô rỗng giữ là "" (đọc cả bảng thì NaN -> "nan"). Trả về số dòng."""
+    in_files = [resolve_table(enron_path), resolve_table(phishing_path)]
+    with step("read_shuffle_write") as s:
+        s.rows = hash_shuffle(iter_chunks(in_files), out_file, row_key, shuffle_buckets(in_files))
+    return s.rows
+
+def merge_in_memory():
+    """Đọc cả 2 bảng vào RAM, merge + xáo trộn. Trả về số dòng."""
+    print("📥 Đang đọc enron_clean.csv ...")
+    with step("read enron") as s:
+        enron = read_table(enron_path, columns=COLUMNS)
+        s.rows = len(enron)
+
+    print("📥 Đang đọc phishing_clean.csv ...")
+    with step("read phishing") as s:
+        phishing = read_table(phishing_path, columns=COLUMNS)
+        s.rows = len(phishing)
+
+    print("🔗 Đang merge 2 dataset ...")
+    df = pd.concat([enron, phishing], ignore_index=True)
 
-print("📥 Đang đọc phishing_clean.csv ...")
-phishing = pd.read_csv(phishing_path, encoding="utf-8")
+    # đảm bảo đúng schema
+    df["email_from"] = df["email_from"].astype(str)
+    df["domain"] = df["domain"].astype(str)
+    df["subject"] = df["subject"].astype(str)
+    df["body"] = df["body"].astype(str)
+    df["label"] = df["label"].astype(int)
 
-print("🔗 Đang merge 2 dataset ...")
-df = pd.concat([enron, phishing], ignore_index=True)
+    # loại email rỗng
+    df = df[df["body"].str.strip() != ""]
 
-# đảm bảo đúng schema
-df["email_from"] = df["email_from"].astype(str)
-df["domain"] = df["domain"].astype(str)
-df["subject"] = df["subject"].astype(str)
-df["body"] = df["body"].astype(str)
-df["label"] = df["label"].astype(int)
+    # loại trùng (kể cả gần trùng): 1 lần duy nhất ở dedup_email_dataset.py
 
-# loại email rỗng
-df = df[df["body"].str.strip() != ""]
+    # xáo trộn dữ liệu
+    df = df.sample(frac=1, random_state=42).reset_index(drop=True)
 
-# loại trùng (HAM trùng PHISHING)
-df = df.drop_duplicates(subset=["subject", "body"])
+    with step("write", rows=len(df)):
+        write_table(df, out_file)
+    return len(df)
 
-# xáo trộn dữ liệu
-df = df.sample(frac=1, random_state=42).reset_index(drop=True)
 
-out_file = OUT_DIR / "dataset_email_cleaned.csv"
-df.to_csv(out_file, index=False, encoding="utf-8")
+if CHUNK_SIZE:
+    n_rows = merge_chunked()
+else:
+    n_rows = merge_in_memory()
+set_rows(n_rows)
 
 print("✅ MERGE HOÀN TẤT!")
-print("📌 Số dòng cuối cùng:", len(df))
+print("📌 Số dòng cuối cùng:", n_rows)
 print("📌 Dataset được lưu tại:", out_file)
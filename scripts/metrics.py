@@ -0,0 +1,44 @@
+# scripts/metrics.py
+"""Metrics phân loại nhị phân dùng chung cho các script train email."""
+
+from sklearn.metrics import accuracy_score, confusion_matrix, precision_recall_fscore_support
+
+
+def get_metrics(y_true, y_pred):
+    acc = accuracy_score(y_true, y_pred)
+    p, r, f1, _ = precision_recall_fscore_support(
+        y_true, y_pred, average="binary", zero_division=0
+    )
+    tn, fp, fn, tp = confusion_matrix(y_true, y_pred, labels=[0, 1]).ravel()
+    return {
+        "accuracy": acc,
+        "precision": p,
+        "recall": r,
+        "f1": f1,
+        "tn": tn,
+        "fp": fp,
+        "fn": fn,
+        "tp": tp,
+    }
+
+def confusion_counts(y_true, y_pred):
+    """[tn, fp, fn, tp] của 1 khối dữ liệu, để cộng dồn khi đọc theo chunk."""
+    return confusion_matrix(y_true, y_pred, labels=[0, 1]).ravel()
+
+def metrics_from_counts(counts):
+    """Cùng khoá với get_metrics, tính từ [tn, fp, fn, tp] đã cộng dồn."""
+    tn, fp, fn, tp = (int(c) for c in counts)
+    total = tn + fp + fn + tp
+    p = tp / (tp + fp) if tp + fp else 0.0
+    r = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * p * r / (p + r) if p + r else 0.0
+    return {
+        "accuracy": (tp + tn) / total if total else 0.0,
+        "precision": p,
+        "recall": r,
+        "f1": f1,
+        "tn": tn,
+        "fp": fp,
+        "fn": fn,
+        "tp": tp,
+    }
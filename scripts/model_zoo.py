@@ -0,0 +1,123 @@
+# scripts/model_zoo.py
+"""Các model hợp với TF-IDF thưa + bộ chọn model theo F1, độ trễ và kích thước.
+
+train_email_models.py train Logistic Regression, Random Forest và các model ở
+SPARSE_MODELS, rồi dùng select_model để chọn email_best_model.joblib:
+
+  1. chỉ xét model có độ trễ predict_proba / 1000 email <= EMAIL_LATENCY_BUDGET_MS
+     và file joblib <= EMAIL_SIZE_BUDGET_MB (mặc định không giới hạn);
+  2. lấy F1 (VAL) cao nhất; các model kém hơn không quá F1_TOLERANCE
+     (EMAIL_F1_TOLERANCE, mặc định 0.002) được coi là ngang nhau và chọn model
+     nhanh nhất trong số đó.
+
+Nếu không model nào vừa budget thì chọn model nhanh nhất và cảnh báo.
+"""
+
+import io
+import os
+import time
+
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.linear_model import SGDClassifier
+from sklearn.naive_bayes import ComplementNB
+from sklearn.svm import LinearSVC
+
+from metrics import get_metrics
+
+LATENCY_BATCH = 1_000
+LATENCY_REPEATS = 5
+
+
+def _budget(name, default=float("inf")):
+    value = os.environ.get(name, "")
+    return float(value) if value else default
+
+LATENCY_BUDGET_MS = _budget("EMAIL_LATENCY_BUDGET_MS")
+SIZE_BUDGET_MB = _budget("EMAIL_SIZE_BUDGET_MB")
+# F1 kém model tốt nhất không quá mức này thì coi như ngang nhau
+F1_TOLERANCE = _budget("EMAIL_F1_TOLERANCE", 0.002)
+
+
+def sparse_models():
+    """{khoá: (tên, estimator, lưới tham số)}; mọi model đều có predict_proba."""
+    return {
+        "sgd": ("SGD (log loss)",
+                SGDClassifier(loss="log_loss", class_weight="balanced", max_iter=50,
+                              tol=1e-4, random_state=42),
+                {"alpha": [1e-6, 1e-5, 1e-4]}),
+        # LinearSVC không có predict_proba: hiệu chỉnh sigmoid, giữ 1 model duy nhất
+        "svm": ("Linear SVM",
+                CalibratedClassifierCV(LinearSVC(class_weight="balanced"),
+                                       method="sigmoid", cv=3, ensemble=False),
+                {"estimator__C": [0.1, 1, 10]}),
+        "cnb": ("Complement NB",
+                ComplementNB(),
+                {"alpha": [0.1, 0.5, 1.0]}),
+    }
+
+
+def sample_rows(X, n=LATENCY_BATCH):
+    """n dòng đầu của X, lặp lại X nếu không đủ n dòng."""
+    if X.shape[0] >= n:
+        return X[:n]
+    reps = -(-n // max(X.shape[0], 1))
+    return sp.vstack([X] * reps, format="csr")[:n]
+
+def predict_latency_ms(model, X, repeats=LATENCY_REPEATS):
+    """Trung vị thời gian predict_proba cho 1 batch LATENCY_BATCH dòng (ms)."""
+    batch = sample_rows(X)
+    model.predict_proba(batch[:10])  # warm-up
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        model.predict_proba(batch)
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times)) * 1000
+
+def artifact_size_mb(model):
+    """Kích thước file khi joblib.dump như train_email_models.py."""
+    buf = io.BytesIO()
+    joblib.dump(model, buf)
+    return buf.tell() / 1e6
+
+
+def evaluate_models(models, X_val, y_val, fit_seconds=None):
+    """Metrics VAL + độ trễ + kích thước cho từng model -> list dict."""
+    rows = []
+    for name, model in models.items():
+        row = {"model": name, **get_metrics(y_val, model.predict(X_val))}
+        row["latency_ms_per_1k"] = predict_latency_ms(model, X_val)
+        row["size_mb"] = artifact_size_mb(model)
+        row["fit_seconds"] = (fit_seconds or {}).get(name, float("nan"))
+        rows.append(row)
+    return rows
+
+def select_model(rows, latency_budget_ms=LATENCY_BUDGET_MS, size_budget_mb=SIZE_BUDGET_MB,
+                 f1_tolerance=F1_TOLERANCE):
+    """Tên model được chọn; đánh dấu within_budget / selected trong `rows`."""
+    for row in rows:
+        row["within_budget"] = (row["latency_ms_per_1k"] <= latency_budget_ms
+                                and row["size_mb"] <= size_budget_mb)
+        row["selected"] = False
+
+    ok = [row for row in rows if row["within_budget"]]
+    if not ok:
+        best = min(rows, key=lambda row: row["latency_ms_per_1k"])
+        print(f"⚠ Không model nào vừa budget ({latency_budget_ms:g} ms/1k, "
+              f"{size_budget_mb:g} MB) -> chọn model nhanh nhất: {best['model']}")
+    else:
+        top_f1 = max(row["f1"] for row in ok)
+        near = [row for row in ok if row["f1"] >= top_f1 - f1_tolerance]
+        best = min(near, key=lambda row: (row["latency_ms_per_1k"], row["size_mb"]))
+    best["selected"] = True
+    return best["model"]
+
+def print_table(rows):
+    print(f"\n{'model':<22}{'F1':>8}{'ms/1k':>10}{'MB':>9}{'fit s':>9}")
+    for row in sorted(rows, key=lambda row: -row["f1"]):
+        mark = "✓" if row.get("selected") else ("" if row.get("within_budget", True) else "✗")
+        print(f"{row['model']:<22}{row['f1']:>8.4f}{row['latency_ms_per_1k']:>10.2f}"
+              f"{row['size_mb']:>9.2f}{row['fit_seconds']:>9.1f} {mark}")
@@ -0,0 +1,163 @@
+# scripts/near_dedup.py
+"""Vân tay email để loại trùng: hash 64-bit (trùng y hệt) + MinHash/LSH (gần trùng).
+
+Mọi hàm tính vector hoá trên cả 1 chunk email bằng numpy, hash cố định (không
+phụ thuộc PYTHONHASHSEED) nên kết quả giống nhau giữa các lần chạy:
+
+  - exact_hashes: hash 64-bit của (subject, body) nguyên văn, giống tiêu chí
+    drop_duplicates(subset=["subject", "body"]) trước đây;
+  - minhash: chữ ký NUM_PERM giá trị trên các shingle k từ liên tiếp của
+    subject + body (chữ thường); tỉ lệ giá trị trùng của 2 chữ ký ước lượng độ
+    tương đồng Jaccard của 2 email;
+  - band_hashes: chia chữ ký thành b band × r dòng (LSH); 2 email chung ít nhất
+    1 band mới được so sánh, nên không phải so từng cặp.
+"""
+
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+NUM_PERM = 64
+SHINGLE = 3
+THRESHOLD = 0.8
+
+# Số hoán vị tính cùng lúc (giới hạn ma trận trung gian shingle × PERM_BLOCK)
+PERM_BLOCK = 8
+# Nhóm LSH tới cỡ này thì so mọi cặp, lớn hơn chỉ so các cặp liền kề
+MAX_BUCKET = 32
+
+_TOKEN = r"\w+"
+_C1 = np.uint64(0xBF58476D1CE4E5B9)
+_C2 = np.uint64(0x94D049BB133111EB)
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_EMPTY = np.uint32(0xFFFFFFFF)
+
+
+def _mix(x):
+    """splitmix64: trộn bit uint64 (phép nhân tràn số là mong muốn)."""
+    x = (x ^ (x >> np.uint64(30))) * _C1
+    x = (x ^ (x >> np.uint64(27))) * _C2
+    return x ^ (x >> np.uint64(31))
+
+def _hash_strings(values):
+    return pd.util.hash_array(np.asarray(values, dtype=object))
+
+def perm_seeds(num_perm=NUM_PERM, seed=1):
+    return _mix(np.arange(1, num_perm + 1, dtype=np.uint64) * _GOLDEN + np.uint64(seed))
+
+def choose_bands(threshold=THRESHOLD, num_perm=NUM_PERM):
+    """(b, r) với b*r <= num_perm sao cho ngưỡng LSH (1/b)^(1/r) gần `threshold` nhất."""
+    best = None
+    for r in range(1, num_perm + 1):
+        b = num_perm // r
+        err = abs((1 / b) ** (1 / r) - threshold)
+        if best is None or err < best[0]:
+            best = (err, b, r)
+    return best[1], best[2]
+
+
+def exact_hashes(subjects, bodies):
+    """Hash 64-bit của từng cặp (subject, body)."""
+    hs = _hash_strings(pd.Series(subjects, dtype=object).fillna("").astype(str).to_numpy())
+    hb = _hash_strings(pd.Series(bodies, dtype=object).fillna("").astype(str).to_numpy())
+    return _mix(hs ^ _mix(hb + _GOLDEN))
+
+def shingle_hashes(texts, k=SHINGLE):
+    """Hash các shingle k từ của mỗi text -> (hash uint64, chỉ số text), xếp theo text.
+
+    Text ít hơn k từ dùng từng từ làm shingle; text không có từ nào không có shingle.
+    """
+    tokens = pd.Series(texts, dtype=object).fillna("").astype(str).str.lower().str.findall(_TOKEN)
+    lengths = tokens.str.len().to_numpy(dtype=np.int64)
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)
+    th = _hash_strings(np.fromiter(chain.from_iterable(tokens), dtype=object, count=total))
+    doc = np.repeat(np.arange(len(tokens), dtype=np.int64), lengths)
+
+    short = lengths[doc] < k
+    parts_h, parts_d = [th[short]], [doc[short]]
+    if total >= k:
+        m = total - k + 1
+        sh = th[:m].copy()
+        for j in range(1, k):
+            sh = _mix(sh ^ (th[j:j + m] * (_GOLDEN + np.uint64(j))))
+        valid = doc[:m] == doc[k - 1:]
+        parts_h.append(sh[valid])
+        parts_d.append(doc[:m][valid])
+    h, d = np.concatenate(parts_h), np.concatenate(parts_d)
+    order = np.argsort(d, kind="stable")
+    return h[order], d[order]
+
+def minhash(texts, num_perm=NUM_PERM, k=SHINGLE, seeds=None):
+    """Chữ ký MinHash (n, num_perm) uint32 và mask các text có shingle."""
+    seeds = perm_seeds(num_perm) if seeds is None else seeds
+    n = len(texts)
+    sig = np.full((n, num_perm), _EMPTY, dtype=np.uint32)
+    sh, doc = shingle_hashes(texts, k)
+    has = np.zeros(n, dtype=bool)
+    if len(sh) == 0:
+        return sig, has
+    starts = np.flatnonzero(np.r_[True, doc[1:] != doc[:-1]])
+    present = doc[starts]
+    has[present] = True
+    for p in range(0, num_perm, PERM_BLOCK):
+        hv = (_mix(sh[:, None] ^ seeds[None, p:p + PERM_BLOCK]) >> np.uint64(32)).astype(np.uint32)
+        sig[present, p:p + PERM_BLOCK] = np.minimum.reduceat(hv, starts, axis=0)
+    return sig, has
+
+def band_hashes(sig, bands, rows):
+    """Hash uint64 của từng band (n, bands)."""
+    out = np.empty((len(sig), bands), dtype=np.uint64)
+    for b in range(bands):
+        h = np.full(len(sig), b + 1, dtype=np.uint64) * _GOLDEN
+        for c in sig[:, b * rows:(b + 1) * rows].T:
+            h = _mix(h ^ c.astype(np.uint64))
+        out[:, b] = h
+    return out
+
+def candidate_pairs(band_col, eligible, labels=None, max_bucket=MAX_BUCKET):
+    """Các cặp (a, b), a < b, cùng hash ở 1 band (và cùng nhãn nếu có `labels`).
+
+    Nhóm <= max_bucket dòng: mọi cặp trong nhóm. Nhóm lớn hơn: các cặp liền kề
+    theo chỉ số, đủ để nối cả nhóm khi các email thật sự gần trùng nhau mà số
+    cặp vẫn tuyến tính. Dòng không `eligible` (không có shingle) bị bỏ qua.
+    """
+    idx = np.flatnonzero(eligible)
+    vals = np.asarray(band_col)[idx]
+    if labels is None:
+        order = np.argsort(vals, kind="stable")
+        idx, vals = idx[order], vals[order]
+        is_start = np.r_[True, vals[1:] != vals[:-1]]
+    else:
+        lab = np.asarray(labels)[idx]
+        order = np.lexsort((idx, lab, vals))
+        idx, vals, lab = idx[order], vals[order], lab[order]
+        is_start = np.r_[True, (vals[1:] != vals[:-1]) | (lab[1:] != lab[:-1])]
+    group = np.cumsum(is_start)
+    size = np.bincount(group)[group]
+    small = size <= max_bucket
+    out_a, out_b = [], []
+    for d in range(1, int(size[small].max(initial=1))):
+        pair = group[:-d] == group[d:]
+        if d > 1:
+            pair &= small[:-d]
+        if not pair.any():
+            break
+        out_a.append(idx[:-d][pair])
+        out_b.append(idx[d:][pair])
+    if not out_a and len(idx) > 1:
+        pair = group[:-1] == group[1:]
+        out_a.append(idx[:-1][pair])
+        out_b.append(idx[1:][pair])
+    if not out_a:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+    return np.concatenate(out_a), np.concatenate(out_b)
+
+def similarity(sig, a, b, block=100_000):
+    """Jaccard ước lượng từ chữ ký cho các cặp (a[i], b[i])."""
+    out = np.empty(len(a))
+    for s in range(0, len(a), block):
+        out[s:s + block] = (np.asarray(sig[a[s:s + block]]) == np.asarray(sig[b[s:s + block]])).mean(axis=1)
+    return out
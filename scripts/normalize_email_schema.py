@@ -1,49 +1,86 @@
 # scripts/normalize_email_schema.py
-import pandas as pd, csv
-from pathlib import Path
+import pandas as pd, csv, os
+
+from profiling import set_rows, start_stage, step
+from table_io import (CHUNK_SIZE, TableWriter, iter_table, read_table, resolve_table,
+                      storage_of, table_path, write_table)
+
+start_stage()
+
+COLUMNS = ['email_from', 'domain', 'subject', 'body', 'label']
 
 # Chấp nhận 2 vị trí phổ biến của file
-candidates = [Path('data/dataset_email_cleaned.csv'),
-              Path('dataset_email_cleaned.csv')]
+candidates = [resolve_table('data/dataset_email_cleaned.csv'),
+              resolve_table('dataset_email_cleaned.csv')]
 in_path = next((p for p in candidates if p.exists()), None)
 if in_path is None:
     raise FileNotFoundError("Không tìm thấy dataset_email_cleaned.csv (ở ./ hoặc ./data/).")
 
-out_path = Path('data/dataset_email_cleaned_norm.csv')
+out_path = table_path('data/dataset_email_cleaned_norm.csv')
 out_path.parent.mkdir(parents=True, exist_ok=True)
 
 # Đọc robust cho nội dung dài/có dấu phẩy/ngoặc kép
-df = pd.read_csv(in_path, encoding='utf-8', engine='python',
-                 quoting=csv.QUOTE_MINIMAL, on_bad_lines='skip')
-
-# 1) content -> body
-if 'body' not in df.columns and 'content' in df.columns:
-    df = df.rename(columns={'content': 'body'})
-
-# 2) bảo đảm subject/email_from/domain tồn tại (có thể để rỗng)
-for col in ['subject', 'email_from', 'domain']:
-    if col not in df.columns:
-        df[col] = ''
-
-# 3) chuẩn nhãn
-if 'label' not in df.columns:
-    # fallback nếu thiếu (không phải trường hợp của bạn)
-    if 'type' in df.columns:
-        m = {'phishing':1, 'spam':1, 'scam':1, 'ham':0, 'legit':0, 'legitimate':0}
-        df['label'] = df['type'].astype(str).str.lower().map(m).fillna(0).astype('int8')
+# (Parquet không có vấn đề quoting nên không bị mất dòng)
+csv_kwargs = {}
+if storage_of(in_path) == 'csv':
+    csv_kwargs = dict(engine='python', quoting=csv.QUOTE_MINIMAL, on_bad_lines='skip')
+
+
+def normalize(df):
+    """Đưa 1 bảng (hoặc 1 chunk) về 5 cột chuẩn."""
+    # 1) content -> body
+    if 'body' not in df.columns and 'content' in df.columns:
+        df = df.rename(columns={'content': 'body'})
+
+    # 2) bảo đảm subject/email_from/domain tồn tại (có thể để rỗng)
+    for col in ['subject', 'email_from', 'domain']:
+        if col not in df.columns:
+            df[col] = ''
+
+    # 3) chuẩn nhãn
+    if 'label' not in df.columns:
+        # fallback nếu thiếu (không phải trường hợp của bạn)
+        if 'type' in df.columns:
+            m = {'phishing':1, 'spam':1, 'scam':1, 'ham':0, 'legit':0, 'legitimate':0}
+            df['label'] = df['type'].astype(str).str.lower().map(m).fillna(0).astype('int8')
+        else:
+            raise ValueError("Thiếu cột 'label' và không có cột thay thế ('type').")
     else:
-        raise ValueError("Thiếu cột 'label' và không có cột thay thế ('type').")
-else:
-    df['label'] = pd.to_numeric(df['label'], errors='coerce').fillna(0).astype('int8')
+        df['label'] = pd.to_numeric(df['label'], errors='coerce').fillna(0).astype('int8')
+
+    # 4) chỉ giữ đúng thứ tự 5 cột chuẩn
+    df = df[COLUMNS].copy()
 
-# 4) chỉ giữ đúng thứ tự 5 cột chuẩn
-df = df[['email_from','domain','subject','body','label']]
+    # 5) vệ sinh rỗng/NA
+    df['subject'] = df['subject'].fillna('')
+    df['body']    = df['body'].fillna('')
+    return df
 
-# 5) vệ sinh rỗng/NA
-df['subject'] = df['subject'].fillna('')
-df['body']    = df['body'].fillna('')
 
-df.to_csv(out_path, index=False, encoding='utf-8')
-print("✅ Saved:", out_path, "| Rows:", len(df))
-print("Columns:", df.columns.tolist())
-print("Label distribution:", df['label'].value_counts().to_dict())
+if CHUNK_SIZE:
+    # Chế độ chunk: chuẩn hoá + ghi từng khối, chỉ cộng dồn số dòng theo nhãn
+    tmp_path = out_path.with_name(out_path.name + '.tmp')
+    labels = pd.Series(dtype='int64')
+    with TableWriter(tmp_path, COLUMNS, storage=storage_of(out_path)) as writer, \
+            step('read_normalize_write') as s:
+        for chunk in iter_table(in_path, columns=None, chunksize=CHUNK_SIZE, **csv_kwargs):
+            chunk = normalize(chunk)
+            writer.write(chunk)
+            labels = labels.add(chunk['label'].value_counts(), fill_value=0)
+        s.rows = int(labels.sum())
+    os.replace(tmp_path, out_path)
+    n_rows, label_counts = int(labels.sum()), labels.astype('int64').to_dict()
+else:
+    with step('read') as s:
+        df = read_table(in_path, **csv_kwargs)
+        s.rows = len(df)
+    with step('normalize', rows=len(df)):
+        df = normalize(df)
+    with step('write', rows=len(df)):
+        write_table(df, out_path)
+    n_rows, label_counts = len(df), df['label'].value_counts().to_dict()
+set_rows(n_rows)
+
+print("✅ Saved:", out_path, "| Rows:", n_rows)
+print("Columns:", COLUMNS)
+print("Label distribution:", label_counts)
@@ -1,18 +1,35 @@
 # scripts/parse_enron.py
 
+import argparse
 import email
-from pathlib import Path
-import pandas as pd
+import io
+import os
 import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+from email_cleaner import clean_body, keep_body
+from parse_manifest import (content_hash, copy_without_keys, file_entry,
+                            load_manifest, plan_update, row_key, save_manifest)
+from profiling import cpu_seconds, record_step, set_rows, start_stage, step
+from table_io import TableWriter, storage_of, table_path
 
 # Thư mục maildir của ENRON (tính từ thư mục project/)
 ENRON_ROOT = Path("../enron_mail_20150507/maildir")
 
 OUT_DIR = Path("data_clean")
-OUT_DIR.mkdir(exist_ok=True)
-OUT_FILE = OUT_DIR / "enron_clean.csv"
+OUT_FILE = table_path(OUT_DIR / "enron_clean.csv")
+
+COLUMNS = ["email_from", "domain", "subject", "body", "label"]
+
+# Số file gửi cho worker trong 1 task (đủ lớn để giảm overhead IPC)
+CHUNK_SIZE = 500
+# Số dòng tối đa giữ trong RAM trước khi ghi ra file
+BATCH_SIZE = 20_000
 
-rows = []
 
 def extract_body(msg):
     """Lấy body text từ email (ưu tiên text/plain)."""
@@ -46,19 +63,12 @@ def safe_str(x):
     except Exception:
         return ""
 
-if not ENRON_ROOT.exists():
-    raise FileNotFoundError(f"Không tìm thấy thư mục ENRON: {ENRON_ROOT}")
-
-print(f"Đang duyệt thư mục ENRON: {ENRON_ROOT}")
+def parse_message(raw, clean=False):
+    """Parse nội dung 1 file maildir -> [email_from, domain, subject, body, 0] hoặc None.
 
-count = 0
-for path in ENRON_ROOT.rglob("*"):
-    if not path.is_file():
-        continue
+    clean=True: làm sạch body ngay (email_cleaner), bỏ email có body quá ngắn/dài.
+    """
     try:
-        # Đọc file dạng text (enron là text thuần)
-        with open(path, "r", errors="ignore") as f:
-            raw = f.read()
         msg = email.message_from_string(raw)
 
         email_from = safe_str(msg.get("From", ""))
@@ -67,7 +77,12 @@ for path in ENRON_ROOT.rglob("*"):
 
         # bỏ email rỗng hoàn toàn
         if not subject.strip() and not body.strip():
-            continue
+            return None
+
+        if clean:
+            body = clean_body(body)
+            if not keep_body(body):
+                return None
 
         # domain từ from (nếu có)
         domain = ""
@@ -75,28 +90,153 @@ for path in ENRON_ROOT.rglob("*"):
         if m:
             domain = m.group(1).lower()
 
-        rows.append([email_from, domain, subject, body, 0])  # label = 0 (HAM)
-        count += 1
-        if count % 10000 == 0:
-            print(f"  Đã parse {count} email...")
-
+        return [email_from, domain, subject, body, 0]  # label = 0 (HAM)
     except Exception:
         # nếu mail lỗi thì bỏ qua
-        continue
-
-print(f"Tổng số email ENRON parse được: {count}")
-print("Đang ghi CSV...")
+        return None
 
-df = pd.DataFrame(
-    rows,
-    columns=["email_from", "domain", "subject", "body", "label"]
-)
+def parse_file(path, clean=False):
+    """Đọc + parse 1 file -> (entry manifest, dòng hoặc None).
 
-# ép kiểu & loại trùng (subject+body)
-df["subject"] = df["subject"].astype(str)
-df["body"] = df["body"].astype(str)
-df = df.drop_duplicates(subset=["subject", "body"], keep="first")
-
-df.to_csv(OUT_FILE, index=False, encoding="utf-8")
-print(f"✅ Đã lưu ENRON sạch tại: {OUT_FILE}")
-print("Số dòng sau khi loại trùng:", len(df))
+    Entry là None nếu không đọc được file (sẽ được thử lại ở lần chạy sau).
+    """
+    try:
+        st = os.stat(path)
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None, None
+    # Giải mã giống open(path, "r", errors="ignore") để giữ nguyên output cũ
+    raw = io.TextIOWrapper(io.BytesIO(data), errors="ignore").read()
+    row = parse_message(raw, clean)
+    keys = [row_key(row[2], row[3])] if row is not None else []
+    return file_entry(path, st, content_hash(data), keys), row
+
+def parse_chunk(paths, clean=False):
+    """Chạy trong worker: parse 1 nhóm file, giữ nguyên thứ tự."""
+    return [(path, *parse_file(path, clean)) for path in paths]
+
+def iter_maildir(root):
+    """Các file trong maildir theo thứ tự rglob."""
+    return (str(p) for p in root.rglob("*") if p.is_file())
+
+def iter_path_chunks(paths, size):
+    paths = iter(paths)
+    while True:
+        chunk = list(islice(paths, size))
+        if not chunk:
+            return
+        yield chunk
+
+def iter_parsed_chunks(paths, workers, clean=False):
+    """Parse song song nhưng vẫn trả kết quả theo đúng thứ tự file.
+
+    Chỉ giữ tối đa 2 * workers task đang chạy để RAM không tăng theo corpus.
+    """
+    chunks = iter_path_chunks(paths, CHUNK_SIZE)
+    if workers <= 1:
+        for chunk in chunks:
+            yield parse_chunk(chunk, clean)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(parse_chunk, chunk, clean))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def main():
+    start_stage()
+    parser = argparse.ArgumentParser(description="Parse maildir ENRON -> data_clean/enron_clean.{csv,parquet}")
+    parser.add_argument("--root", type=Path, default=ENRON_ROOT,
+                        help="thư mục maildir của ENRON")
+    parser.add_argument("--out", type=Path, default=OUT_FILE)
+    parser.add_argument("--manifest", type=Path,
+                        help="mặc định: <out>.manifest.json")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="số process parse song song (1 = chạy tuần tự)")
+    parser.add_argument("--full", action="store_true",
+                        help="bỏ qua manifest, parse lại toàn bộ maildir")
+    parser.add_argument("--clean-body", action="store_true",
+                        help="làm sạch body ngay lúc parse (như clean_final_dataset.py)")
+    args = parser.parse_args()
+    if args.manifest is None:
+        # Mỗi file đầu ra (csv/parquet) có manifest riêng
+        args.manifest = args.out.with_name(args.out.name + ".manifest.json")
+    options = {"clean_body": True} if args.clean_body else {}
+
+    if not args.root.exists():
+        raise FileNotFoundError(f"Không tìm thấy thư mục ENRON: {args.root}")
+
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = args.out.with_name(args.out.name + ".tmp")
+
+    old_files = {}
+    if not args.full and args.out.exists():
+        old_files = load_manifest(args.manifest, options)
+
+    print(f"Đang duyệt thư mục ENRON: {args.root} ({args.workers} worker)")
+
+    count = 0
+    kept = 0
+    batch = []
+    # Ghi từng batch ra file tạm, xong mới đổi tên -> không để lại file dở dang
+    with TableWriter(tmp_file, COLUMNS, storage=storage_of(args.out)) as writer:
+        if old_files:
+            # Incremental: chỉ parse file mới/đã đổi, gỡ dòng của file đã đổi/bị xoá
+            with step("plan_update"):
+                files, paths, seen, stale_keys = plan_update(old_files, list(iter_maildir(args.root)))
+            print(f"Incremental: {len(files)} file giữ nguyên, {len(paths)} file cần parse, "
+                  f"{len(stale_keys)} dòng cũ bị gỡ")
+            with step("copy_old_rows"):
+                copy_without_keys(args.out, writer, stale_keys)
+        else:
+            files, seen = {}, set()
+            paths = iter_maildir(args.root)
+
+        t0, cpu0 = time.perf_counter(), cpu_seconds()
+        for results in iter_parsed_chunks(paths, args.workers, args.clean_body):
+            for path, entry, row in results:
+                if entry is not None:
+                    files[path] = entry
+                if row is None:
+                    continue
+                count += 1
+                if count % 10000 == 0:
+                    rate = count / max(time.perf_counter() - t0, 1e-9)
+                    print(f"  Đã parse {count} email... ({rate:,.0f} email/s)")
+
+                # loại trùng (subject+body), giữ bản đầu tiên
+                key = entry["keys"][0]
+                if key in seen:
+                    continue
+                seen.add(key)
+                batch.append(row)
+
+            if len(batch) >= BATCH_SIZE:
+                writer.write(batch)
+                kept += len(batch)
+                batch = []
+
+        if batch:
+            writer.write(batch)
+            kept += len(batch)
+        record_step("parse_write", time.perf_counter() - t0, rows=count,
+                    cpu_s=cpu_seconds() - cpu0)
+
+    os.replace(tmp_file, args.out)
+    # Ghi manifest sau CSV: nếu dừng giữa chừng thì lần sau chỉ parse lại, không mất dòng
+    save_manifest(files, args.manifest, options)
+    set_rows(count)
+
+    print(f"Tổng số email ENRON parse được: {count}")
+    print(f"✅ Đã lưu ENRON sạch tại: {args.out}")
+    print("Số dòng mới ghi:", kept)
+    print("Tổng số dòng sau khi loại trùng:", len(seen))
+
+
+if __name__ == "__main__":
+    main()
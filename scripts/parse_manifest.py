@@ -0,0 +1,111 @@
+# scripts/parse_manifest.py
+"""Manifest cho parse tăng dần (incremental) của parse_enron / parse_phishing_mbox.
+
+Mỗi file nguồn được ghi lại theo đường dẫn, size, mtime và hash nội dung,
+cùng danh sách khoá (subject, body) mà file đó đã sinh ra trong data_clean/.
+Lần chạy sau chỉ parse file mới hoặc đã thay đổi; dòng của file bị xoá/đổi
+được gỡ khỏi bảng đầu ra trước khi ghép dòng mới vào.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from table_io import iter_table
+
+# Tăng số này khi đổi logic parse để buộc parse lại toàn bộ
+MANIFEST_VERSION = 1
+
+
+def row_key(subject, body):
+    """Khoá loại trùng của 1 email: hash 128-bit của (subject, body)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(subject.encode("utf-8", "surrogatepass"))
+    h.update(b"\x00")
+    h.update(body.encode("utf-8", "surrogatepass"))
+    return h.hexdigest()
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def file_hash(path, block_size=1 << 20):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def file_entry(path, st, digest, keys):
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": digest, "keys": keys}
+
+def load_manifest(path, options=None):
+    """Đọc manifest; trả về {} nếu chưa có, khác phiên bản hoặc khác `options`.
+
+    `options` là các tuỳ chọn parse làm đổi dòng đầu ra (ví dụ --clean-body):
+    đổi tuỳ chọn thì phải parse lại toàn bộ.
+    """
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    if data.get("options", {}) != (options or {}):
+        return {}
+    return data["files"]
+
+def save_manifest(files, path, options=None):
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "options": options or {}, "files": files}, f)
+    os.replace(tmp, path)
+
+def is_unchanged(path, entry):
+    """So size + mtime trước; chỉ hash lại nội dung khi mtime đổi mà size giữ nguyên."""
+    if entry is None:
+        return False
+    st = os.stat(path)
+    if st.st_size != entry["size"]:
+        return False
+    if st.st_mtime_ns != entry["mtime_ns"]:
+        if file_hash(path) != entry["hash"]:
+            return False
+        entry["mtime_ns"] = st.st_mtime_ns
+    return True
+
+def plan_update(old_files, paths):
+    """Chia file nguồn thành (giữ nguyên, cần parse, khoá cũ cần gỡ).
+
+    Khoá cần gỡ là khoá của file đã đổi/bị xoá mà không còn file giữ nguyên
+    nào tham chiếu tới.
+    """
+    kept = {}
+    todo = []
+    for path in paths:
+        entry = old_files.get(path)
+        if is_unchanged(path, entry):
+            kept[path] = entry
+        else:
+            todo.append(path)
+
+    kept_keys = {k for entry in kept.values() for k in entry["keys"]}
+    stale_keys = {
+        k
+        for path, entry in old_files.items()
+        if path not in kept
+        for k in entry["keys"]
+    } - kept_keys
+    return kept, todo, kept_keys, stale_keys
+
+def copy_without_keys(src, writer, stale_keys):
+    """Chép bảng đầu ra cũ vào `writer` (table_io.TableWriter), bỏ các dòng có khoá trong `stale_keys`."""
+    if not stale_keys:
+        writer.copy_from(src)
+        return
+
+    for chunk in iter_table(src):
+        keys = [row_key(s, b) for s, b in zip(chunk["subject"], chunk["body"])]
+        writer.write(chunk[[k not in stale_keys for k in keys]])
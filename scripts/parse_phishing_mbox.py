@@ -1,23 +1,33 @@
-import mailbox
+import argparse
+import os
 import pandas as pd
 from pathlib import Path
 import re
-import os
-
-# === 1) Tạo thư mục output nếu chưa có ===
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from email_cleaner import clean_body, keep_body
+from mbox_reader import iter_mbox
+from parse_manifest import (copy_without_keys, file_entry, file_hash,
+                            load_manifest, plan_update, row_key, save_manifest)
+from profiling import cpu_seconds, record_step, set_rows, start_stage, step
+from table_io import TableWriter, storage_of, table_path
+
+# === 1) Thư mục output ===
 OUT_DIR = Path("data_clean")
-OUT_DIR.mkdir(exist_ok=True)
+OUT_FILE = table_path(OUT_DIR / "phishing_clean.csv")
 
 # === 2) Đường dẫn chứa file phishing ===
 PHISH_DIR = Path("data_raw/phishing")
 
-files = [
-    PHISH_DIR / "phishing-2022.txt",
-    PHISH_DIR / "phishing-2023.txt",
-    PHISH_DIR / "phishing-2024.txt"
-]
+# Mọi file phishing-<năm>.txt (phishing-2022/2023/2024, thêm năm mới tự nhận)
+FILE_PATTERN = "phishing-*.txt"
+
+COLUMNS = ["email_from", "domain", "subject", "body", "label"]
 
-rows = []
+# Số dòng tối đa giữ trong RAM trước khi ghi ra file
+BATCH_SIZE = 5_000
 
 def safe_str(x):
     """Chuyển mọi kiểu dữ liệu thành string an toàn"""
@@ -47,52 +57,176 @@ def extract_body(msg):
         return ""
     return ""
 
-# === 3) Parse từng file ===
-for file_path in files:
-    if not file_path.exists():
-        print(f"⚠ FILE KHÔNG TỒN TẠI: {file_path}")
-        continue
-
-    print(f"➡ Đang parse file: {file_path.name}")
-
+def parse_message(msg):
+    """1 email mbox -> [email_from, domain, subject, body, 1]"""
+    email_from = safe_str(msg.get("From", ""))
+    raw_subject = msg.get("Subject", "")
+    subject = safe_str(raw_subject)
+    body = safe_str(extract_body(msg))
+
+    # trích domain
+    domain = ""
+    match = re.search(r"@([A-Za-z0-9.\-]+)", email_from)
+    if match:
+        domain = match.group(1).lower()
+
+    return [email_from, domain, subject, body, 1]  # label = 1
+
+def parse_mbox(file_path, part_path, clean=False):
+    """Chạy trong worker: stream 1 file mbox -> CSV tạm `part_path` (không header).
+
+    clean=True: làm sạch body ngay (email_cleaner), bỏ email có body quá ngắn/dài.
+
+    Chỉ loại trùng trong phạm vi file; trả về entry manifest, khoá của các dòng
+    đã ghi (theo thứ tự) và tốc độ parse. None nếu không mở được file.
+    """
+    st = os.stat(file_path)
+    t0 = time.perf_counter()
+    n_msgs = 0
+    keys = []
+    seen = set()
+    batch = []
     try:
-        mbox = mailbox.mbox(file_path)
-    except Exception as e:
+        with open(part_path, "w", encoding="utf-8", newline="") as f:
+            for msg in iter_mbox(file_path):
+                n_msgs += 1
+                try:
+                    row = parse_message(msg)
+                except Exception as e:
+                    # Nếu có lỗi, bỏ qua email lỗi
+                    continue
+                if clean:
+                    row[3] = clean_body(row[3])
+                    if not keep_body(row[3]):
+                        continue
+                key = row_key(row[2], row[3])
+                if key in seen:
+                    continue
+                seen.add(key)
+                keys.append(key)
+                batch.append(row)
+                if len(batch) >= BATCH_SIZE:
+                    pd.DataFrame(batch, columns=COLUMNS).to_csv(f, index=False, header=False)
+                    batch = []
+            if batch:
+                pd.DataFrame(batch, columns=COLUMNS).to_csv(f, index=False, header=False)
+    except OSError as e:
         print("‼ LỖI MỞ FILE:", e)
-        continue
-
-    for msg in mbox:
-        try:
-            email_from = safe_str(msg.get("From", ""))
-            raw_subject = msg.get("Subject", "")
-            subject = safe_str(raw_subject)
-            body = safe_str(extract_body(msg))
-
-            # trích domain
-            domain = ""
-            match = re.search(r"@([A-Za-z0-9.\-]+)", email_from)
-            if match:
-                domain = match.group(1).lower()
-
-            rows.append([email_from, domain, subject, body, 1])  # label = 1
-        except Exception as e:
-            # Nếu có lỗi, bỏ qua email lỗi
-            continue
-
-# === 4) Tạo DataFrame & ép kiểu string ===
-df = pd.DataFrame(rows, columns=["email_from", "domain", "subject", "body", "label"])
-
-# Ép mọi cột thành chuỗi để tránh lỗi "unhashable"
-df["subject"] = df["subject"].astype(str)
-df["body"] = df["body"].astype(str)
-
-# Loại trùng lặp
-df = df.drop_duplicates(subset=["subject", "body"], keep="first")
-
-# === 5) Lưu file kết quả ===
-out_file = OUT_DIR / "phishing_clean.csv"
-df.to_csv(out_file, index=False, encoding="utf-8")
-
-print("\n✅ PARSE HOÀN TẤT!")
-print("📌 Tổng số email phishing:", len(df))
-print("📌 File lưu tại:", out_file)
+        return None
+
+    elapsed = time.perf_counter() - t0
+    entry = file_entry(file_path, st, file_hash(file_path), sorted(seen))
+    return entry, keys, n_msgs, elapsed
+
+def append_part(part_path, keys, seen, writer):
+    """Ghép CSV tạm vào output theo thứ tự file, bỏ dòng đã có ở file trước."""
+    if not keys:
+        return 0
+    if seen.isdisjoint(keys):
+        # Trường hợp thường gặp: không trùng với file khác -> chép nguyên khối
+        writer.write_csv_rows(part_path)
+        seen.update(keys)
+        return len(keys)
+
+    n_new = 0
+    key_iter = iter(keys)
+    for chunk in pd.read_csv(part_path, names=COLUMNS, encoding="utf-8", dtype=str,
+                             keep_default_na=False, chunksize=BATCH_SIZE):
+        mask = []
+        for key in (next(key_iter) for _ in range(len(chunk))):
+            mask.append(key not in seen)
+            seen.add(key)
+        chunk = chunk[mask]
+        writer.write(chunk)
+        n_new += len(chunk)
+    return n_new
+
+def iter_parsed(todo, parts, workers, clean=False):
+    """Mỗi file mbox 1 worker; kết quả trả về theo đúng thứ tự file."""
+    if workers <= 1:
+        yield from (parse_mbox(p, part, clean) for p, part in zip(todo, parts))
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(parse_mbox, p, part, clean) for p, part in zip(todo, parts)]
+        for fut in futures:
+            yield fut.result()
+
+def main():
+    start_stage()
+    parser = argparse.ArgumentParser(description="Parse mbox phishing -> data_clean/phishing_clean.{csv,parquet}")
+    parser.add_argument("--dir", type=Path, default=PHISH_DIR)
+    parser.add_argument("--out", type=Path, default=OUT_FILE)
+    parser.add_argument("--manifest", type=Path,
+                        help="mặc định: <out>.manifest.json")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="số file mbox parse đồng thời (1 = tuần tự)")
+    parser.add_argument("--full", action="store_true",
+                        help="bỏ qua manifest, parse lại mọi file mbox")
+    parser.add_argument("--clean-body", action="store_true",
+                        help="làm sạch body ngay lúc parse (như clean_final_dataset.py)")
+    args = parser.parse_args()
+    if args.manifest is None:
+        # Mỗi file đầu ra (csv/parquet) có manifest riêng
+        args.manifest = args.out.with_name(args.out.name + ".manifest.json")
+    options = {"clean_body": True} if args.clean_body else {}
+
+    files = sorted(str(p) for p in args.dir.glob(FILE_PATTERN))
+    if not files:
+        print(f"⚠ KHÔNG CÓ FILE {FILE_PATTERN} TRONG: {args.dir}")
+
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = args.out.with_name(args.out.name + ".tmp")
+
+    old_files = {}
+    if not args.full and args.out.exists():
+        old_files = load_manifest(args.manifest, options)
+
+    n_new = 0
+    n_msgs_total = 0
+    t0 = time.perf_counter()
+    with tempfile.TemporaryDirectory(dir=args.out.parent) as part_dir, \
+            TableWriter(tmp_file, COLUMNS, storage=storage_of(args.out)) as writer:
+        # === 3) Chỉ parse file mới / đã thay đổi ===
+        if old_files:
+            with step("plan_update"):
+                entries, todo, seen, stale_keys = plan_update(old_files, files)
+            print(f"♻ Incremental: {len(entries)} file giữ nguyên, {len(todo)} file cần parse")
+            with step("copy_old_rows"):
+                copy_without_keys(args.out, writer, stale_keys)
+        else:
+            entries, todo, seen = {}, files, set()
+
+        parts = [os.path.join(part_dir, f"{i}.csv") for i in range(len(todo))]
+        workers = min(args.workers, len(todo))
+        print(f"➡ Đang parse {len(todo)} file mbox ({max(workers, 1)} worker)")
+        t_parse, cpu0 = time.perf_counter(), cpu_seconds()
+
+        for file_path, part_path, res in zip(todo, parts, iter_parsed(todo, parts, workers, args.clean_body)):
+            if res is None:
+                continue
+            entry, keys, n_msgs, elapsed = res
+            entries[file_path] = entry
+            n_msgs_total += n_msgs
+            n_new += append_part(part_path, keys, seen, writer)
+            os.remove(part_path)
+            print(f"   ✓ {Path(file_path).name}: {n_msgs} email, "
+                  f"{n_msgs / max(elapsed, 1e-9):,.0f} email/s")
+            record_step(f"parse {Path(file_path).name}", elapsed, rows=n_msgs, quiet=True)
+        record_step("parse_write", time.perf_counter() - t_parse, rows=n_msgs_total,
+                    cpu_s=cpu_seconds() - cpu0)
+
+    # === 4) Lưu file kết quả, manifest ghi sau cùng ===
+    os.replace(tmp_file, args.out)
+    save_manifest(entries, args.manifest, options)
+    set_rows(n_msgs_total)
+
+    elapsed = time.perf_counter() - t0
+    print("\n✅ PARSE HOÀN TẤT!")
+    print(f"📌 Tốc độ: {n_msgs_total / max(elapsed, 1e-9):,.0f} email/s ({elapsed:.1f}s)")
+    print("📌 Số email phishing mới:", n_new)
+    print("📌 Tổng số email phishing:", len(seen))
+    print("📌 File lưu tại:", args.out)
+
+
+if __name__ == "__main__":
+    main()
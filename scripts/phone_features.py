@@ -0,0 +1,238 @@
+# scripts/phone_features.py
+"""Đặc trưng số điện thoại, tính vector hoá trên ma trận byte của cả cột.
+
+Kết quả giống hệt các hàm tính từng dòng (has_country_code, digit_entropy, ...)
+mà phone_feature_engineering.py dùng trước đây, kể cả thứ tự cộng trong
+entropy, nên model đã train không bị lệch đặc trưng.
+"""
+
+import math
+import re
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+
+FEATURES = ["length", "has_country_code", "country_code",
+            "digit_entropy", "repeat_ratio", "prefix"]
+
+# Số dòng mỗi lần xử lý, để ma trận trung gian không phình theo cỡ dữ liệu
+CHUNK_SIZE = 1_000_000
+# Chuỗi dài hơn (rác, ghép nhầm cột) tính từng dòng: ma trận byte, argsort và
+# bảng entropy của cả chunk có độ rộng = chuỗi dài nhất, không để 1 giá trị lạ
+# làm chúng phình ra
+MAX_WIDTH = 32
+
+_ZERO, _NINE, _PLUS = ord("0"), ord("9"), ord("+")
+_PAD = 255
+
+
+# ======== HÀM TÍNH TỪNG DÒNG (bản gốc, dùng cho chuỗi không phải ASCII) ========
+
+def has_country_code(phone):
+    phone = str(phone)
+    return 1 if phone.startswith("+") else 0
+
+def extract_country_code(phone):
+    phone = str(phone)
+    if phone.startswith("+"):
+        match = re.match(r"\+(\d{1,3})", phone)
+        if match:
+            return int(match.group(1))
+    return 0
+
+def digit_entropy(phone):
+    digits = [d for d in str(phone) if d.isdigit()]
+    if len(digits) == 0:
+        return 0
+    counts = {}
+    for d in digits:
+        counts[d] = counts.get(d, 0) + 1
+    total = len(digits)
+    entropy = 0
+    for c in counts.values():
+        p = c / total
+        entropy -= p * math.log2(p)
+    return entropy
+
+def repeat_ratio(phone):
+    digits = [d for d in str(phone) if d.isdigit()]
+    if len(digits) < 2:
+        return 0
+    repeats = sum(digits[i] == digits[i+1] for i in range(len(digits)-1))
+    return repeats / (len(digits)-1)
+
+def prefix(phone):
+    digits = re.sub(r"\D","", str(phone))
+    if len(digits) >= 3:
+        return int(digits[:3])
+    return int(digits) if digits else 0
+
+def row_features(phone):
+    return [len(re.sub(r'[^0-9]', '', str(phone))), has_country_code(phone),
+            extract_country_code(phone), digit_entropy(phone),
+            repeat_ratio(phone), prefix(phone)]
+
+
+# ======== BẢN VECTOR HOÁ ========
+
+def _entropy_table(width):
+    """T[n, c] = (c/n) * log2(c/n), tính bằng math như bản gốc; T[n, 0] = 0."""
+    table = np.zeros((width + 1, width + 1))
+    for n in range(1, width + 1):
+        for c in range(1, n + 1):
+            p = c / n
+            table[n, c] = p * math.log2(p)
+    return table
+
+def _leading_number(mat, k_max):
+    """Giá trị số của tối đa k_max chữ số đầu mỗi dòng (dừng ở ký tự không phải số)."""
+    value = np.zeros(len(mat), dtype=np.int64)
+    ok = np.ones(len(mat), dtype=bool)
+    for k in range(k_max):
+        col = mat[:, k].astype(np.int64)
+        ok &= (col >= _ZERO) & (col <= _NINE)
+        value = np.where(ok, value * 10 + (col - _ZERO), value)
+    return value
+
+def _ascii_features(phones):
+    """Tính 6 đặc trưng cho mảng chuỗi ASCII (np.ndarray dtype S, rộng <= MAX_WIDTH)."""
+    n = len(phones)
+    width = max(phones.dtype.itemsize, 4)
+    buf = np.zeros((n, width), dtype=np.uint8)
+    raw = phones.view(np.uint8).reshape(n, phones.dtype.itemsize)
+    buf[:, :raw.shape[1]] = raw
+
+    is_digit = (buf >= _ZERO) & (buf <= _NINE)
+    length = is_digit.sum(axis=1).astype(np.int64)
+
+    # Dồn các chữ số về bên trái giữ thứ tự: "+84 91-2" -> "84912", phần còn lại = _PAD
+    cols = np.arange(width, dtype=np.int16)
+    order = np.argsort(np.where(is_digit, cols, cols + width), axis=1)
+    digits = np.take_along_axis(buf, order, axis=1)
+    digits[cols >= length[:, None]] = _PAD
+
+    has_cc = (buf[:, 0] == _PLUS).astype(np.int64)
+    country_code = np.where(has_cc == 1, _leading_number(buf[:, 1:4], 3), 0)
+    prefix_ = _leading_number(digits, 3)
+
+    # repeat_ratio: so sánh mảng chữ số với chính nó dịch 1 vị trí
+    pair_valid = cols[1:] < length[:, None]
+    repeats = ((digits[:, 1:] == digits[:, :-1]) & pair_valid).sum(axis=1)
+    repeat = np.zeros(n)
+    many = length >= 2
+    repeat[many] = repeats[many] / (length[many] - 1)
+
+    # digit_entropy: đếm bằng 1 lần bincount (10 chữ số + 1 ô cho _PAD mỗi dòng)
+    values = np.where(digits == _PAD, 10, digits.astype(np.int64) - _ZERO)
+    flat = values + (np.arange(n, dtype=np.int64) * 11)[:, None]
+    counts = np.bincount(flat.ravel(), minlength=n * 11)
+    counts[10::11] = 0
+
+    # Cộng dồn theo thứ tự chữ số xuất hiện lần đầu (giống dict trong bản gốc)
+    # để kết quả float trùng từng bit; vị trí không phải lần đầu cộng 0.0
+    table = _entropy_table(width).ravel()
+    base = length * (width + 1)
+    seen = np.zeros(n, dtype=np.int64)
+    entropy = np.zeros(n)
+    for j in range(width):
+        bit = np.left_shift(1, values[:, j])
+        first = (seen & bit) == 0
+        seen |= bit
+        entropy = entropy - table[base + np.where(first, counts[flat[:, j]], 0)]
+
+    return {
+        "length": length,
+        "has_country_code": has_cc,
+        "country_code": country_code,
+        "digit_entropy": entropy,
+        "repeat_ratio": repeat,
+        "prefix": prefix_,
+    }
+
+def compute_features(phones, chunk_size=CHUNK_SIZE):
+    """Tính FEATURES cho 1 dãy số điện thoại (Series/list/ndarray) -> DataFrame.
+
+    Giữ nguyên index nếu đầu vào là Series. Dòng có ký tự ngoài ASCII hoặc dài
+    hơn MAX_WIDTH ký tự (hiếm) được tính bằng các hàm từng dòng ở trên.
+    """
+    index = phones.index if isinstance(phones, pd.Series) else None
+    strs = np.asarray(pd.Series(phones, dtype=object).astype(str), dtype=object)
+    n = len(strs)
+    out = {
+        "length": np.zeros(n, dtype=np.int64),
+        "has_country_code": np.zeros(n, dtype=np.int64),
+        "country_code": np.zeros(n, dtype=np.int64),
+        "digit_entropy": np.zeros(n),
+        "repeat_ratio": np.zeros(n),
+        "prefix": np.zeros(n, dtype=np.int64),
+    }
+
+    for start in range(0, n, chunk_size):
+        chunk = strs[start:start + chunk_size]
+        fast = np.fromiter(map(len, chunk), np.int64, len(chunk)) <= MAX_WIDTH
+        try:
+            encoded = (chunk if fast.all() else chunk[fast]).astype("S")
+        except UnicodeEncodeError:
+            fast &= np.fromiter((s.isascii() for s in chunk), bool, len(chunk))
+            encoded = chunk[fast].astype("S")
+        for i in np.nonzero(~fast)[0]:
+            for name, value in zip(FEATURES, row_features(chunk[i])):
+                out[name][start + i] = value
+
+        if len(encoded):
+            feats = _ascii_features(encoded)
+            pos = start + np.nonzero(fast)[0]
+            for name in FEATURES:
+                out[name][pos] = feats[name]
+
+    return pd.DataFrame(out, index=index, columns=FEATURES)
+
+
+# ======== TRANSFORMER CHO PIPELINE SKLEARN ========
+
+# Dưới ngưỡng này tính từng dòng bằng Python thuần (ít overhead hơn numpy)
+SMALL_BATCH = 32
+
+def _phone_values(X):
+    """Lấy dãy số điện thoại thô từ Series / list / ndarray / DataFrame (cột 'phone')."""
+    if isinstance(X, pd.DataFrame):
+        X = X["phone"] if "phone" in X.columns else X.iloc[:, 0]
+    if isinstance(X, str):
+        X = [X]
+    X = np.asarray(X, dtype=object)
+    return X[:, 0] if X.ndim == 2 else X
+
+class PhoneFeatureExtractor(TransformerMixin, BaseEstimator):
+    """Chuỗi số điện thoại thô -> ma trận FEATURES (n, 6).
+
+    Đặt làm bước đầu của Pipeline để model lưu ra nhận thẳng số điện thoại:
+
+        model = joblib.load("artifacts/phone/phone_best_model.joblib")
+        model.predict_proba(["+84912345678", "0909000111"])
+
+    (cần scripts/ trong sys.path khi load, vì class nằm ở module này).
+    Không có tham số học nên fit() không làm gì.
+    """
+
+    def fit(self, X, y=None):
+        self.n_features_in_ = 1
+        return self
+
+    def transform(self, X):
+        phones = _phone_values(X)
+        if len(phones) <= SMALL_BATCH:
+            return np.array([row_features(str(p)) for p in phones], dtype=float).reshape(-1, len(FEATURES))
+        return compute_features(phones).to_numpy(dtype=float)
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray(FEATURES, dtype=object)
+
+def predict_proba_batched(model, phones, batch_size=CHUNK_SIZE):
+    """Xác suất spam cho dãy số rất dài, chia batch để bộ nhớ không phình."""
+    phones = _phone_values(phones)
+    out = np.empty(len(phones))
+    for start in range(0, len(phones), batch_size):
+        batch = phones[start:start + batch_size]
+        out[start:start + len(batch)] = model.predict_proba(batch)[:, 1]
+    return out
@@ -0,0 +1,194 @@
+# scripts/phone_lookup.py
+"""Tra cứu số điện thoại spam: index số spam đã biết + model dự phòng.
+
+Phần lớn số cần tra đã có trong 3 file spam (truecaller, robocall,
+extra_spam_phones). Các số này được chuẩn hoá thành khoá int64 và lưu thành
+1 mảng đã sắp xếp (artifacts/phone/spam_index.npy); tra cứu 1 batch là 1 lần
+np.searchsorted. Chỉ những số không có trong index mới đưa qua
+phone_best_model.joblib (Pipeline nhận số thô, xem phone_features.py).
+
+    python scripts/phone_lookup.py build                   # tạo index
+    python scripts/phone_lookup.py score +84912345678 0909000111
+    python scripts/phone_lookup.py bench --batch 1         # đo p50/p99
+"""
+
+import argparse
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from latency import latency_report
+
+RAW_DIR = Path("data_raw/phone")
+SPAM_FILES = ["truecaller_spam.csv", "robocall_spam.csv", "extra_spam_phones.csv"]
+
+ARTIFACT_DIR = Path("artifacts/phone")
+INDEX_FILE = ARTIFACT_DIR / "spam_index.npy"
+MODEL_FILE = ARTIFACT_DIR / "phone_best_model.joblib"
+# Bản xuất memory map (compact_model.py); truyền làm model_file để dùng
+COMPACT_DIR = ARTIFACT_DIR / "compact"
+
+_NOT_PHONE_CHARS = re.compile(r"[^0-9+]")
+
+
+def clean_phone(x: str):
+    x = str(x)
+    x = _NOT_PHONE_CHARS.sub("", x)
+    if 7 <= len(x) <= 15:
+        return x
+    return None
+
+def phone_key(phone):
+    """Số điện thoại -> khoá int64 duy nhất, -1 nếu không hợp lệ.
+
+    Khoá = int("1" + các chữ số) * 2 + (có dấu '+' ở đầu); số "1" đứng trước
+    để giữ các số 0 ở đầu ("0909..." khác "909...").
+    """
+    p = clean_phone(phone)
+    if p is None:
+        return -1
+    plus = p.startswith("+")
+    digits = p[1:] if plus else p
+    if not digits or "+" in digits:
+        return -1
+    return int("1" + digits) * 2 + plus
+
+def phone_keys(phones):
+    return np.fromiter((phone_key(p) for p in phones), dtype=np.int64, count=len(phones))
+
+def load_known_spam(raw_dir=RAW_DIR):
+    """Đọc 3 file spam thô (cột 'phone' dạng chuỗi), giống build_phone_dataset.py."""
+    frames = []
+    for name in SPAM_FILES:
+        path = Path(raw_dir) / name
+        if not path.exists():
+            print(f"⚠ Không có file spam: {path}")
+            continue
+        frames.append(pd.read_csv(path, usecols=["phone"], dtype={"phone": str}))
+    if not frames:
+        return pd.Series([], dtype=object)
+    return pd.concat(frames, ignore_index=True)["phone"]
+
+def build_index(phones):
+    keys = phone_keys(list(phones))
+    return np.unique(keys[keys >= 0])
+
+
+class PhoneSpamLookup:
+    """Index số spam đã biết (mảng int64 đã sắp xếp) + model cho số chưa biết.
+
+    Model chỉ được load khi có số không nằm trong index; `model_file` là file
+    joblib hoặc thư mục compact (compact_model.py).
+    """
+
+    def __init__(self, index, model=None, model_file=MODEL_FILE):
+        self.index = np.asarray(index, dtype=np.int64)
+        self._model = model
+        self.model_file = Path(model_file)
+
+    @classmethod
+    def load(cls, index_file=INDEX_FILE, model_file=MODEL_FILE):
+        return cls(np.load(index_file, mmap_mode="r"), model_file=model_file)
+
+    @property
+    def model(self):
+        if self._model is None:
+            if self.model_file.is_dir():
+                from compact_model import load_phone
+                self._model = load_phone(self.model_file)
+            else:
+                import joblib
+                self._model = joblib.load(self.model_file)
+        return self._model
+
+    def contains(self, phones):
+        """Mảng bool: số nào có trong index spam đã biết."""
+        keys = phone_keys(phones)
+        if len(self.index) == 0:
+            return np.zeros(len(keys), dtype=bool)
+        pos = np.searchsorted(self.index, keys)
+        pos[pos == len(self.index)] = 0
+        return (self.index[pos] == keys) & (keys >= 0)
+
+    def lookup(self, phones):
+        """Tra 1 batch -> (xác suất spam, có trong index không).
+
+        Số có trong index nhận xác suất 1.0; số còn lại gọi model 1 lần cho cả batch.
+        """
+        phones = [phones] if isinstance(phones, str) else list(phones)
+        known = self.contains(phones)
+        proba = np.ones(len(phones))
+        miss = np.nonzero(~known)[0]
+        if len(miss):
+            proba[miss] = self.model.predict_proba([str(phones[i]) for i in miss])[:, 1]
+        return proba, known
+
+
+def bench(service, phones, batch_size, n_calls):
+    rng = np.random.default_rng(42)
+    phones = np.asarray(phones, dtype=object)
+    service.lookup(phones[:batch_size])  # load model + warm-up trước khi đo
+    latencies = []
+    hits = 0
+    for _ in range(n_calls):
+        batch = phones[rng.integers(0, len(phones), batch_size)]
+        t0 = time.perf_counter_ns()
+        _, known = service.lookup(batch)
+        latencies.append(time.perf_counter_ns() - t0)
+        hits += int(known.sum())
+    report = latency_report(latencies, n_calls * batch_size)
+    report["hit_ratio"] = hits / (n_calls * batch_size)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Tra cứu số điện thoại spam (index + model)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_build = sub.add_parser("build", help="tạo index số spam đã biết")
+    p_build.add_argument("--raw-dir", type=Path, default=RAW_DIR)
+    p_build.add_argument("--out", type=Path, default=INDEX_FILE)
+
+    p_score = sub.add_parser("score", help="chấm điểm các số truyền vào")
+    p_score.add_argument("phones", nargs="+")
+
+    p_bench = sub.add_parser("bench", help="đo độ trễ p50/p99")
+    p_bench.add_argument("--batch", type=int, default=1)
+    p_bench.add_argument("--calls", type=int, default=10_000)
+    p_bench.add_argument("--sample", type=Path, default=Path("splits_phone/phone_test.csv"),
+                         help="file có cột phone để lấy số mẫu")
+
+    for p in (p_score, p_bench):
+        p.add_argument("--index", type=Path, default=INDEX_FILE)
+        p.add_argument("--model", type=Path, default=MODEL_FILE)
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        t0 = time.perf_counter()
+        index = build_index(load_known_spam(args.raw_dir))
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        np.save(args.out, index)
+        print(f"✅ Index {len(index):,} số spam -> {args.out} "
+              f"({index.nbytes / 1e6:.1f} MB, {time.perf_counter() - t0:.2f}s)")
+        return
+
+    service = PhoneSpamLookup.load(args.index, args.model)
+
+    if args.cmd == "score":
+        proba, known = service.lookup(args.phones)
+        for phone, p, k in zip(args.phones, proba, known):
+            print(f"{phone}\t{p:.4f}\t{'index' if k else 'model'}")
+        return
+
+    from table_io import read_table
+    sample = read_table(args.sample, columns=["phone"], dtype={"phone": str})["phone"].tolist()
+    report = bench(service, sample, args.batch, args.calls)
+    print(f"📊 {report['calls']:,} lần gọi × batch {args.batch} | hit index {report['hit_ratio']:.1%}")
+    print(f"⏱ p50 {report['p50_us']:.1f} µs | p99 {report['p99_us']:.1f} µs | "
+          f"max {report['max_us']:.1f} µs | {report['items_per_s']:,.0f} số/s")
+
+
+if __name__ == "__main__":
+    main()
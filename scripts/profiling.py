@@ -0,0 +1,286 @@
+# scripts/profiling.py
+"""Đo thời gian chạy từng bước pipeline, ghi run report dạng JSON Lines.
+
+Mỗi script gọi start_stage() ở đầu và bọc các bước con trong step():
+
+    from profiling import start_stage, step
+    start_stage()
+    with step("read_csv") as s:
+        df = read_table(IN_FILE)
+        s.rows = len(df)
+
+Script dừng vì lỗi bằng fail("❌ ...") thay cho raise SystemExit, để stage
+được ghi status "error".
+
+Mỗi bước con và cả stage được đo wall time, CPU time (kể cả process con đã
+kết thúc, ví dụ worker của process pool / GridSearchCV), peak RSS và số dòng/giây.
+Khi script thoát, stage được ghi thành 1 dòng JSON vào PIPELINE_REPORT (mặc
+định reports/run_report.jsonl; "0" để tắt). run_pipeline.py đặt chung
+PIPELINE_RUN_ID cho mọi bước của 1 lần chạy và in bảng tổng kết ở cuối.
+
+Profile (tuỳ chọn) cả stage bằng PIPELINE_PROFILE:
+  - cprofile: cProfile -> reports/profiles/<run>-<stage>.prof (+ .txt top 40)
+  - sample:   lấy mẫu stack luồng chính mỗi PIPELINE_SAMPLE_MS ms (mặc định 5)
+              -> <run>-<stage>.folded (định dạng collapsed của flamegraph.pl /
+              speedscope), overhead thấp, dùng được cho bước chạy lâu
+"""
+
+import atexit
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows: không có peak RSS
+    resource = None
+
+REPORT_FILE = os.environ.get("PIPELINE_REPORT", "reports/run_report.jsonl")
+PROFILE = os.environ.get("PIPELINE_PROFILE", "").lower()
+SAMPLE_MS = float(os.environ.get("PIPELINE_SAMPLE_MS", "5"))
+RUN_ID = os.environ.get("PIPELINE_RUN_ID") or time.strftime("%Y%m%d-%H%M%S")
+
+PROFILE_DIR = Path("reports/profiles")
+
+_stage = None
+
+
+def cpu_seconds():
+    """CPU user + system của process này và các process con đã kết thúc."""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+def peak_rss_mb(who="self"):
+    """Peak RSS (MB) của process này ("self") hoặc process con lớn nhất ("children")."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN)
+    # Linux tính KB, macOS tính byte
+    return usage.ru_maxrss / (1 << 20 if sys.platform == "darwin" else 1 << 10)
+
+
+class Step:
+    """Đo 1 bước con; gán `.rows` trong khối with để có dòng/giây."""
+
+    def __init__(self, name, rows=None, quiet=False):
+        self.name = name
+        self.rows = rows
+        self.quiet = quiet
+        self.record = None
+
+    def __enter__(self):
+        self._wall = time.perf_counter()
+        self._cpu = cpu_seconds()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        self.record = _record(self.name, wall, cpu_seconds() - self._cpu, self.rows)
+        if exc_type is not None:
+            self.record["status"] = "error"
+        if _stage is not None:
+            _stage["steps"].append(self.record)
+        if not self.quiet:
+            print(f"⏱ {_describe(self.record)}", flush=True)
+        return False
+
+def step(name, rows=None, quiet=False):
+    return Step(name, rows, quiet)
+
+def record_step(name, wall_s, rows=None, cpu_s=None, quiet=False, **extra):
+    """Thêm 1 bước đã đo sẵn (vòng lặp dài, từng ứng viên của GridSearchCV...)."""
+    rec = _record(name, wall_s, cpu_s, rows)
+    rec.update(extra)
+    if _stage is not None:
+        _stage["steps"].append(rec)
+    if not quiet:
+        print(f"⏱ {_describe(rec)}", flush=True)
+    return rec
+
+def record_search(prefix, search):
+    """Mỗi ứng viên của GridSearchCV đã fit thành 1 bước (không in ra).
+
+    wall_s là tổng thời gian fit + score trên mọi fold (cộng dồn, kể cả khi
+    các fold chạy song song với n_jobs).
+    """
+    cv = search.cv_results_
+    for i, params in enumerate(cv["params"]):
+        record_step(f"{prefix} {params}",
+                    (cv["mean_fit_time"][i] + cv["mean_score_time"][i]) * search.n_splits_,
+                    quiet=True, mean_fit_s=round(float(cv["mean_fit_time"][i]), 4),
+                    cv_score=round(float(cv["mean_test_score"][i]), 4))
+
+def _record(name, wall_s, cpu_s, rows):
+    rec = {"name": name, "wall_s": round(wall_s, 4)}
+    if cpu_s is not None:
+        rec["cpu_s"] = round(cpu_s, 4)
+    rss = peak_rss_mb()
+    if rss is not None:
+        rec["peak_rss_mb"] = round(rss, 1)
+    if rows is not None:
+        rec["rows"] = int(rows)
+        rec["rows_per_s"] = round(rows / wall_s, 1) if wall_s > 0 else None
+    return rec
+
+def _describe(rec):
+    text = f"{rec['name']}: {rec['wall_s']:.2f}s"
+    if rec.get("cpu_s") is not None:
+        text += f", CPU {rec['cpu_s']:.2f}s"
+    if rec.get("rows") is not None:
+        text += f", {rec['rows']:,} dòng"
+        if rec.get("rows_per_s"):
+            text += f" ({rec['rows_per_s']:,.0f} dòng/s)"
+    if rec.get("peak_rss_mb") is not None:
+        text += f", RSS {rec['peak_rss_mb']:,.0f} MB"
+    return text
+
+
+# ======== STAGE ========
+
+def start_stage(name=None):
+    """Bắt đầu đo cả script; report được ghi khi process thoát (atexit).
+
+    Tên stage: `name`, hoặc PIPELINE_STAGE (run_pipeline.py đặt), hoặc tên script.
+    """
+    global _stage
+    if _stage is not None:
+        return _stage
+    name = name or os.environ.get("PIPELINE_STAGE") or Path(sys.argv[0]).stem
+    _stage = {"name": name, "rows": None, "steps": [], "status": "ok",
+              "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "_wall": time.perf_counter(), "_cpu": cpu_seconds(), "_profiler": None}
+
+    previous_hook = sys.excepthook
+    def excepthook(*exc_info):
+        _stage["status"] = "error"
+        previous_hook(*exc_info)
+    sys.excepthook = excepthook
+
+    if PROFILE == "cprofile":
+        _stage["_profiler"] = cProfile.Profile()
+        _stage["_profiler"].enable()
+    elif PROFILE == "sample":
+        _stage["_profiler"] = StackSampler(SAMPLE_MS / 1000)
+        _stage["_profiler"].start()
+    atexit.register(_finish_stage)
+    return _stage
+
+def fail(msg=1):
+    """Dừng script với lỗi: stage được ghi status "error" rồi raise SystemExit(msg).
+
+    sys.excepthook không được gọi với SystemExit, nên script thoát lỗi bằng
+    raise SystemExit(...) sẽ bị ghi "ok"; dùng hàm này thay vào đó.
+    """
+    if _stage is not None:
+        _stage["status"] = "error"
+    raise SystemExit(msg)
+
+def set_rows(rows):
+    """Số dòng (đầu ra) của cả stage, để tính dòng/giây."""
+    if _stage is not None:
+        _stage["rows"] = int(rows)
+
+def _finish_stage():
+    wall = time.perf_counter() - _stage["_wall"]
+    rec = _record(_stage["name"], wall, cpu_seconds() - _stage["_cpu"], _stage["rows"])
+    children = peak_rss_mb("children")
+    if children:
+        rec["peak_rss_children_mb"] = round(children, 1)
+    rec.update(run_id=RUN_ID, started=_stage["started"], status=_stage["status"],
+               pid=os.getpid(), steps=_stage["steps"])
+
+    profile_file = _save_profile(_stage["_profiler"], _stage["name"])
+    if profile_file:
+        rec["profile"] = str(profile_file)
+    print(f"⏱ Stage {_describe(rec)}", flush=True)
+    if REPORT_FILE != "0":
+        path = Path(REPORT_FILE)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # 1 dòng / stage, mở chế độ append: nhiều stage song song ghi chung được
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+def _save_profile(profiler, name):
+    if profiler is None:
+        return None
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    base = PROFILE_DIR / f"{RUN_ID}-{name}"
+    if isinstance(profiler, StackSampler):
+        profiler.stop()
+        out = base.with_suffix(".folded")
+        profiler.save(out)
+        return out
+    profiler.disable()
+    out = base.with_suffix(".prof")
+    profiler.dump_stats(out)
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(40)
+    base.with_suffix(".txt").write_text(text.getvalue(), encoding="utf-8")
+    return out
+
+
+class StackSampler:
+    """Profiler lấy mẫu: đếm stack của luồng chính sau mỗi `interval` giây."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.counts = Counter()
+        self._target = threading.main_thread().ident
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in self.counts.most_common():
+                f.write(f"{stack} {n}\n")
+
+
+# ======== ĐỌC REPORT ========
+
+def load_report(path=REPORT_FILE, run_id=None):
+    """Các stage trong report (lọc theo run_id nếu có)."""
+    path = Path(path)
+    if not path.exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [r for r in records if run_id is None or r.get("run_id") == run_id]
+
+def print_summary(records):
+    """Bảng các stage (chậm nhất trước) + bước con chậm nhất của mỗi stage."""
+    if not records:
+        return
+    print(f"\n{'stage':<22}{'wall s':>9}{'CPU s':>9}{'RSS MB':>9}{'dòng/s':>11}  bước chậm nhất")
+    for r in sorted(records, key=lambda r: -r["wall_s"]):
+        slowest = max(r.get("steps", []), key=lambda s: s["wall_s"], default=None)
+        note = f"{slowest['name']} {slowest['wall_s']:.1f}s" if slowest else ""
+        rss = r.get("peak_rss_mb")
+        rate = r.get("rows_per_s")
+        print(f"{r['name']:<22}{r['wall_s']:>9.1f}{r.get('cpu_s', 0):>9.1f}"
+              f"{rss if rss is not None else float('nan'):>9.0f}"
+              f"{rate if rate else float('nan'):>11,.0f}  {note}")
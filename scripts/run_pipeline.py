@@ -0,0 +1,336 @@
+# scripts/run_pipeline.py
+"""Chạy toàn bộ pipeline email + phone như 1 DAG, có cache theo fingerprint.
+
+Mỗi bước (stage) là 1 script trong scripts/ với input/output khai báo ở STAGES.
+Fingerprint của bước = mã nguồn script (kèm các module local nó import)
++ nội dung input + tham số + PIPELINE_STORAGE (+ PIPELINE_CHUNK_SIZE nếu có).
+Bước nào có fingerprint không đổi và output còn đủ thì bỏ qua; các nhánh độc
+lập (parse ENRON / phishing, chuỗi email / phone) chạy song song.
+
+    python scripts/run_pipeline.py                 # toàn bộ
+    python scripts/run_pipeline.py train_email     # chỉ bước đó + các bước phía trước
+    python scripts/run_pipeline.py phone --force   # chạy lại chuỗi phone
+    python scripts/run_pipeline.py --dry-run       # xem bước nào sẽ chạy
+
+Các bước của 1 lần chạy ghi chung 1 PIPELINE_RUN_ID vào run report (xem
+profiling.py); cuối lần chạy in bảng thời gian / CPU / RAM của từng bước.
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from profiling import REPORT_FILE, load_report, print_summary
+from table_io import CHUNK_SIZE, STORAGE, table_path
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPTS_DIR = ROOT / "scripts"
+STATE_FILE = ROOT / ".pipeline_state.json"
+
+
+def stage(name, script, inputs, outputs, group, args=()):
+    return {"name": name, "script": script, "inputs": [str(p) for p in inputs],
+            "outputs": [str(p) for p in outputs], "group": group, "args": list(args)}
+
+EMAIL_SPLITS = [table_path(f"splits/dataset_{s}.csv") for s in ("train", "val", "test")]
+PHONE_SPLITS = [table_path(f"splits_phone/phone_{s}.csv") for s in ("train", "val", "test")]
+
+STAGES = [
+    # ===== EMAIL =====
+    stage("parse_enron", "parse_enron.py",
+          ["../enron_mail_20150507/maildir"],
+          [table_path("data_clean/enron_clean.csv")], "email"),
+    stage("parse_phishing", "parse_phishing_mbox.py",
+          ["data_raw/phishing"],
+          [table_path("data_clean/phishing_clean.csv")], "email"),
+    stage("merge_email", "merge_enron_phishing.py",
+          [table_path("data_clean/enron_clean.csv"), table_path("data_clean/phishing_clean.csv")],
+          [table_path("data/dataset_email_cleaned.csv")], "email"),
+    stage("normalize_email", "normalize_email_schema.py",
+          [table_path("data/dataset_email_cleaned.csv")],
+          [table_path("data/dataset_email_cleaned_norm.csv")], "email"),
+    stage("clean_email", "clean_final_dataset.py",
+          [table_path("data/dataset_email_cleaned.csv")],
+          [table_path("data/dataset_email_final_cleaned.csv")], "email"),
+    stage("dedup_email", "dedup_email_dataset.py",
+          [table_path("data/dataset_email_final_cleaned.csv")],
+          [table_path("data/dataset_email_dedup.csv")], "email"),
+    stage("split_email", "split_email_dataset.py",
+          [table_path("data/dataset_email_dedup.csv")],
+          EMAIL_SPLITS, "email"),
+    stage("train_email", "train_email_models.py",
+          EMAIL_SPLITS,
+          ["artifacts/email/email_best_model.joblib", "artifacts/email/tfidf_vectorizer.joblib",
+           "artifacts/email/email_test_results.csv", "artifacts/email/compact"], "email"),
+    stage("train_cascade", "email_cascade.py",
+          [*EMAIL_SPLITS, "artifacts/email/email_best_model.joblib",
+           "artifacts/email/tfidf_vectorizer.joblib"],
+          ["artifacts/email/cascade"], "email", args=["train"]),
+    stage("quantize_email", "compact_model.py",
+          [EMAIL_SPLITS[-1], "artifacts/email/email_best_model.joblib",
+           "artifacts/email/tfidf_vectorizer.joblib"],
+          ["artifacts/email/quantized"], "email", args=["quantize"]),
+    # ===== PHONE =====
+    stage("build_phone", "build_phone_dataset.py",
+          ["data_raw/phone"],
+          [table_path("data/phone_dataset_cleaned.csv")], "phone"),
+    stage("phone_features", "phone_feature_engineering.py",
+          [table_path("data/phone_dataset_cleaned.csv")],
+          [table_path("data/phone_features.csv")], "phone"),
+    stage("split_phone", "split_phone_dataset.py",
+          [table_path("data/phone_features.csv")],
+          PHONE_SPLITS, "phone"),
+    stage("train_phone", "train_phone_models.py",
+          PHONE_SPLITS,
+          ["artifacts/phone/phone_best_model.joblib", "artifacts/phone/phone_test_results.csv",
+           "artifacts/phone/compact"],
+          "phone"),
+]
+
+
+# ======== FINGERPRINT ========
+
+def local_imports(script):
+    """Các module trong scripts/ mà `script` import (đệ quy)."""
+    found = set()
+    todo = [script]
+    while todo:
+        path = SCRIPTS_DIR / todo.pop()
+        tree = ast.parse(path.read_text(encoding="utf-8"))
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [a.name for a in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                mod = name.split(".")[0] + ".py"
+                if mod not in found and (SCRIPTS_DIR / mod).exists():
+                    found.add(mod)
+                    todo.append(mod)
+    return sorted(found)
+
+class Fingerprinter:
+    """Hash nội dung file, dùng lại hash cũ khi size + mtime không đổi."""
+
+    def __init__(self, file_hashes):
+        self.file_hashes = file_hashes
+        self.lock = threading.Lock()
+
+    def file(self, path):
+        st = path.stat()
+        key = str(path)
+        with self.lock:
+            cached = self.file_hashes.get(key)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        with self.lock:
+            self.file_hashes[key] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def directory(self, path):
+        """Thư mục nguồn (maildir, mbox, csv thô): hash danh sách (file, size, mtime)."""
+        h = hashlib.blake2b(digest_size=16)
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for name in sorted(filenames):
+                st = os.stat(os.path.join(dirpath, name))
+                rel = os.path.relpath(os.path.join(dirpath, name), path)
+                h.update(f"{rel}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8", "surrogateescape"))
+        return h.hexdigest()
+
+    def path(self, rel):
+        path = ROOT / rel
+        if path.is_dir():
+            return "dir:" + self.directory(path)
+        if path.is_file():
+            return "file:" + self.file(path)
+        return "missing"
+
+    def stage(self, st):
+        h = hashlib.blake2b(digest_size=16)
+        for script in [st["script"], *local_imports(st["script"])]:
+            h.update(script.encode() + b"\0" + self.file(SCRIPTS_DIR / script).encode())
+        for rel in st["inputs"]:
+            h.update(rel.encode() + b"\0" + self.path(rel).encode())
+        # Chế độ chunk đổi thứ tự xáo trộn / cách chia -> khác cache
+        h.update(json.dumps([st["args"], STORAGE] + ([CHUNK_SIZE] if CHUNK_SIZE else [])).encode())
+        return h.hexdigest()
+
+
+# ======== STATE ========
+
+def load_state():
+    if STATE_FILE.exists():
+        with open(STATE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"stages": {}, "files": {}}
+
+def save_state(state):
+    tmp = STATE_FILE.with_name(STATE_FILE.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1)
+    os.replace(tmp, STATE_FILE)
+
+
+# ======== DAG ========
+
+def build_deps(stages):
+    producer = {out: st["name"] for st in stages for out in st["outputs"]}
+    return {st["name"]: sorted({producer[i] for i in st["inputs"] if i in producer})
+            for st in stages}
+
+def expand(stages, targets):
+    """Tên bước từ danh sách target (tên bước hoặc nhóm email/phone)."""
+    names = {st["name"] for st in stages}
+    if not targets:
+        return names
+    wanted = set()
+    for t in targets:
+        group = {st["name"] for st in stages if st["group"] == t}
+        if not group and t not in names:
+            raise SystemExit(f"❌ Không có bước/nhóm: {t} (xem --list)")
+        wanted |= group or {t}
+    return wanted
+
+def select(stages, deps, targets):
+    """Các bước cần xét: target + mọi bước phía trước."""
+    wanted = expand(stages, targets)
+    todo = list(wanted)
+    while todo:
+        for d in deps[todo.pop()]:
+            if d not in wanted:
+                wanted.add(d)
+                todo.append(d)
+    return [st["name"] for st in stages if st["name"] in wanted]
+
+def run_stage(st):
+    """Chạy 1 script, in log kèm tiền tố [tên bước]; trả về (returncode, giây)."""
+    cmd = [sys.executable, str(SCRIPTS_DIR / st["script"]), *st["args"]]
+    env = dict(os.environ, PYTHONIOENCODING="utf-8", PYTHONUNBUFFERED="1",
+               PIPELINE_STAGE=st["name"])
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, text=True, encoding="utf-8",
+                            errors="replace")
+    for line in proc.stdout:
+        print(f"[{st['name']}] {line}", end="", flush=True)
+    return proc.wait(), time.perf_counter() - t0
+
+def main():
+    parser = argparse.ArgumentParser(description="Chạy pipeline email/phone có cache")
+    parser.add_argument("targets", nargs="*",
+                        help="tên bước hoặc nhóm (email, phone); mặc định: tất cả")
+    parser.add_argument("--jobs", type=int, default=2,
+                        help="số bước chạy song song tối đa")
+    parser.add_argument("--force", action="store_true",
+                        help="chạy lại các bước đã chọn dù fingerprint không đổi")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="chỉ in các bước sẽ chạy / bỏ qua")
+    parser.add_argument("--list", action="store_true", help="liệt kê các bước")
+    args = parser.parse_args()
+
+    deps = build_deps(STAGES)
+    if args.list:
+        for st in STAGES:
+            after = ", ".join(deps[st["name"]]) or "-"
+            print(f"{st['name']:<16} [{st['group']}] {st['script']:<30} sau: {after}")
+        return
+
+    by_name = {st["name"]: st for st in STAGES}
+    selected = select(STAGES, deps, args.targets)
+    forced = expand(STAGES, args.targets) if args.force else set()
+
+    state = load_state()
+    fp = Fingerprinter(state["files"])
+    run_id = os.environ.setdefault("PIPELINE_RUN_ID", time.strftime("%Y%m%d-%H%M%S"))
+
+    pending = {name: set(d for d in deps[name] if d in selected) for name in selected}
+    failed, ran, skipped = set(), [], []
+
+    def process(name):
+        st = by_name[name]
+        fingerprint = fp.stage(st)
+        outputs_ok = all((ROOT / o).exists() for o in st["outputs"])
+        upstream_runs = args.dry_run and any(d in ran for d in deps[name])
+        if (name not in forced and not upstream_runs and outputs_ok
+                and state["stages"].get(name) == fingerprint):
+            return "skip", 0.0
+        if args.dry_run:
+            return "would-run", 0.0
+        print(f"▶ {name}: {st['script']}", flush=True)
+        code, secs = run_stage(st)
+        if code != 0:
+            return "fail", secs
+        # fingerprint tính lại sau khi chạy: input có thể đã đổi trong lúc chạy
+        fingerprint = fp.stage(st)
+        with fp.lock:
+            state["stages"][name] = fingerprint
+            save_state(state)
+        return "ok", secs
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        running = {}
+        while True:
+            for name in [n for n, d in pending.items() if not d]:
+                del pending[name]
+                running[pool.submit(process, name)] = name
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                name = running.pop(fut)
+                status, secs = fut.result()
+                if status == "fail":
+                    print(f"❌ {name} lỗi sau {secs:.1f}s — dừng các bước phía sau")
+                    failed.add(name)
+                    # bỏ mọi bước phụ thuộc (trực tiếp hoặc gián tiếp)
+                    blocked = {name}
+                    while True:
+                        more = {n for n, d in pending.items() if d & blocked} - blocked
+                        if not more:
+                            break
+                        blocked |= more
+                    for n in blocked - {name}:
+                        pending.pop(n, None)
+                    continue
+                if status == "skip":
+                    skipped.append(name)
+                    print(f"⏭ {name}: không đổi, bỏ qua")
+                elif status == "would-run":
+                    ran.append(name)
+                    print(f"• {name}: sẽ chạy")
+                else:
+                    ran.append(name)
+                    print(f"✅ {name} xong trong {secs:.1f}s")
+                for d in pending.values():
+                    d.discard(name)
+
+    print(f"\n📌 Đã chạy: {', '.join(ran) or '-'}")
+    print(f"📌 Bỏ qua (cache): {', '.join(skipped) or '-'}")
+    print(f"⏱ Tổng thời gian: {time.perf_counter() - t0:.1f}s")
+    if ran and not args.dry_run:
+        print_summary(load_report(ROOT / REPORT_FILE, run_id))
+        print(f"📌 Run report ({run_id}): {REPORT_FILE}")
+    if failed:
+        print(f"❌ Lỗi: {', '.join(sorted(failed))}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+# scripts/scoring_server.py
+"""HTTP API chấm điểm email và số điện thoại (asyncio, chỉ dùng thư viện chuẩn).
+
+    python scripts/scoring_server.py --port 8000 --workers 4
+
+    POST /score/email  {"subject": "...", "body": "...", "email_from": "...", "domain": "..."}
+                       {"emails": [{"subject": "...", "body": "..."}, ...]}
+    POST /score/phone  {"phone": "+84912345678"}
+                       {"phones": ["+84912345678", "0909000111"]}
+    GET  /health
+
+email_from / domain là tuỳ chọn, chỉ dùng khi chạy với --cascade (lọc nhanh
+theo người gửi / domain / subject trước, xem email_cascade.py).
+
+Vòng lặp sự kiện chỉ đọc/ghi HTTP; predict_proba chạy trong process pool
+(`--workers` process, mỗi process load model 1 lần qua initializer). Tách từ
+TF-IDF và FusedLinearScorer là Python thuần, giữ GIL, nên chạy trong thread
+pool vẫn làm nghẽn event loop. Mỗi model có 1 AsyncBatcher: khi mọi worker
+đang bận, các request đến sau được gom lại và chấm chung 1 batch khi có
+worker rảnh, nên tải càng cao batch càng lớn; lúc rảnh request được chấm
+ngay, không phải chờ.
+Đo tải bằng scripts/load_client.py.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from email_cascade import CASCADE_DIR, CascadeScorer
+from email_scoring import COMPACT_DIR as EMAIL_COMPACT_DIR
+from email_scoring import MODEL_FILE as EMAIL_MODEL_FILE
+from email_scoring import VECTORIZER_FILE, EmailScorer
+from phone_lookup import COMPACT_DIR as PHONE_COMPACT_DIR
+from phone_lookup import INDEX_FILE
+from phone_lookup import MODEL_FILE as PHONE_MODEL_FILE
+from phone_lookup import PhoneSpamLookup
+
+HOST = "127.0.0.1"
+PORT = 8000
+
+MAX_BATCH = 256
+# Chờ thêm để gom batch kể cả khi có worker rảnh (0 = không chờ)
+MAX_WAIT_MS = 0.0
+# Giới hạn kích thước body 1 request
+MAX_BODY = 10 * 1024 * 1024
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class AsyncBatcher:
+    """Gom request của 1 model thành batch, chấm trong `executor`.
+
+    Mỗi request là 1 list item; `score_fn(items)` trả về list kết quả cùng độ
+    dài. Tối đa `max_inflight` batch chạy cùng lúc (= số worker).
+    """
+
+    def __init__(self, score_fn, executor, max_inflight, max_batch=MAX_BATCH,
+                 max_wait_ms=MAX_WAIT_MS):
+        self.score_fn = score_fn
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.n_batches = 0
+        self.n_items = 0
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(max_inflight)
+        self._task = asyncio.create_task(self._loop())
+
+    async def submit(self, items):
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((items, fut))
+        return await fut
+
+    def _drain(self, batch, n):
+        while n < self.max_batch and not self._queue.empty():
+            req = self._queue.get_nowait()
+            batch.append(req)
+            n += len(req[0])
+        return n
+
+    async def _loop(self):
+        while True:
+            batch = [await self._queue.get()]
+            n = self._drain(batch, len(batch[0][0]))
+            if self.max_wait and n < self.max_batch:
+                await asyncio.sleep(self.max_wait)
+                n = self._drain(batch, n)
+            # Trong lúc chờ worker rảnh, request mới tiếp tục vào hàng đợi
+            await self._slots.acquire()
+            self._drain(batch, n)
+            asyncio.create_task(self._run(batch))
+
+    async def _run(self, batch):
+        items = [item for req, _ in batch for item in req]
+        try:
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(self.executor, self.score_fn, items)
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+        self.n_batches += 1
+        self.n_items += len(items)
+        start = 0
+        for req, fut in batch:
+            if not fut.done():
+                fut.set_result(results[start:start + len(req)])
+            start += len(req)
+
+    def stats(self):
+        return {"batches": self.n_batches, "items": self.n_items,
+                "mean_batch": self.n_items / self.n_batches if self.n_batches else 0.0}
+
+
+# ======== HÀM CHẤM ĐIỂM (chạy trong process pool) ========
+
+# Model đã load của process worker hiện tại (_init_worker)
+_worker = {}
+
+def _init_worker(args):
+    """Initializer của ProcessPoolExecutor: load model 1 lần cho mỗi process."""
+    _worker["email"], _worker["phone"] = load_models(args, verbose=False)
+
+def worker_info():
+    """Model đã load trong worker, gọi lúc khởi động để load sẵn mọi process."""
+    email = _worker.get("email")
+    info = {"pid": os.getpid(),
+            "models": [k for k in ("email", "phone") if _worker.get(k) is not None]}
+    if isinstance(email, CascadeScorer):
+        info["cascade"] = [email.lo, email.hi]
+    return info
+
+def score_email(items):
+    """-> [(xác suất, tầng cascade hoặc None)]; tầng được đếm ở process chính."""
+    scorer = _worker["email"]
+    if isinstance(scorer, CascadeScorer):
+        proba, stage = scorer.score_stages(items)
+        return [(float(p), int(s)) for p, s in zip(proba, stage)]
+    return [(float(p), None) for p in scorer.score(items)]
+
+def score_phone(items):
+    proba, known = _worker["phone"].lookup(items)
+    return [{"proba": float(p), "known": bool(k)} for p, k in zip(proba, known)]
+
+
+# ======== ĐỌC THAM SỐ TỪ JSON ========
+
+EMAIL_FIELDS = ("subject", "body", "email_from", "domain")
+
+def _email_item(e):
+    # email_from / domain (tuỳ chọn) chỉ dùng cho --cascade
+    if not isinstance(e, dict):
+        raise HTTPError(400, "mỗi email phải là JSON object")
+    item = tuple(e.get(k) or "" for k in EMAIL_FIELDS)
+    for k, v in zip(EMAIL_FIELDS, item):
+        if not isinstance(v, str):
+            raise HTTPError(400, f"'{k}' phải là chuỗi")
+    return item
+
+def parse_emails(payload):
+    """-> (list (subject, body, email_from, domain), có phải batch không)."""
+    if "emails" in payload:
+        emails = payload["emails"]
+        if not isinstance(emails, list):
+            raise HTTPError(400, "'emails' phải là list")
+        return [_email_item(e) for e in emails], True
+    if "subject" not in payload and "body" not in payload:
+        raise HTTPError(400, "cần 'subject'/'body' hoặc 'emails'")
+    return [_email_item(payload)], False
+
+def parse_phones(payload):
+    if "phones" in payload:
+        phones = payload["phones"]
+        if not isinstance(phones, list):
+            raise HTTPError(400, "'phones' phải là list")
+        return [str(p) for p in phones], True
+    if "phone" not in payload:
+        raise HTTPError(400, "cần 'phone' hoặc 'phones'")
+    return [str(payload["phone"])], False
+
+
+class ScoringServer:
+    def __init__(self, model_args, workers, max_batch, max_wait_ms):
+        self.model_args = model_args
+        self.workers = workers
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.executor = None
+        self.batchers = {}
+        self.cascade = None
+        # số email theo tầng cascade: HAM sớm / PHISHING sớm / model đầy đủ
+        self.cascade_counts = [0, 0, 0]
+
+    async def start(self):
+        """Gọi bên trong event loop: mở process pool, chờ worker load xong model."""
+        t0 = time.perf_counter()
+        # spawn: không fork process đang chạy event loop
+        self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                            mp_context=multiprocessing.get_context("spawn"),
+                                            initializer=_init_worker,
+                                            initargs=(self.model_args,))
+        loop = asyncio.get_running_loop()
+        infos = await asyncio.gather(*(loop.run_in_executor(self.executor, worker_info)
+                                       for _ in range(self.workers)))
+        models = infos[0]["models"]
+        if not models:
+            self.executor.shutdown()
+            raise SystemExit("‼ Không có model nào để phục vụ")
+        self.cascade = infos[0].get("cascade")
+        print(f"✅ Worker đã load {', '.join(models)}"
+              + (f" (cascade HAM <= {self.cascade[0]:.4f}, PHISHING >= {self.cascade[1]:.4f})"
+                 if self.cascade else "")
+              + f" ({time.perf_counter() - t0:.2f}s)")
+
+        kw = dict(max_inflight=self.workers, max_batch=self.max_batch,
+                  max_wait_ms=self.max_wait_ms)
+        if "email" in models:
+            self.batchers["email"] = AsyncBatcher(score_email, self.executor, **kw)
+        if "phone" in models:
+            self.batchers["phone"] = AsyncBatcher(score_phone, self.executor, **kw)
+
+    def cascade_stats(self):
+        n_items, n_full = sum(self.cascade_counts), self.cascade_counts[2]
+        return {"items": n_items, "full_model": n_full,
+                "early_exit": 1 - n_full / n_items if n_items else 0.0}
+
+    async def score(self, kind, body):
+        if kind not in self.batchers:
+            raise HTTPError(503, f"chưa load model {kind}")
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "body không phải JSON hợp lệ")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "body phải là JSON object")
+
+        items, is_batch = (parse_emails if kind == "email" else parse_phones)(payload)
+        results = await self.batchers[kind].submit(items) if items else []
+        if kind == "email":
+            for _, stage in results:
+                if stage is not None:
+                    self.cascade_counts[stage] += 1
+            proba = [p for p, _ in results]
+            return {"proba": proba if is_batch else proba[0]}
+        return {"results": results} if is_batch else results[0]
+
+    async def dispatch(self, method, path, body):
+        path = path.split("?", 1)[0]
+        if path == "/health":
+            health = {"status": "ok", "models": sorted(self.batchers),
+                      "batching": {k: b.stats() for k, b in self.batchers.items()}}
+            if self.cascade is not None:
+                health["cascade"] = self.cascade_stats()
+            return health
+        if path in ("/score/email", "/score/phone"):
+            if method != "POST":
+                raise HTTPError(405, "chỉ nhận POST")
+            return await self.score(path.rsplit("/", 1)[1], body)
+        raise HTTPError(404, f"không có route {path}")
+
+    async def handle(self, reader, writer):
+        """1 kết nối HTTP/1.1, giữ kết nối (keep-alive) cho nhiều request."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode("latin-1").split()
+                except ValueError:
+                    await self.respond(writer, 400, {"error": "request line sai"}, False)
+                    break
+
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = h.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+
+                keep_alive = (version == "HTTP/1.1"
+                              and headers.get("connection", "").lower() != "close")
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self.respond(writer, 400, {"error": "Content-Length sai"}, False)
+                    break
+                if length > MAX_BODY:
+                    await self.respond(writer, 413, {"error": "body quá lớn"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                try:
+                    status, payload = 200, await self.dispatch(method, target, body)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def respond(writer, status, payload, keep_alive):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + data)
+        await writer.drain()
+
+
+def load_models(args, verbose=True):
+    """-> (email_scorer, phone_service); chạy trong từng process worker."""
+    log = print if verbose else (lambda *a, **k: None)
+    email_scorer = phone_service = None
+    t0 = time.perf_counter()
+    if args.compact and args.email_compact.exists():
+        email_scorer = EmailScorer.load_compact(args.email_compact)
+        log(f"✅ Email model (compact): {args.email_compact}")
+    elif args.email_model.exists() and args.email_vectorizer.exists():
+        email_scorer = EmailScorer.load(args.email_vectorizer, args.email_model)
+        log(f"✅ Email model: {args.email_model}")
+    else:
+        log(f"⚠ Không có email model: {args.email_model}")
+    if email_scorer is not None and args.cascade:
+        email_scorer = CascadeScorer.load(email_scorer, CASCADE_DIR)
+        log(f"✅ Email cascade: {CASCADE_DIR} (HAM <= {email_scorer.lo:.4f}, "
+            f"PHISHING >= {email_scorer.hi:.4f})")
+
+    phone_model = args.phone_model
+    if args.compact and PHONE_COMPACT_DIR.exists():
+        phone_model = PHONE_COMPACT_DIR
+    if args.phone_index.exists() and phone_model.exists():
+        phone_service = PhoneSpamLookup.load(args.phone_index, phone_model)
+        phone_service.model  # load luôn, không để request đầu tiên phải chờ
+        log(f"✅ Phone index + model: {args.phone_index}, {phone_model}")
+    else:
+        log(f"⚠ Không có phone index/model: {args.phone_index}, {phone_model}")
+    log(f"⏱ Load model: {time.perf_counter() - t0:.2f}s")
+    return email_scorer, phone_service
+
+async def serve(server, host, port):
+    await server.start()
+    srv = await asyncio.start_server(server.handle, host, port, backlog=1024)
+    print(f"🚀 Đang chạy tại http://{host}:{port} ({server.workers} worker, "
+          f"batch tối đa {server.max_batch})")
+    try:
+        async with srv:
+            await srv.serve_forever()
+    finally:
+        server.executor.shutdown(cancel_futures=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP API chấm điểm email / số điện thoại")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=min(os.cpu_count() or 1, 4),
+                        help="số process chạy predict_proba")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    parser.add_argument("--email-vectorizer", type=Path, default=VECTORIZER_FILE)
+    parser.add_argument("--email-model", type=Path, default=EMAIL_MODEL_FILE)
+    parser.add_argument("--phone-index", type=Path, default=INDEX_FILE)
+    parser.add_argument("--phone-model", type=Path, default=PHONE_MODEL_FILE)
+    parser.add_argument("--compact", action="store_true",
+                        help="load bản compact (mmap, compact_model.py) nếu đã export")
+    parser.add_argument("--email-compact", type=Path, default=EMAIL_COMPACT_DIR,
+                        help="thư mục compact của email, vd artifacts/email/quantized")
+    parser.add_argument("--cascade", action="store_true",
+                        help="email: screen theo domain/người gửi/subject trước (email_cascade.py)")
+    args = parser.parse_args()
+
+    server = ScoringServer(args, args.workers, args.max_batch, args.max_wait_ms)
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n👋 Dừng server")
+
+
+if __name__ == "__main__":
+    main()
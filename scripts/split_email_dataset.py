@@ -1,51 +1,108 @@
 # scripts/split_email_dataset.py
 
-import pandas as pd
+import argparse
 from sklearn.model_selection import train_test_split
 from pathlib import Path
 
-IN_FILE = Path("data/dataset_email_final_cleaned.csv")
+from hash_split import CHUNK_SIZE as SPLIT_CHUNK_SIZE
+from hash_split import SplitError, email_group_keys, print_split_report, stream_split
+from profiling import fail, set_rows, start_stage, step
+from table_io import CHUNK_SIZE, read_table, table_exists, table_path, write_table
+
+start_stage()
+
+# Đầu ra của dedup_email_dataset.py (đã loại trùng / gần trùng)
+IN_FILE = Path("data/dataset_email_dedup.csv")
 OUT_DIR = Path("splits")
 OUT_DIR.mkdir(exist_ok=True)
 
-print("📥 Đang đọc dataset cuối ...")
-df = pd.read_csv(IN_FILE, encoding="utf-8")
-
-print("🔍 Tổng số dòng:", len(df))
-print(df["label"].value_counts())
-
-# ================================
-# 👉 70% TRAIN / 15% VAL / 15% TEST
-# ================================
-
-train, temp = train_test_split(
-    df,
-    test_size=0.30,
-    stratify=df["label"],
-    random_state=42
-)
-
-val, test = train_test_split(
-    temp,
-    test_size=0.50,
-    stratify=temp["label"],
-    random_state=42
-)
-
-print("\n📊 Tỷ lệ phân bố nhãn:")
-print("Train:", train["label"].value_counts(normalize=True).to_dict())
-print("Val  :", val["label"].value_counts(normalize=True).to_dict())
-print("Test :", test["label"].value_counts(normalize=True).to_dict())
-
-# ================================
-# 👉 LƯU FILE
-# ================================
-train.to_csv(OUT_DIR / "dataset_train.csv", index=False, encoding="utf-8")
-val.to_csv(OUT_DIR / "dataset_val.csv", index=False, encoding="utf-8")
-test.to_csv(OUT_DIR / "dataset_test.csv", index=False, encoding="utf-8")
-
-print("\n✅ DONE! Đã chia train/val/test theo tỷ lệ 70/15/15")
-print("📌 File train:", OUT_DIR / "dataset_train.csv")
-print("📌 File val  :", OUT_DIR / "dataset_val.csv")
-print("📌 File test :", OUT_DIR / "dataset_test.csv")
-print("🔚 Kết thúc script.")
\ No newline at end of file
+TRAIN_FILE = table_path(OUT_DIR / "dataset_train.csv")
+VAL_FILE = table_path(OUT_DIR / "dataset_val.csv")
+TEST_FILE = table_path(OUT_DIR / "dataset_test.csv")
+
+parser = argparse.ArgumentParser(description="Chia dataset email thành train/val/test 70/15/15")
+parser.add_argument("--mode", choices=["random", "group"], default="random",
+                    help="random: train_test_split phân tầng (PIPELINE_CHUNK_SIZE: hash từng email); "
+                         "group: theo hash khoá nhóm (hash_split.py)")
+parser.add_argument("--group", choices=["cluster", "sender", "domain"], default="cluster",
+                    help="khoá nhóm cho --mode group (cluster = cụm gần trùng của dedup)")
+args = parser.parse_args()
+
+if not table_exists(IN_FILE):
+    fail(f"❌ Chưa có {IN_FILE}: chạy `python scripts/dedup_email_dataset.py` "
+         "(sau clean_final_dataset.py) trước khi split")
+
+def print_files():
+    print("📌 File train:", TRAIN_FILE)
+    print("📌 File val  :", VAL_FILE)
+    print("📌 File test :", TEST_FILE)
+
+def split_stream(group):
+    """Đọc/ghi theo chunk: cùng nhóm luôn cùng split, phân tầng theo nhãn
+    (hash_split.py). Chế độ chunk + random: mỗi email là 1 nhóm."""
+    print(f"📥 Đang chia theo nhóm '{group}' ...")
+    with step("read_split_write") as s:
+        try:
+            counts = stream_split(IN_FILE, [TRAIN_FILE, VAL_FILE, TEST_FILE],
+                                  lambda chunk: email_group_keys(chunk, group),
+                                  chunk_size=CHUNK_SIZE or SPLIT_CHUNK_SIZE)
+        except SplitError as e:
+            fail(f"❌ {e}")
+        s.rows = int(counts.values.sum())
+    print_split_report(counts)
+    print("\n✅ DONE! Đã chia train/val/test theo nhóm", group)
+    print_files()
+    return s.rows
+
+def split_random():
+    """train_test_split phân tầng trên cả bảng trong RAM."""
+    print("📥 Đang đọc dataset cuối ...")
+    with step("read") as s:
+        df = read_table(IN_FILE)
+        s.rows = len(df)
+
+    print("🔍 Tổng số dòng:", len(df))
+    print(df["label"].value_counts())
+
+    # ================================
+    # 👉 70% TRAIN / 15% VAL / 15% TEST
+    # ================================
+
+    train, temp = train_test_split(
+        df,
+        test_size=0.30,
+        stratify=df["label"],
+        random_state=42
+    )
+
+    val, test = train_test_split(
+        temp,
+        test_size=0.50,
+        stratify=temp["label"],
+        random_state=42
+    )
+
+    print("\n📊 Tỷ lệ phân bố nhãn:")
+    print("Train:", train["label"].value_counts(normalize=True).to_dict())
+    print("Val  :", val["label"].value_counts(normalize=True).to_dict())
+    print("Test :", test["label"].value_counts(normalize=True).to_dict())
+
+    # ================================
+    # 👉 LƯU FILE
+    # ================================
+    with step("write", rows=len(df)):
+        write_table(train, TRAIN_FILE)
+        write_table(val, VAL_FILE)
+        write_table(test, TEST_FILE)
+
+    print("\n✅ DONE! Đã chia train/val/test theo tỷ lệ 70/15/15")
+    print_files()
+    return len(df)
+
+
+if args.mode == "group" or CHUNK_SIZE:
+    n_rows = split_stream(args.group if args.mode == "group" else "row")
+else:
+    n_rows = split_random()
+set_rows(n_rows)
+print("🔚 Kết thúc script.")
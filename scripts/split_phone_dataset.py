@@ -1,42 +1,95 @@
+import argparse
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from pathlib import Path
 
+from hash_split import SplitError, print_split_report, stream_split
+from phone_lookup import phone_keys
+from profiling import fail, set_rows, start_stage, step
+from table_io import read_table, table_path, write_table
+
+start_stage()
+
 IN_FILE = Path("data/phone_features.csv")
 OUT_DIR = Path("splits_phone")
 OUT_DIR.mkdir(exist_ok=True)
 
-print("📥 Loading phone feature dataset...")
-df = pd.read_csv(IN_FILE)
-
-print("📊 Tổng số mẫu:", len(df))
-print(df["label"].value_counts())
-
-# 70% train, 15% val, 15% test (stratified)
-train, temp = train_test_split(
-    df, 
-    test_size=0.30,
-    stratify=df["label"],
-    random_state=42
-)
-
-val, test = train_test_split(
-    temp,
-    test_size=0.50,
-    stratify=temp["label"],
-    random_state=42
-)
-
-print("\n📊 Phân bố nhãn:")
-print("Train:", train["label"].value_counts())
-print("Val:", val["label"].value_counts())
-print("Test:", test["label"].value_counts())
-
-train.to_csv(OUT_DIR / "phone_train.csv", index=False)
-val.to_csv(OUT_DIR / "phone_val.csv", index=False)
-test.to_csv(OUT_DIR / "phone_test.csv", index=False)
-
-print("\n✅ DONE: Đã chia train/val/test cho phone")
-print("📌 Train:", OUT_DIR / "phone_train.csv")
-print("📌 Val:", OUT_DIR / "phone_val.csv")
-print("📌 Test:", OUT_DIR / "phone_test.csv")
+TRAIN_FILE = table_path(OUT_DIR / "phone_train.csv")
+VAL_FILE = table_path(OUT_DIR / "phone_val.csv")
+TEST_FILE = table_path(OUT_DIR / "phone_test.csv")
+
+def phone_group_keys(chunk):
+    """Cùng 1 số (sau chuẩn hoá như phone_lookup) luôn cùng split, kể cả khác nhãn."""
+    phones = chunk["phone"].astype(str)
+    keys = pd.Series(phone_keys(phones.tolist()), index=chunk.index).astype(str)
+    return keys.where(keys != "-1", "raw:" + phones)
+
+parser = argparse.ArgumentParser(description="Chia dataset phone thành train/val/test 70/15/15")
+parser.add_argument("--mode", choices=["random", "group"], default="random",
+                    help="random: train_test_split phân tầng; group: theo hash số điện thoại")
+args = parser.parse_args()
+
+def print_files():
+    print("📌 Train:", TRAIN_FILE)
+    print("📌 Val:", VAL_FILE)
+    print("📌 Test:", TEST_FILE)
+
+def split_stream():
+    """Đọc/ghi theo chunk: cùng số điện thoại luôn cùng split (hash_split.py)."""
+    print("📥 Đang chia theo số điện thoại (hash) ...")
+    with step("read_split_write") as s:
+        try:
+            counts = stream_split(IN_FILE, [TRAIN_FILE, VAL_FILE, TEST_FILE], phone_group_keys)
+        except SplitError as e:
+            fail(f"❌ {e}")
+        s.rows = int(counts.values.sum())
+    print_split_report(counts)
+    print("\n✅ DONE: Đã chia train/val/test cho phone theo nhóm")
+    print_files()
+    return s.rows
+
+def split_random():
+    """train_test_split phân tầng trên cả bảng trong RAM."""
+    print("📥 Loading phone feature dataset...")
+    with step("read") as s:
+        df = read_table(IN_FILE, dtype={"phone": str})
+        s.rows = len(df)
+
+    print("📊 Tổng số mẫu:", len(df))
+    print(df["label"].value_counts())
+
+    # 70% train, 15% val, 15% test (stratified)
+    train, temp = train_test_split(
+        df,
+        test_size=0.30,
+        stratify=df["label"],
+        random_state=42
+    )
+
+    val, test = train_test_split(
+        temp,
+        test_size=0.50,
+        stratify=temp["label"],
+        random_state=42
+    )
+
+    print("\n📊 Phân bố nhãn:")
+    print("Train:", train["label"].value_counts())
+    print("Val:", val["label"].value_counts())
+    print("Test:", test["label"].value_counts())
+
+    with step("write", rows=len(df)):
+        write_table(train, TRAIN_FILE)
+        write_table(val, VAL_FILE)
+        write_table(test, TEST_FILE)
+
+    print("\n✅ DONE: Đã chia train/val/test cho phone")
+    print_files()
+    return len(df)
+
+
+if args.mode == "group":
+    n_rows = split_stream()
+else:
+    n_rows = split_random()
+set_rows(n_rows)
@@ -0,0 +1,210 @@
+# scripts/synth_corpus.py
+"""Sinh corpus giả lập (maildir, mbox phishing, CSV phone) cho benchmark.
+
+Cùng định dạng với dữ liệu thật mà các bước parse/build đọc vào, nên chạy
+được toàn bộ pipeline mà không cần Enron / data_raw có bản quyền:
+
+    <out>/maildir/<user>/<folder>/<n>.          email HAM (parse_enron.py --root)
+    <out>/data_raw/phishing/phishing-<năm>.txt   mbox PHISHING (parse_phishing_mbox.py)
+    <out>/data_raw/phone/*.csv                   số spam (build_phone_dataset.py)
+
+Nội dung sinh từ bộ từ vựng cố định theo seed (cùng tham số -> cùng file),
+có tỉ lệ email trùng y hệt / gần trùng, HTML multipart và dòng ">From " để
+các bước dedup / clean / mbox có việc thật để làm:
+
+    python scripts/synth_corpus.py --out bench/100k --emails 100000 --phones 100000
+"""
+
+import argparse
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+# Tỉ lệ email phishing (mbox) trên tổng số email
+PHISH_RATIO = 0.3
+# Tỉ lệ email là bản sao y hệt / gần trùng (đổi vài từ) của 1 email trước đó
+DUP_RATE = 0.05
+NEAR_DUP_RATE = 0.05
+# Tỉ lệ email có thêm phần text/html (multipart)
+HTML_RATE = 0.2
+
+USERS = 150
+FOLDERS = ["inbox", "sent", "deleted_items", "discussion_threads"]
+MBOX_YEARS = [2022, 2023, 2024]
+PHONE_FILES = {"truecaller_spam.csv": 0.5, "robocall_spam.csv": 0.3, "extra_spam_phones.csv": 0.2}
+PHONE_CATEGORIES = ["scam", "telemarketing", "robocall", "fraud"]
+
+# Số email sinh mỗi lượt (giới hạn RAM khi sinh corpus lớn)
+BATCH = 20_000
+
+HAM_WORDS = np.array("""
+meeting schedule report attached please review deal price gas power contract
+enron trading desk team project budget forecast call tomorrow thanks regards
+agenda minutes draft update client market volume capacity pipeline storage
+invoice approval conference office week friday monday plan numbers summary
+""".split())
+PHISH_WORDS = np.array("""
+verify account password login click here urgent suspended bank security
+update confirm identity limited access immediately reward prize winner claim
+payment invoice overdue refund transfer wallet link expire unusual activity
+""".split())
+COMMON_WORDS = np.array("the a to of and for your you we is on in this with".split())
+
+HAM_SUBJECTS = ["Meeting", "Re: deal", "Report", "FW: schedule", "Budget update", "Call tomorrow"]
+PHISH_SUBJECTS = ["Verify account", "Urgent: action required", "Your account is suspended",
+                  'Claim your "prize"', "Payment failed", "Security alert"]
+
+
+def _texts(rng, words, n, min_words=8, max_words=120):
+    """n đoạn text ngẫu nhiên (từ `words` xen từ phổ biến), xuống dòng mỗi ~12 từ."""
+    lengths = rng.integers(min_words, max_words, size=n)
+    vocab = np.concatenate([words, COMMON_WORDS])
+    flat = vocab[rng.integers(0, len(vocab), size=int(lengths.sum()))]
+    out, start = [], 0
+    for k in lengths:
+        chunk = flat[start:start + k]
+        start += k
+        lines = [" ".join(chunk[i:i + 12]) for i in range(0, k, 12)]
+        out.append("\n".join(lines))
+    return out
+
+def _mutate(rng, text, words):
+    """Gần trùng: thay ~5% số từ."""
+    tokens = text.split(" ")
+    for i in rng.integers(0, len(tokens), size=max(1, len(tokens) // 20)):
+        tokens[i] = str(rng.choice(words))
+    return " ".join(tokens)
+
+def iter_emails(rng, n, words, subjects, sender_fmt, n_senders):
+    """(from, subject, body, html?) cho n email, theo từng lượt BATCH."""
+    pool = []  # email gần đây để sao chép làm bản trùng
+    for start in range(0, n, BATCH):
+        m = min(BATCH, n - start)
+        bodies = _texts(rng, words, m)
+        senders = rng.integers(0, n_senders, size=m)
+        subj = rng.integers(0, len(subjects), size=m)
+        kind = rng.random(m)
+        html = rng.random(m) < HTML_RATE
+        for i in range(m):
+            if pool and kind[i] < DUP_RATE:
+                yield pool[rng.integers(0, len(pool))]
+                continue
+            item = (sender_fmt.format(senders[i]), subjects[subj[i]], bodies[i], bool(html[i]))
+            if pool and kind[i] < DUP_RATE + NEAR_DUP_RATE:
+                src = pool[rng.integers(0, len(pool))]
+                item = (item[0], src[1], _mutate(rng, src[2], words), src[3])
+            if len(pool) < 1_000:
+                pool.append(item)
+            else:
+                pool[rng.integers(0, len(pool))] = item
+            yield item
+
+def _message(sender, subject, body, html, boundary="b1"):
+    head = f"From: {sender}\nSubject: {subject}\n"
+    if not html:
+        return head + "\n" + body + "\n"
+    html_body = "<html><body><p>" + body.replace("\n", "<br>\n") + "</p>&nbsp;</body></html>"
+    return (head + f'MIME-Version: 1.0\nContent-Type: multipart/alternative; boundary="{boundary}"\n\n'
+            f"--{boundary}\nContent-Type: text/plain; charset=utf-8\n\n{body}\n"
+            f"--{boundary}\nContent-Type: text/html; charset=utf-8\n\n{html_body}\n"
+            f"--{boundary}--\n")
+
+
+def write_maildir(root, n, seed):
+    """n email HAM, chia đều vào USERS × FOLDERS như maildir của Enron."""
+    rng = np.random.default_rng(seed)
+    root = Path(root)
+    dirs = [root / f"user{u:03d}" / f for u in range(USERS) for f in FOLDERS]
+    for d in dirs:
+        d.mkdir(parents=True, exist_ok=True)
+    counters = [0] * len(dirs)
+    emails = iter_emails(rng, n, HAM_WORDS, HAM_SUBJECTS, "user{}@enron.com", USERS * 3)
+    for i, (sender, subject, body, html) in enumerate(emails):
+        d = i % len(dirs)
+        counters[d] += 1
+        with open(dirs[d] / f"{counters[d]}.", "w", encoding="utf-8", newline="\n") as f:
+            f.write(_message(sender, subject, body, html))
+
+def write_mbox(out_dir, n, seed):
+    """n email PHISHING chia vào các file phishing-<năm>.txt (định dạng mbox)."""
+    rng = np.random.default_rng(seed + 1)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    files = [open(out_dir / f"phishing-{y}.txt", "w", encoding="utf-8", newline=os.linesep)
+             for y in MBOX_YEARS]
+    try:
+        emails = iter_emails(rng, n, PHISH_WORDS, PHISH_SUBJECTS, "alert@secure-bank{}.com",
+                             max(n // 20, 10))
+        for i, (sender, subject, body, html) in enumerate(emails):
+            # dòng bắt đầu bằng "From " trong body phải được escape trong mbox
+            body = body + "\n>From the security team"
+            f = files[i % len(files)]
+            f.write("From MAILER-DAEMON Mon Jan  1 00:00:00 2024\n")
+            f.write(_message(sender, subject, body, html))
+            f.write("\n")
+    finally:
+        for f in files:
+            f.close()
+
+def write_phone_csvs(out_dir, n, seed):
+    """n số spam (định dạng lộn xộn như dữ liệu thật) chia vào 3 file CSV."""
+    rng = np.random.default_rng(seed + 2)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for name, share in PHONE_FILES.items():
+        m = max(1, int(n * share))
+        cc = rng.choice(["+1", "+44", "+84", "0", "+81", ""], size=m)
+        digits = rng.integers(10**6, 10**10, size=m).astype(str)
+        seps = rng.choice(["", " ", "-", " -"], size=m)
+        cats = rng.choice(PHONE_CATEGORIES, size=m)
+        with open(out_dir / name, "w", encoding="utf-8", newline="") as f:
+            f.write("phone,category\n")
+            for c, d, s, cat in zip(cc, digits, seps, cats):
+                cut = len(d) // 2
+                f.write(f'"{c}{s}{d[:cut]}{s}{d[cut:]}",{cat}\n')
+
+
+def generate(out, n_emails, n_phones, seed=42, force=False):
+    """Sinh corpus vào `out` (bỏ qua nếu đã sinh với cùng tham số) -> dict tham số."""
+    out = Path(out)
+    params = {"emails": n_emails, "phones": n_phones, "seed": seed,
+              "phish_ratio": PHISH_RATIO, "dup_rate": DUP_RATE, "near_dup_rate": NEAR_DUP_RATE}
+    marker = out / "corpus.json"
+    if not force and marker.exists() and json.loads(marker.read_text()) == params:
+        return params
+    for sub in ["maildir", "data_raw"]:
+        shutil.rmtree(out / sub, ignore_errors=True)
+    n_phish = int(n_emails * PHISH_RATIO)
+    write_maildir(out / "maildir", n_emails - n_phish, seed)
+    write_mbox(out / "data_raw" / "phishing", n_phish, seed)
+    write_phone_csvs(out / "data_raw" / "phone", n_phones, seed)
+    marker.write_text(json.dumps(params))
+    return params
+
+def parse_count(text):
+    """'10k' -> 10000, '2.5m' -> 2500000."""
+    text = str(text).strip().lower()
+    mult = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * mult)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sinh corpus giả lập cho benchmark pipeline")
+    parser.add_argument("--out", type=Path, required=True)
+    parser.add_argument("--emails", default="10k", help="số email (HAM + PHISHING), vd 10k, 1m")
+    parser.add_argument("--phones", default=None, help="số số điện thoại spam (mặc định = --emails)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--force", action="store_true", help="sinh lại dù đã có")
+    args = parser.parse_args()
+
+    n_emails = parse_count(args.emails)
+    n_phones = parse_count(args.phones or args.emails)
+    params = generate(args.out, n_emails, n_phones, args.seed, args.force)
+    print(f"✅ Corpus: {params['emails']:,} email, {params['phones']:,} phone -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
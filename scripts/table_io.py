@@ -0,0 +1,193 @@
+# scripts/table_io.py
+"""Đọc/ghi bảng dữ liệu dùng chung cho mọi bước của pipeline.
+
+Mặc định vẫn là CSV như cũ. Đặt biến môi trường PIPELINE_STORAGE=parquet để
+mọi bước ghi Parquet (nén zstd, cột có kiểu: label int8, domain/category dạng
+dictionary) và chỉ đọc những cột cần dùng:
+
+    PIPELINE_STORAGE=parquet python scripts/merge_enron_phishing.py
+
+Khi đọc, nếu không có file ở định dạng đang chọn thì dùng file ở định dạng
+còn lại (ví dụ data_clean/*.csv cũ) nên có thể chuyển dần từng bước.
+Parquet cần cài thêm pyarrow.
+
+Đặt PIPELINE_CHUNK_SIZE=<số dòng> để các bước merge / normalize / clean / split
+email đọc-xử lý-ghi theo từng khối thay vì đọc cả bảng (RAM không tăng theo
+kích thước corpus); 0 (mặc định) là đọc cả bảng như cũ.
+"""
+
+import os
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+STORAGE = os.environ.get("PIPELINE_STORAGE", "csv").lower()
+
+SUFFIXES = {"csv": ".csv", "parquet": ".parquet"}
+
+CHUNK_SIZE = int(os.environ.get("PIPELINE_CHUNK_SIZE", "0"))
+
+# Kiểu cột khi ghi Parquet
+INT8_COLUMNS = {"label", "has_country_code"}
+DICTIONARY_COLUMNS = {"domain", "category"}
+
+PARQUET_COMPRESSION = "zstd"
+
+if STORAGE not in SUFFIXES:
+    raise ValueError(f"PIPELINE_STORAGE không hợp lệ: {STORAGE!r} (chọn csv hoặc parquet)")
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("PIPELINE_STORAGE=parquet cần cài pyarrow: pip install pyarrow") from e
+    return pa, pq
+
+def storage_of(path):
+    return "parquet" if Path(path).suffix == ".parquet" else "csv"
+
+def table_path(path, storage=None):
+    """Đổi đuôi file theo định dạng đang dùng (mặc định: PIPELINE_STORAGE)."""
+    return Path(path).with_suffix(SUFFIXES[storage or STORAGE])
+
+def resolve_table(path):
+    """File thực sự để đọc: ưu tiên định dạng đang chọn, không có thì lấy định dạng kia."""
+    preferred = table_path(path)
+    if preferred.exists():
+        return preferred
+    for storage in SUFFIXES:
+        candidate = table_path(path, storage)
+        if candidate.exists():
+            return candidate
+    return preferred
+
+def table_exists(path):
+    return resolve_table(path).exists()
+
+def read_table(path, columns=None, **csv_kwargs):
+    """Đọc cả bảng; `columns` để chỉ đọc các cột cần thiết.
+
+    `csv_kwargs` chỉ áp dụng khi file là CSV.
+    """
+    path = resolve_table(path)
+    if storage_of(path) == "parquet":
+        _pyarrow()
+        return pd.read_parquet(path, columns=columns)
+    csv_kwargs.setdefault("encoding", "utf-8")
+    return pd.read_csv(path, usecols=columns, **csv_kwargs)
+
+def iter_table(path, columns=None, chunksize=50_000, **csv_kwargs):
+    """Đọc bảng theo từng khối `chunksize` dòng.
+
+    CSV được đọc dạng chuỗi thô (không đổi "" thành NaN) để ghi lại y nguyên;
+    `csv_kwargs` (chỉ áp dụng khi file là CSV) ghi đè các tuỳ chọn đó.
+    """
+    path = resolve_table(path)
+    if storage_of(path) == "parquet":
+        _, pq = _pyarrow()
+        pf = pq.ParquetFile(path)
+        for batch in pf.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+    kwargs = {"usecols": columns, "encoding": "utf-8", "dtype": str, "keep_default_na": False}
+    kwargs.update(csv_kwargs)
+    yield from pd.read_csv(path, chunksize=chunksize, **kwargs)
+
+def _arrow_array(pa, name, s):
+    if name in INT8_COLUMNS:
+        return pa.array(pd.to_numeric(s).astype("int8"))
+    if name in DICTIONARY_COLUMNS:
+        values = pa.array(s.astype(object), type=pa.string(), from_pandas=True)
+        return values.dictionary_encode()
+    if s.dtype == object or pd.api.types.is_string_dtype(s):
+        return pa.array(s.astype(object), type=pa.string(), from_pandas=True)
+    return pa.array(s, from_pandas=True)
+
+def to_arrow(df):
+    pa, _ = _pyarrow()
+    arrays = [_arrow_array(pa, name, df[name]) for name in df.columns]
+    return pa.Table.from_arrays(arrays, names=[str(c) for c in df.columns])
+
+def write_table(df, path):
+    """Ghi cả DataFrame (không index) theo định dạng suy ra từ đuôi file."""
+    path = Path(path)
+    if storage_of(path) == "parquet":
+        _, pq = _pyarrow()
+        pq.write_table(to_arrow(df), path, compression=PARQUET_COMPRESSION)
+    else:
+        df.to_csv(path, index=False, encoding="utf-8")
+
+
+class TableWriter:
+    """Ghi bảng theo từng batch: CSV nối thêm dòng, Parquet mỗi batch 1 row group.
+
+    `storage` mặc định suy ra từ đuôi `path`; truyền vào khi `path` là file tạm.
+    """
+
+    def __init__(self, path, columns, storage=None):
+        self.path = Path(path)
+        self.columns = list(columns)
+        self.storage = storage or storage_of(path)
+        self._writer = None
+        self._schema = None
+        if self.storage == "csv":
+            self._f = open(self.path, "w", encoding="utf-8", newline="")
+            pd.DataFrame(columns=self.columns).to_csv(self._f, index=False)
+
+    def write(self, df):
+        if isinstance(df, list):
+            df = pd.DataFrame(df, columns=self.columns)
+        if self.storage == "csv":
+            df.to_csv(self._f, index=False, header=False)
+            return
+        if len(df) == 0:
+            return
+        _, pq = _pyarrow()
+        table = to_arrow(df[self.columns])
+        if self._writer is None:
+            self._schema = table.schema
+            self._writer = pq.ParquetWriter(self.path, self._schema,
+                                            compression=PARQUET_COMPRESSION)
+        self._writer.write_table(table.cast(self._schema))
+
+    def write_csv_rows(self, path, chunksize=50_000):
+        """Nối các dòng của 1 CSV không header (cùng thứ tự cột) vào bảng."""
+        if self.storage == "csv":
+            with open(path, "r", encoding="utf-8", newline="") as src:
+                shutil.copyfileobj(src, self._f)
+            return
+        for chunk in pd.read_csv(path, names=self.columns, encoding="utf-8", dtype=str,
+                                 keep_default_na=False, chunksize=chunksize):
+            self.write(chunk)
+
+    def copy_from(self, path):
+        """Nối toàn bộ dòng của 1 bảng có sẵn (CSV hoặc Parquet)."""
+        path = resolve_table(path)
+        if self.storage == "csv" and storage_of(path) == "csv":
+            with open(path, "r", encoding="utf-8", newline="") as src:
+                src.readline()  # bỏ header
+                shutil.copyfileobj(src, self._f)
+            return
+        for chunk in iter_table(path):
+            self.write(chunk)
+
+    def close(self):
+        if self.storage == "csv":
+            self._f.close()
+            return
+        _, pq = _pyarrow()
+        if self._writer is None:
+            # Không có dòng nào: vẫn tạo file Parquet rỗng đúng cột
+            empty = to_arrow(pd.DataFrame({c: pd.Series(dtype=object) for c in self.columns}))
+            self._writer = pq.ParquetWriter(self.path, empty.schema,
+                                            compression=PARQUET_COMPRESSION)
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
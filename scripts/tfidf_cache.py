@@ -0,0 +1,156 @@
+# scripts/tfidf_cache.py
+"""Cache TF-IDF đã fit + ma trận X của các split email giữa các lần train.
+
+Khoá cache = hash nội dung các file split + tham số vectorizer + token budget
+(EMAIL_TOKEN_BUDGET) + CACHE_VERSION.
+Cùng dữ liệu và cùng tham số thì lần sau load thẳng ma trận CSR (.npz) và nhãn
+(.npy), không đọc lại text và không fit lại; chỉ đổi lr_params / rf_params
+không làm mất cache.
+
+    artifacts/email/tfidf_cache/<khoá>/vectorizer.joblib
+                                      /X_0.npz, y_0.npy, X_1.npz, ...
+
+Khi tìm tham số bằng cross-validation (hp_search.py), mỗi fold có TF-IDF riêng
+fit chỉ trên phần train của fold, cache ở folds-<khoá>/ (kèm models/ là các
+model đã fit theo fold).
+
+Đặt EMAIL_TFIDF_CACHE=0 để tắt cache.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from sklearn.base import clone
+
+from email_scoring import TAIL_FRACTION, TOKEN_BUDGET
+from parse_manifest import file_hash
+from profiling import step
+from table_io import resolve_table
+
+CACHE_DIR = Path("artifacts/email/tfidf_cache")
+# Tăng số này khi đổi cách ghép text (subject + body) để bỏ cache cũ
+CACHE_VERSION = 1
+# Số thư mục cache giữ lại (cũ nhất bị xoá); mỗi lần train dùng 1-2 thư mục
+KEEP = 3
+
+ENABLED = os.environ.get("EMAIL_TFIDF_CACHE", "1") != "0"
+
+
+def cache_key(vectorizer, split_files):
+    params = sorted((k, repr(v)) for k, v in vectorizer.get_params().items())
+    files = [file_hash(resolve_table(p)) for p in split_files]
+    payload = json.dumps({"version": CACHE_VERSION, "class": type(vectorizer).__name__,
+                          "params": params, "files": files,
+                          "text": [TOKEN_BUDGET, TAIL_FRACTION]})
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+def load_entry(entry, n_splits):
+    vectorizer = joblib.load(entry / "vectorizer.joblib")
+    Xs = [sp.load_npz(entry / f"X_{i}.npz") for i in range(n_splits)]
+    ys = [np.load(entry / f"y_{i}.npy") for i in range(n_splits)]
+    return vectorizer, Xs, ys
+
+def save_entry(entry, vectorizer, Xs, ys):
+    """Ghi vào thư mục tạm rồi đổi tên, để không bao giờ có cache ghi dở."""
+    tmp = entry.with_name(entry.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    joblib.dump(vectorizer, tmp / "vectorizer.joblib")
+    for i, (X, y) in enumerate(zip(Xs, ys)):
+        sp.save_npz(tmp / f"X_{i}.npz", sp.csr_matrix(X), compressed=False)
+        np.save(tmp / f"y_{i}.npy", np.asarray(y))
+    shutil.rmtree(entry, ignore_errors=True)
+    os.replace(tmp, entry)
+
+def prune(cache_dir, keep=KEEP):
+    entries = sorted((p for p in cache_dir.iterdir() if p.is_dir() and p.suffix != ".tmp"),
+                     key=lambda p: p.stat().st_mtime, reverse=True)
+    for old in entries[keep:]:
+        shutil.rmtree(old, ignore_errors=True)
+
+def load_or_fit(vectorizer, split_files, load_split, cache_dir=CACHE_DIR):
+    """Vectorizer đã fit trên split đầu tiên + (X, y) của mọi split.
+
+    `load_split(path) -> (text, y)` chỉ được gọi khi không có cache.
+    Trả về (vectorizer, [X...], [y...]).
+    """
+    cache_dir = Path(cache_dir)
+    t0 = time.perf_counter()
+    key = cache_key(vectorizer, split_files) if ENABLED else None
+    entry = cache_dir / key if key else None
+
+    if entry is not None and entry.is_dir():
+        with step("tfidf cache load", quiet=True):
+            vectorizer, Xs, ys = load_entry(entry, len(split_files))
+        os.utime(entry)  # đánh dấu vừa dùng, để prune giữ lại
+        print(f"♻ TF-IDF cache {key[:12]}: load {time.perf_counter() - t0:.1f}s")
+        return vectorizer, Xs, ys
+
+    with step("read splits") as s:
+        texts, ys = zip(*(load_split(p) for p in split_files))
+        s.rows = sum(len(t) for t in texts)
+    with step("tfidf fit_transform", rows=len(texts[0])):
+        Xs = [vectorizer.fit_transform(texts[0])]
+    with step("tfidf transform", rows=sum(len(t) for t in texts[1:])):
+        Xs += [vectorizer.transform(t) for t in texts[1:]]
+    ys = [np.asarray(y) for y in ys]
+    print(f"➡ TF-IDF fit: {Xs[0].shape[1]:,} đặc trưng, {time.perf_counter() - t0:.1f}s")
+
+    if entry is not None:
+        with step("tfidf cache save", quiet=True):
+            save_entry(entry, vectorizer, Xs, ys)
+            prune(cache_dir)
+        print(f"💾 Đã lưu TF-IDF cache {key[:12]}")
+    return vectorizer, Xs, ys
+
+def fold_key(vectorizer, train_file, folds):
+    h = hashlib.blake2b(cache_key(vectorizer, [train_file]).encode("ascii"), digest_size=16)
+    for _, va in folds:
+        h.update(np.asarray(va, dtype=np.int64).tobytes())
+        h.update(b"|")
+    return h.hexdigest()
+
+def load_or_fit_folds(vectorizer, train_file, load_split, folds, cache_dir=CACHE_DIR):
+    """TF-IDF riêng cho từng fold: fit trên phần train của fold, transform phần val.
+
+    Trả về ([(X_tr, X_va) cho từng fold], thư mục cache hoặc None). Vectorizer
+    không nhìn thấy dòng val của fold nên điểm CV không bị rò rỉ (leakage).
+    """
+    cache_dir = Path(cache_dir)
+    t0 = time.perf_counter()
+    entry = cache_dir / f"folds-{fold_key(vectorizer, train_file, folds)}" if ENABLED else None
+
+    if entry is not None and entry.is_dir():
+        mats = [(sp.load_npz(entry / f"X_tr_{i}.npz"), sp.load_npz(entry / f"X_va_{i}.npz"))
+                for i in range(len(folds))]
+        os.utime(entry)
+        print(f"♻ TF-IDF fold cache {entry.name[6:18]}: load {time.perf_counter() - t0:.1f}s")
+        return mats, entry
+
+    text, _ = load_split(train_file)
+    text = np.asarray(text, dtype=object)
+    mats = []
+    with step("tfidf fold fit_transform", rows=len(text) * len(folds), quiet=True):
+        for tr, va in folds:
+            fold_vec = clone(vectorizer)
+            mats.append((fold_vec.fit_transform(text[tr]), fold_vec.transform(text[va])))
+    print(f"➡ TF-IDF {len(folds)} fold: {time.perf_counter() - t0:.1f}s")
+
+    if entry is None:
+        return mats, None
+    tmp = entry.with_name(entry.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for i, (X_tr, X_va) in enumerate(mats):
+        sp.save_npz(tmp / f"X_tr_{i}.npz", X_tr, compressed=False)
+        sp.save_npz(tmp / f"X_va_{i}.npz", X_va, compressed=False)
+    os.replace(tmp, entry)
+    prune(cache_dir)
+    return mats, entry
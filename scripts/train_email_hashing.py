@@ -0,0 +1,142 @@
+# scripts/train_email_hashing.py
+"""Train email out-of-core: HashingVectorizer + SGDClassifier.partial_fit.
+
+Khác train_email_models.py (TfidfVectorizer giữ vocabulary hàng triệu bigram
+trong RAM và trong file joblib), bản này:
+  - băm subject + body thành N_FEATURES chiều, không có vocabulary -> file
+    vectorizer chỉ vài trăm byte, load tức thì;
+  - đọc splits/dataset_train theo từng chunk CHUNK_SIZE dòng, nên RAM không
+    phụ thuộc cỡ dữ liệu;
+  - train song song nhiều giá trị alpha trên cùng 1 lần băm mỗi chunk, chọn
+    theo F1 trên VAL (cũng đọc theo chunk).
+
+    python scripts/train_email_hashing.py --epochs 3 --chunk-size 20000
+
+Artifact dùng được ngay với email_scoring.py:
+
+    python scripts/email_scoring.py bench --vectorizer artifacts/email/hashing_vectorizer.joblib \\
+        --model artifacts/email/email_sgd_model.joblib
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+
+from email_scoring import TOKEN_BUDGET, email_texts, save_text_config
+from metrics import confusion_counts, metrics_from_counts
+from table_io import iter_table
+
+SPLIT_DIR = Path("splits")
+OUT_DIR = Path("artifacts/email")
+
+VECTORIZER_FILE = OUT_DIR / "hashing_vectorizer.joblib"
+MODEL_FILE = OUT_DIR / "email_sgd_model.joblib"
+RESULT_FILE = OUT_DIR / "email_hashing_test_results.csv"
+
+COLUMNS = ["subject", "body", "label"]
+CLASSES = np.array([0, 1])
+
+# 2^20 chiều: va chạm hash ít với ~200k n-gram hay gặp, ma trận vẫn thưa
+N_FEATURES = 2 ** 20
+CHUNK_SIZE = 20_000
+EPOCHS = 3
+ALPHAS = [1e-6, 1e-5, 1e-4]
+
+
+def make_vectorizer(n_features=N_FEATURES):
+    return HashingVectorizer(
+        ngram_range=(1, 2),
+        n_features=n_features,
+        alternate_sign=False,
+        norm="l2",
+        dtype=np.float32,
+    )
+
+def iter_chunks(path, vectorizer, chunk_size):
+    """-> (ma trận thưa, nhãn) cho từng chunk của 1 file split."""
+    for chunk in iter_table(path, columns=COLUMNS, chunksize=chunk_size):
+        y = pd.to_numeric(chunk["label"]).to_numpy(dtype=np.int64)
+        yield vectorizer.transform(email_texts(chunk, TOKEN_BUDGET)), y
+
+def class_weights(path, chunk_size):
+    """Trọng số 'balanced' như class_weight của LogisticRegression, đếm nhãn theo chunk."""
+    counts = np.zeros(2, dtype=np.int64)
+    for chunk in iter_table(path, columns=["label"], chunksize=chunk_size):
+        counts += np.bincount(pd.to_numeric(chunk["label"]).to_numpy(dtype=np.int64),
+                              minlength=2)[:2]
+    return counts.sum() / (2 * np.maximum(counts, 1)), counts
+
+def evaluate(models, path, vectorizer, chunk_size):
+    """Metrics cho từng model trên 1 split, cộng dồn confusion matrix theo chunk."""
+    counts = [np.zeros(4, dtype=np.int64) for _ in models]
+    for X, y in iter_chunks(path, vectorizer, chunk_size):
+        for i, model in enumerate(models):
+            counts[i] += confusion_counts(y, model.predict(X))
+    return [metrics_from_counts(c) for c in counts]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train email out-of-core (hashing + SGD)")
+    parser.add_argument("--split-dir", type=Path, default=SPLIT_DIR)
+    parser.add_argument("--out-dir", type=Path, default=OUT_DIR)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--n-features", type=int, default=N_FEATURES)
+    parser.add_argument("--alpha", type=float, nargs="+", default=ALPHAS)
+    args = parser.parse_args()
+
+    train_file = args.split_dir / "dataset_train.csv"
+    val_file = args.split_dir / "dataset_val.csv"
+    test_file = args.split_dir / "dataset_test.csv"
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+
+    vectorizer = make_vectorizer(args.n_features)
+    weights, counts = class_weights(train_file, args.chunk_size)
+    print(f"➡ TRAIN: {counts.sum():,} email (ham {counts[0]:,} / phishing {counts[1]:,})")
+
+    # ==== 1) partial_fit theo chunk, mỗi chunk băm 1 lần cho mọi alpha ====
+    models = [SGDClassifier(loss="log_loss", alpha=a, random_state=42) for a in args.alpha]
+    rng = np.random.default_rng(42)
+    t0 = time.perf_counter()
+    for epoch in range(1, args.epochs + 1):
+        for X, y in iter_chunks(train_file, vectorizer, args.chunk_size):
+            order = rng.permutation(len(y))
+            X, y = X[order], y[order]
+            w = weights[y]
+            for model in models:
+                model.partial_fit(X, y, classes=CLASSES, sample_weight=w)
+        val_metrics = evaluate(models, val_file, vectorizer, args.chunk_size)
+        scores = " | ".join(f"alpha={a:g}: F1 {m['f1']:.4f}" for a, m in zip(args.alpha, val_metrics))
+        print(f"   epoch {epoch}/{args.epochs} ({time.perf_counter() - t0:.1f}s) {scores}")
+
+    # ==== 2) Chọn alpha theo F1 (VAL), đánh giá trên TEST ====
+    best = int(np.argmax([m["f1"] for m in val_metrics]))
+    best_model = models[best]
+    print(f"\n🔥 Alpha tốt nhất dựa trên F1 (VAL): {args.alpha[best]:g}")
+
+    test_metrics = evaluate([best_model], test_file, vectorizer, args.chunk_size)[0]
+
+    # ==== 3) Lưu kết quả ====
+    vectorizer_file = args.out_dir / VECTORIZER_FILE.name
+    model_file = args.out_dir / MODEL_FILE.name
+    result_file = args.out_dir / RESULT_FILE.name
+    joblib.dump(vectorizer, vectorizer_file)
+    save_text_config(vectorizer_file, TOKEN_BUDGET)
+    joblib.dump(best_model, model_file)
+    pd.DataFrame([test_metrics]).to_csv(result_file, index=False)
+
+    print("\n🎉 TRAINING DONE!")
+    print(f"📌 Test F1: {test_metrics['f1']:.4f} | accuracy: {test_metrics['accuracy']:.4f}")
+    print("📌 Test metrics saved to:", result_file)
+    print(f"📌 Vectorizer saved to: {vectorizer_file} ({vectorizer_file.stat().st_size:,} bytes)")
+    print(f"📌 Model saved to: {model_file} ({model_file.stat().st_size / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
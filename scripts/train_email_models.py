@@ -1,14 +1,27 @@
+import os
+import time
 import pandas as pd
 import numpy as np
 from pathlib import Path
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, precision_recall_fscore_support, confusion_matrix
+from sklearn.metrics import confusion_matrix
 from sklearn.model_selection import GridSearchCV
 import joblib
 import matplotlib.pyplot as plt
 
+from compact_model import export_email
+from email_scoring import TAIL_FRACTION, TOKEN_BUDGET, email_texts, save_text_config
+from hp_search import HalvingSearch
+from metrics import get_metrics
+from model_zoo import evaluate_models, print_table, select_model, sparse_models
+from profiling import record_search, set_rows, start_stage, step
+from table_io import read_table
+from tfidf_cache import load_or_fit
+
+
+start_stage()
 
 # ==== 1) Đường dẫn ====
 
@@ -16,27 +29,22 @@ SPLIT_DIR = Path("splits")
 OUT_DIR = Path("artifacts/email")
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
-train = pd.read_csv(SPLIT_DIR / "dataset_train.csv")
-val = pd.read_csv(SPLIT_DIR / "dataset_val.csv")
-test = pd.read_csv(SPLIT_DIR / "dataset_test.csv")
-
-
-# ==== 2) Ghép subject + body thành text ====
+# Chỉ cần subject/body/label để huấn luyện
+COLUMNS = ["subject", "body", "label"]
 
-for df in (train, val, test):
-    df["text"] = (df["subject"].fillna("") + " " + df["body"].fillna("")).str.strip()
+SPLIT_FILES = [SPLIT_DIR / f"dataset_{s}.csv" for s in ("train", "val", "test")]
 
-X_train = train["text"]
-y_train = train["label"]
 
-X_val = val["text"]
-y_val = val["label"]
+# ==== 2) Ghép subject + body thành text ====
+# EMAIL_TOKEN_BUDGET > 0: body chỉ giữ N token đầu + cuối (email_scoring.py),
+# lưu vào tfidf_vectorizer.json để lúc chấm điểm cắt giống hệt.
 
-X_test = test["text"]
-y_test = test["label"]
+def load_split(path):
+    df = read_table(path, columns=COLUMNS)
+    return pd.Series(email_texts(df, TOKEN_BUDGET), index=df.index), df["label"]
 
 
-# ==== 3) TF-IDF ====
+# ==== 3) TF-IDF (cache theo hash split + tham số, xem tfidf_cache.py) ====
 
 tfidf = TfidfVectorizer(
     ngram_range=(1, 2),
@@ -45,89 +53,98 @@ tfidf = TfidfVectorizer(
     max_features=200_000
 )
 
-X_train_tfidf = tfidf.fit_transform(X_train)
-X_val_tfidf = tfidf.transform(X_val)
-X_test_tfidf = tfidf.transform(X_test)
+tfidf, (X_train_tfidf, X_val_tfidf, X_test_tfidf), (y_train, y_val, y_test) = \
+    load_or_fit(tfidf, SPLIT_FILES, load_split)
 
 joblib.dump(tfidf, OUT_DIR / "tfidf_vectorizer.joblib")
+save_text_config(OUT_DIR / "tfidf_vectorizer.joblib", TOKEN_BUDGET)
+if TOKEN_BUDGET:
+    print(f"✂ Token budget: {TOKEN_BUDGET} token body / email")
 
+# Tìm tham số: "grid" (GridSearchCV, mặc định) hoặc "halving" (hp_search.py)
+SEARCH = os.environ.get("EMAIL_SEARCH", "grid")
+if SEARCH == "halving":
+    # TF-IDF theo fold: bước riêng (có cache), không tính vào thời gian tìm
+    with step("tfidf folds", rows=X_train_tfidf.shape[0]):
+        search = HalvingSearch.from_split(tfidf, y_train, SPLIT_FILES[0], load_split)
+t_search = time.perf_counter()
 
-# ==== 4) Hàm tính metrics ====
-
-def get_metrics(y_true, y_pred):
-    acc = accuracy_score(y_true, y_pred)
-    p, r, f1, _ = precision_recall_fscore_support(
-        y_true, y_pred, average="binary", zero_division=0
-    )
-    tn, fp, fn, tp = confusion_matrix(y_true, y_pred).ravel()
-    return {
-        "accuracy": acc,
-        "precision": p,
-        "recall": r,
-        "f1": f1,
-        "tn": tn,
-        "fp": fp,
-        "fn": fn,
-        "tp": tp,
-    }
 
-
-# ==== 5) Logistic Regression ====
+# ==== 4) Các mô hình ứng viên ====
 
 lr = LogisticRegression(class_weight="balanced", solver="liblinear", max_iter=2000)
 lr_params = {"C": [0.1, 1, 10]}
 
-lr_grid = GridSearchCV(lr, lr_params, cv=5, scoring="f1", n_jobs=-1)
-lr_grid.fit(X_train_tfidf, y_train)
-
-best_lr = lr_grid.best_estimator_
-y_val_lr = best_lr.predict(X_val_tfidf)
-lr_val_metrics = get_metrics(y_val, y_val_lr)
-
-
-# ==== 6) Random Forest ====
-
 rf = RandomForestClassifier(class_weight="balanced", n_jobs=-1)
 rf_params = {
     "n_estimators": [200, 400],
     "max_depth": [None, 20],
 }
 
-rf_grid = GridSearchCV(rf, rf_params, cv=5, scoring="f1", n_jobs=-1)
-rf_grid.fit(X_train_tfidf, y_train)
+# SGD / Linear SVM / Complement NB: xem model_zoo.py
+CANDIDATES = {
+    "lr": ("Logistic Regression", lr, lr_params),
+    "rf": ("Random Forest", rf, rf_params),
+    **sparse_models(),
+}
+# Chọn nhóm model cần train, ví dụ EMAIL_MODELS=lr,sgd,svm,cnb để bỏ Random Forest
+EMAIL_MODELS = os.environ.get("EMAIL_MODELS", ",".join(CANDIDATES)).split(",")
+
+
+# ==== 5) Tìm tham số cho từng mô hình ====
+
+def tune(name, model, params):
+    if SEARCH == "halving":
+        return search.fit_best(name, model, params, X_train_tfidf, y_train)
+    grid = GridSearchCV(model, params, cv=5, scoring="f1", n_jobs=-1)
+    grid.fit(X_train_tfidf, y_train)
+    record_search(name, grid)
+    return grid.best_estimator_
+
+models, fit_seconds = {}, {}
+for key in EMAIL_MODELS:
+    name, model, params = CANDIDATES[key.strip()]
+    with step(f"tune {name}", rows=X_train_tfidf.shape[0]) as s:
+        models[name] = tune(name, model, params)
+    fit_seconds[name] = s.record["wall_s"]
 
-best_rf = rf_grid.best_estimator_
-y_val_rf = best_rf.predict(X_val_tfidf)
-rf_val_metrics = get_metrics(y_val, y_val_rf)
+if SEARCH == "halving":
+    search.save_report(OUT_DIR / "email_search_report.csv")
 
 
-# ==== 7) Chọn mô hình tốt nhất ====
+# ==== 6) Chọn mô hình tốt nhất (F1 VAL + độ trễ + kích thước) ====
 
-if lr_val_metrics["f1"] >= rf_val_metrics["f1"]:
-    best_model = best_lr
-    best_name = "Logistic Regression"
-else:
-    best_model = best_rf
-    best_name = "Random Forest"
+with step("evaluate models", rows=X_val_tfidf.shape[0] * len(models)):
+    val_results = evaluate_models(models, X_val_tfidf, y_val, fit_seconds)
+best_name = select_model(val_results)
+best_model = models[best_name]
+print_table(val_results)
+pd.DataFrame(val_results).to_csv(OUT_DIR / "email_model_zoo.csv", index=False)
 
-print(f"\n🔥 Mô hình tốt nhất dựa trên F1 (VAL): {best_name}")
+print(f"\n⏱ Tìm tham số ({SEARCH}): {time.perf_counter() - t_search:.1f}s")
+print(f"🔥 Mô hình tốt nhất dựa trên F1 (VAL) trong budget: {best_name}")
 
-# ==== 8) Đánh giá trên TEST ====
+# ==== 7) Đánh giá trên TEST ====
 
-y_test_pred = best_model.predict(X_test_tfidf)
+with step("predict test", rows=X_test_tfidf.shape[0]):
+    y_test_pred = best_model.predict(X_test_tfidf)
 test_metrics = get_metrics(y_test, y_test_pred)
 
 
-# ==== 9) Lưu kết quả ====
+# ==== 8) Lưu kết quả ====
 
 pd.DataFrame([test_metrics]).to_csv(
     OUT_DIR / "email_test_results.csv", index=False
 )
 
 joblib.dump(best_model, OUT_DIR / "email_best_model.joblib")
+with step("export compact"):
+    compact_mb = export_email(tfidf, best_model, OUT_DIR / "compact",
+                              {"token_budget": TOKEN_BUDGET, "tail_fraction": TAIL_FRACTION})
+set_rows(X_train_tfidf.shape[0])
 
 
-# ==== 10) Vẽ confusion matrix ====
+# ==== 9) Vẽ confusion matrix ====
 
 cm = confusion_matrix(y_test, y_test_pred)
 
@@ -152,3 +169,4 @@ print("📌 Best model:", best_name)
 print("📌 Test metrics saved to:", OUT_DIR / "email_test_results.csv")
 print("📌 Confusion matrix saved to:", OUT_DIR / "email_confusion_matrix.png")
 print("📌 Model saved to:", OUT_DIR / "email_best_model.joblib")
+print(f"📌 Compact (mmap) saved to: {OUT_DIR / 'compact'} ({compact_mb:.1f} MB)")
@@ -11,6 +11,13 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import joblib
 
+from compact_model import export_phone
+from phone_features import FEATURES, PhoneFeatureExtractor
+from profiling import record_search, set_rows, start_stage, step
+from table_io import read_table
+
+start_stage()
+
 # ========= FILE INPUT / OUTPUT =========
 TRAIN_FILE = Path("splits_phone/phone_train.csv")
 VAL_FILE = Path("splits_phone/phone_val.csv")
@@ -19,22 +26,24 @@ TEST_FILE = Path("splits_phone/phone_test.csv")
 ARTIFACT_DIR = Path("artifacts/phone")
 ARTIFACT_DIR.mkdir(exist_ok=True)
 
-print("📥 Loading train/val/test datasets...")
-train = pd.read_csv(TRAIN_FILE)
-val = pd.read_csv(VAL_FILE)
-test = pd.read_csv(TEST_FILE)
+# ========= INPUT: SỐ ĐIỆN THOẠI THÔ =========
+# FEATURES được tính ngay trong Pipeline (PhoneFeatureExtractor) nên model
+# lưu ra nhận trực tiếp chuỗi số điện thoại, không cần tính đặc trưng riêng.
 
-# ========= CHỌN FEATURES =========
-FEATURES = ["length", "has_country_code", "country_code",
-            "digit_entropy", "repeat_ratio", "prefix"]
+print("📥 Loading train/val/test datasets...")
+with step("read") as s:
+    train = read_table(TRAIN_FILE, columns=["phone", "label"], dtype={"phone": str})
+    val = read_table(VAL_FILE, columns=["phone", "label"], dtype={"phone": str})
+    test = read_table(TEST_FILE, columns=["phone", "label"], dtype={"phone": str})
+    s.rows = len(train) + len(val) + len(test)
 
-X_train = train[FEATURES]
+X_train = train["phone"].astype(str)
 y_train = train["label"]
 
-X_val = val[FEATURES]
+X_val = val["phone"].astype(str)
 y_val = val["label"]
 
-X_test = test[FEATURES]
+X_test = test["phone"].astype(str)
 y_test = test["label"]
 
 # ========= KẾT HỢP TRAIN + VAL CHO CROSS-VAL =========
@@ -68,6 +77,7 @@ for model_name in models:
     print(f"➡ Training: {model_name}")
 
     pipe = Pipeline([
+        ('features', PhoneFeatureExtractor()),
         ('scaler', MinMaxScaler()),
         ('clf', models[model_name])
     ])
@@ -75,7 +85,9 @@ for model_name in models:
     grid = GridSearchCV(pipe, param_grids[model_name],
                         cv=5, scoring='f1', n_jobs=-1)
 
-    grid.fit(X_train_full, y_train_full)
+    with step(f"tune {model_name}", rows=len(X_train_full)):
+        grid.fit(X_train_full, y_train_full)
+    record_search(model_name, grid)
 
     print(f"   ✓ Best params: {grid.best_params_}")
     print(f"   ✓ Best CV F1-score: {grid.best_score_:.4f}\n")
@@ -89,7 +101,8 @@ print("\n🔥 Mô hình tốt nhất dựa trên VAL F1:", best_name)
 
 # ========= TESTING =========
 print("\n🔎 TESTING BEST MODEL...\n")
-y_pred = best_model.predict(X_test)
+with step("predict test", rows=len(X_test)):
+    y_pred = best_model.predict(X_test)
 
 report = classification_report(y_test, y_pred, output_dict=True)
 report_df = pd.DataFrame(report).transpose()
@@ -117,7 +130,12 @@ print("🖼 Confusion matrix saved to:", cm_file)
 # ========= SAVE MODEL =========
 model_file = ARTIFACT_DIR / "phone_best_model.joblib"
 joblib.dump(best_model, model_file)
+with step("export compact"):
+    compact_mb = export_phone(best_model, ARTIFACT_DIR / "compact")
+set_rows(len(X_train_full))
 print("💾 Model saved to:", model_file)
+print(f"💾 Compact (mmap) saved to: {ARTIFACT_DIR / 'compact'} ({compact_mb:.1f} MB)")
+print("   (Pipeline nhận chuỗi số điện thoại thô, đặc trưng:", ", ".join(FEATURES) + ")")
 
 print("\n🎉 TRAINING DONE!")
 print("✨ Best model:", best_name)